@@ -1,118 +1,356 @@
-import csv
-from typing import List, Dict, Tuple
-from bussinese import Ingredient,PizzaRecipe,PizzaMenuItem, RecipeManagement,SideItem,SideCategory
+import json
+import os
+import threading
+import time
+import zlib
+from typing import List, Dict, Tuple, Optional
+from persistence import persistence
+from bussinese import Ingredient,PizzaRecipe,PizzaMenuItem, RecipeManagement,SideItem,MenuManagement,SideMenuManagement,CustomerInfo,Order
 
 class IngredientRepository:
+    FIELDNAMES = ['name', 'quantity', 'unit', 'reorder_level']
 
+    def save_ingredients(self, ingredients: List[Ingredient], filename: str) -> None:
+        persistence.save(filename, self.FIELDNAMES, ['name'], (
+            {
+                'name': ingredient.name,
+                'quantity': ingredient.quantity,
+                'unit': ingredient.unit,
+                'reorder_level': ingredient.reorder_level
+            }
+            for ingredient in ingredients
+        ))
 
-    def save_ingredients(ingredients, filename):
-        with open(filename, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["Name", "Quantity", "Unit", "Reorder Level"])
-            for ingredient in ingredients:
-                row = [ingredient.name, ingredient.quantity, ingredient.unit, ingredient.reorder_level]
-                writer.writerow(row)
-
-
-    def load_ingredients(filename):
+    def load_ingredients(self, filename: str) -> List[Ingredient]:
         ingredients = []
-        with open(filename, 'r') as file:
-            reader = csv.reader(file)
-            next(reader)  # skip header row
-            for row in reader:
-                name, quantity, unit, reorder_level = row
-                ingredient = Ingredient(name, float(quantity), unit, int(reorder_level))
-                ingredients.append(ingredient)
+        for row in persistence.load(filename, self.FIELDNAMES, ['name']):
+            ingredients.append(Ingredient(row['name'], float(row['quantity']), row['unit'], int(row['reorder_level'])))
         return ingredients
  
 class PizzaRecipeRepository:
+    FIELDNAMES = ['recipe_name', 'ingredient_name', 'amount', 'category']
+    KEY_FIELDS = ['recipe_name', 'ingredient_name']
+
     def save_recipes(self, recipes: List[PizzaRecipe], filename: str):
-        with open(filename, 'w', newline='') as csvfile:
-            fieldnames = ['recipe_name', 'ingredient_name', 'amount']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            writer.writeheader()
-            for recipe in recipes:
-                for ingredient_name, amount in recipe.ingredients.items():
-                    writer.writerow({
-                        'recipe_name': recipe.name,
-                        'ingredient_name': ingredient_name,
-                        'amount': amount
-                    })
+        persistence.save(filename, self.FIELDNAMES, self.KEY_FIELDS, (
+            {
+                'recipe_name': recipe.name,
+                'ingredient_name': ingredient_name,
+                'amount': amount,
+                'category': recipe.category or ''
+            }
+            for recipe in recipes
+            for ingredient_name, amount in recipe.ingredients.items()
+        ))
 
     def load_pizza_recipes(self, filename: str) -> List[PizzaRecipe]:
-        with open(filename, newline='') as csvfile:        
-            reader = csv.DictReader(csvfile)
-            recipes_dict = {}
-            for row in reader:
-                if row['recipe_name'] in recipes_dict:
-                    recipes_dict[row['recipe_name']].ingredients[row['ingredient_name']] = float(row['amount'])
-                else:
-                    recipes_dict[row['recipe_name']] = PizzaRecipe(row['recipe_name'], {row['ingredient_name']: float(row['amount'])})
-            return list(recipes_dict.values())
+        recipes_dict = {}  # recipe name -> (category, ingredients)
+        for row in persistence.load(filename, self.FIELDNAMES, self.KEY_FIELDS):
+            if row['recipe_name'] in recipes_dict:
+                recipes_dict[row['recipe_name']][1][row['ingredient_name']] = float(row['amount'])
+            else:
+                # The category column is optional for files written before it existed.
+                category = row.get('category') or None
+                recipes_dict[row['recipe_name']] = (category, {row['ingredient_name']: float(row['amount'])})
+        return [PizzaRecipe(name, ingredients, category) for name, (category, ingredients) in recipes_dict.items()]
     
 class PizzaMenuRepository:
+    FIELDNAMES = ['name', 'description', 'size', 'price', 'category', 'recipe_name']
+    KEY_FIELDS = ['name', 'size']
+
     def save_menu_items(self, menu_items: List[PizzaMenuItem], filename: str):
-        with open(filename, 'w', newline='') as csvfile:
-            fieldnames = ['name', 'description', 'size', 'price', 'category', 'recipe_name']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            writer.writeheader()
-            for item in menu_items:
-                writer.writerow({
-                    'name': item.name,
-                    'description': item.description,
-                    'size': item.size,
-                    'price': item.price,
-                    'category': item.category,
-                    'recipe_name': item.recipe.name
-                })
+        persistence.save(filename, self.FIELDNAMES, self.KEY_FIELDS, (
+            {
+                'name': item.name,
+                'description': item.description,
+                'size': item.size,
+                'price': item.price,
+                'category': item.category,
+                'recipe_name': item.recipe.name
+            }
+            for item in menu_items
+        ))
 
     def load_menu_items(self, filename: str, recipe_mgt: RecipeManagement) -> List[PizzaMenuItem]:
         menu_items = []
-        with open(filename, newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                recipe_name = row['recipe_name']
-                recipe = recipe_mgt.get_recipe_by_name(recipe_name)
-                if not recipe:
-                    print(f"Recipe '{recipe_name}' not found. Skipping menu item '{row['name']}'.")
-                    continue
-                menu_item = PizzaMenuItem(
-                    name=row['name'],
-                    description=row['description'],
-                    size=row['size'],
-                    price=float(row['price']),
-                    category=row['category'],
-                    recipe=recipe
-                )
-                menu_items.append(menu_item)
+        for row in persistence.load(filename, self.FIELDNAMES, self.KEY_FIELDS):
+            recipe_name = row['recipe_name']
+            recipe = recipe_mgt.get_recipe_by_name(recipe_name)
+            if not recipe:
+                print(f"Recipe '{recipe_name}' not found. Skipping menu item '{row['name']}'.")
+                continue
+            menu_item = PizzaMenuItem(
+                name=row['name'],
+                description=row['description'],
+                size=row['size'],
+                price=float(row['price']),
+                category=row['category'],
+                recipe=recipe
+            )
+            menu_items.append(menu_item)
         return menu_items
 
 
 
 class SideDishRepository:
+    FIELDNAMES = ['name', 'price', 'category']
+
     def save_side_dishes(self, side_dishes: List[SideItem], filename: str) -> None:
-        with open(filename, 'w', newline='') as csvfile:
-            fieldnames = ['name', 'price', 'category']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            writer.writeheader()
-            for side_dish in side_dishes:
-                writer.writerow({
-                    'name': side_dish.name,
-                    'price': side_dish.price,
-                    'category': side_dish.category  # No .value, as category is a string
-                })
+        persistence.save(filename, self.FIELDNAMES, ['name'], (
+            {
+                'name': side_dish.name,
+                'price': side_dish.price,
+                'category': side_dish.category  # No .value, as category is a string
+            }
+            for side_dish in side_dishes
+        ))
 
     def load_side_dishes(self, filename: str) -> List[SideItem]:
         side_dishes = []
-        with open(filename, newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                side_dishes.append(SideItem(
-                    name=row['name'],
-                    price=float(row['price']),
-                    category=SideCategory(row['category'])  # Convert string back to enum
-                ))
+        for row in persistence.load(filename, self.FIELDNAMES, ['name']):
+            side_dishes.append(SideItem(
+                name=row['name'],
+                price=float(row['price']),
+                category=row['category']  # SideCategory values are plain strings
+            ))
         return side_dishes
+
+
+class OrderRepository:
+    # Append-only order journal.
+    #
+    # Each order is one line "<crc32> <json>" in the current segment file
+    # (orders-00000001.log, ...). Every append is handed to the OS right away,
+    # so it survives the process crashing; it is made durable (fsync) in
+    # groups: one fsync per `commit_every` records, or `commit_interval`
+    # seconds after the first uncommitted record (a background thread does
+    # this even if no further order arrives), or on commit().
+    # Segments are rotated once they reach `max_segment_bytes`. On startup the
+    # journal is replayed to rebuild the id index, and a torn record at the
+    # end of the last segment (crash during a write) is truncated away.
+
+    SEGMENT_PREFIX = 'orders-'
+    SEGMENT_SUFFIX = '.log'
+
+    def __init__(self, directory: str = 'orders', commit_every: int = 32, commit_interval: Optional[float] = 0.1,
+                 max_segment_bytes: int = 4 * 1024 * 1024):
+        self._directory = directory
+        self._commit_every = commit_every
+        self._commit_interval = commit_interval
+        self._max_segment_bytes = max_segment_bytes
+        self._index: Dict[int, Tuple[int, int]] = {}  # order id -> (segment number, byte offset)
+        self._last_id = 0
+        self._uncommitted = 0
+        self._first_uncommitted = None
+        self._file = None
+        self._lock = threading.RLock()
+        self._pending = threading.Condition(self._lock)  # signalled when a commit group starts
+        os.makedirs(directory, exist_ok=True)
+        self._segment = self._recover()
+        self._open_segment(self._segment)
+        self._committer = None
+        if commit_interval is not None:
+            self._committer = threading.Thread(target=self._commit_loop, name='journal-commit', daemon=True)
+            self._committer.start()
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self._directory, f"{self.SEGMENT_PREFIX}{number:08d}{self.SEGMENT_SUFFIX}")
+
+    def _segments(self) -> List[int]:
+        numbers = []
+        for filename in os.listdir(self._directory):
+            if filename.startswith(self.SEGMENT_PREFIX) and filename.endswith(self.SEGMENT_SUFFIX):
+                number = filename[len(self.SEGMENT_PREFIX):-len(self.SEGMENT_SUFFIX)]
+                if number.isdigit():
+                    numbers.append(int(number))
+        return sorted(numbers)
+
+    @staticmethod
+    def _encode(record: dict) -> bytes:
+        payload = json.dumps(record, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        return b'%08x ' % zlib.crc32(payload) + payload + b'\n'
+
+    @staticmethod
+    def _decode(line: bytes) -> Optional[dict]:
+        if not line.endswith(b'\n') or len(line) < 10 or line[8:9] != b' ':
+            return None
+        payload = line[9:-1]
+        try:
+            if int(line[:8], 16) != zlib.crc32(payload):
+                return None
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    def _scan(self, number: int, offset: int = 0):
+        # Yields (offset, record) for every valid record from `offset` on;
+        # stops at the first torn or corrupt one and yields (offset, None) for it.
+        with open(self._segment_path(number), 'rb') as segment:
+            segment.seek(offset)
+            for line in segment:
+                record = self._decode(line)
+                yield offset, record
+                if record is None:
+                    return
+                offset += len(line)
+
+    def _recover(self) -> int:
+        segments = self._segments()
+        for number in segments:
+            for offset, record in self._scan(number):
+                if record is None:
+                    if number == segments[-1]:
+                        with open(self._segment_path(number), 'r+b') as segment:
+                            segment.truncate(offset)
+                    else:
+                        print(f"Order journal segment {number} is damaged after byte {offset}; skipping the rest of it.")
+                    break
+                self._index[record['id']] = (number, offset)
+                self._last_id = max(self._last_id, record['id'])
+        return segments[-1] if segments else 1
+
+    def _open_segment(self, number: int) -> None:
+        self._segment = number
+        self._file = open(self._segment_path(number), 'ab')
+
+    def append(self, order: Order) -> int:
+        with self._lock:
+            self._last_id += 1
+            order.order_id = self._last_id
+            order.placed_at = order.placed_at or time.time()
+            data = self._encode(self.order_to_record(order))
+            offset = self._file.tell()
+            self._file.write(data)
+            self._file.flush()
+            self._index[order.order_id] = (self._segment, offset)
+            self._uncommitted += 1
+            if self._first_uncommitted is None:
+                self._first_uncommitted = time.monotonic()
+                self._pending.notify()
+            if self._uncommitted >= self._commit_every:
+                self.commit()
+            return order.order_id
+
+    def commit(self) -> None:
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            if self._uncommitted:
+                os.fsync(self._file.fileno())
+            self._uncommitted = 0
+            self._first_uncommitted = None
+            if self._file.tell() >= self._max_segment_bytes:
+                self._file.close()
+                self._open_segment(self._segment + 1)
+
+    def _commit_loop(self) -> None:
+        # Commits each group `commit_interval` seconds after its first record.
+        with self._lock:
+            while self._file is not None:
+                if self._first_uncommitted is None:
+                    self._pending.wait()
+                    continue
+                delay = self._first_uncommitted + self._commit_interval - time.monotonic()
+                if delay > 0:
+                    self._pending.wait(delay)
+                else:
+                    self.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self.commit()
+                self._file.close()
+                self._file = None
+            self._pending.notify_all()
+        if self._committer is not None and self._committer is not threading.current_thread():
+            self._committer.join()
+            self._committer = None
+
+    def replay(self, after_id: int = 0):
+        # Generator over journaled records in order, optionally only those
+        # with an id greater than after_id. When after_id is in the index the
+        # scan starts right at it instead of at the first segment.
+        start_segment, start_offset = self._index.get(after_id, (0, 0))
+        for number in self._segments():
+            if number < start_segment:
+                continue
+            for _, record in self._scan(number, start_offset if number == start_segment else 0):
+                if record is None:
+                    break
+                if record['id'] > after_id:
+                    yield record
+
+    def get(self, order_id: int) -> Optional[dict]:
+        location = self._index.get(order_id)
+        if location is None:
+            return None
+        number, offset = location
+        with open(self._segment_path(number), 'rb') as segment:
+            segment.seek(offset)
+            return self._decode(segment.readline())
+
+    @staticmethod
+    def order_to_record(order: Order) -> dict:
+        customer = order.customer_info
+        # Each pizza line carries its recipe's ingredient amounts, so custom
+        # pizzas (and menu pizzas whose recipe later changes) replay as made.
+        pizzas = [[pizza.name, pizza.size, pizza.category, pizza.price, quantity, pizza.recipe.name,
+                   pizza.recipe.ingredients] for pizza, quantity in order.pizza_lines()]
+        sides = [[side.name, side.category, side.price, quantity] for side, quantity in order.side_lines()]
+        return {
+            'id': order.order_id,
+            'ts': order.placed_at,
+            'c': [customer.name, customer.phone, customer.email, customer.company] if customer else None,
+            'dd': order.delivery_date,
+            'dt': order.delivery_time,
+            'p': pizzas,
+            's': sides,
+            't': order.total(),
+        }
+
+    @staticmethod
+    def record_to_order(record: dict, menu_mgt: Optional[MenuManagement] = None,
+                        side_menu_mgt: Optional[SideMenuManagement] = None) -> Order:
+        # Lines are resolved against the current menu when possible, otherwise
+        # rebuilt from what the journal recorded. Journals written before the
+        # recipe amounts were recorded cannot rebuild a pizza that is no longer
+        # on the menu: ValueError rather than an order that uses no stock.
+        pizzas = []
+        for name, size, category, price, quantity, recipe_name, *recorded in record['p']:
+            item = None
+            if menu_mgt is not None:
+                item = next((candidate for candidate in menu_mgt.get_menu_items_by_size(size)
+                             if candidate.name.casefold() == name.casefold()), None)
+            if item is None:
+                if not recorded:
+                    raise ValueError(f"order {record['id']}: {size} '{name}' is not on the menu "
+                                     "and its recipe was not recorded")
+                item = PizzaMenuItem(name, '', size, price, category, PizzaRecipe(recipe_name, recorded[0], category))
+            pizzas.append((item, quantity))
+        sides = []
+        for name, category, price, quantity in record['s']:
+            item = side_menu_mgt.get_side_item_by_name(name) if side_menu_mgt is not None else None
+            sides.append((item or SideItem(name, price, category), quantity))
+        customer = None
+        if record['c'] is not None:
+            name, phone, email, company = record['c']
+            customer = CustomerInfo(name, phone, email, company, record['dd'], record['dt'])
+        order = Order(customer, record['dd'], record['dt'], pizzas, sides)
+        order.order_id = record['id']
+        order.placed_at = record['ts']
+        if customer is not None:
+            customer.place_order(order)
+        return order
+
+    def load_orders(self, menu_mgt: Optional[MenuManagement] = None,
+                    side_menu_mgt: Optional[SideMenuManagement] = None) -> List[Order]:
+        return [self.record_to_order(record, menu_mgt, side_menu_mgt) for record in self.replay()]
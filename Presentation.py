@@ -1,19 +1,166 @@
-import csv
-from io import StringIO
-from typing import List, Dict, Tuple
-from bussinese import PizzaSize, PizzaCategory,Ingredient,PizzaRecipe,PizzaMenuItem, RecipeManagement,InventoryManager,MenuManagement,CustomerInfo,CustomPizzaOrder,SideCategory,SideItem,SideMenuManagement,Order
-from Datalayer import IngredientRepository,PizzaRecipeRepository,PizzaMenuRepository,SideDishRepository
+import argparse
+import os
+import time
+from functools import cached_property
+from bussinese import PizzaSize, PizzaCategory,PizzaRecipe,PizzaMenuItem, RecipeManagement,InventoryManager,MenuManagement,CustomerInfo,CustomPizzaOrder,SideCategory,SideItem,SideMenuManagement,Order
+from Datalayer import PizzaRecipeRepository,PizzaMenuRepository,SideDishRepository,OrderRepository
+from availability import AvailabilityService
+from catalog import ALIASES_FILE, catalog
+from persistence import persistence
+
+SNAPSHOT_FILE = 'store.snapshot'
 
 
 class PizzaStore:
-    def __init__(self):
+    # (name, description, size, price, category, recipe ingredients)
+    STANDARD_PIZZAS = [
+        ("Pepperoni", "Pepperoni pizza", PizzaSize.LARGE, 15.50, PizzaCategory.MEAT, {"Pepperoni": 1}),
+        ("Hawaiian", "Ham and pineapple pizza", PizzaSize.LARGE, 18.50, PizzaCategory.MEAT, {"Ham": 1, "Pineapple": 1}),
+        ("Deluxe", "Pepperoni, Bacon, Mushrooms, Olives, Peppers, Onion", PizzaSize.LARGE, 19.50, PizzaCategory.SPECIALTY, {"Pepperoni": 1, "Bacon": 1, "Mushrooms": 1, "Olives": 1, "Peppers": 1, "Onion": 1}),
+        ("Meat Lovers", "Pepperoni, Ham, Bacon", PizzaSize.LARGE, 18.50, PizzaCategory.MEAT, {"Pepperoni": 1, "Ham": 1, "Bacon": 1}),
+        ("Vegetarian", "Mushrooms, Olives, Onion, Peppers, Tomato", PizzaSize.LARGE, 19.50, PizzaCategory.VEGETARIAN, {"Mushrooms": 1, "Olives": 1, "Onion": 1, "Peppers": 1, "Tomato": 1}),
+        ("BBQ Chicken", "Chicken, Red Onion, BBQ Sauce, Cheddar", PizzaSize.LARGE, 19.50, PizzaCategory.MEAT, {"Chicken": 1, "Red Onion": 1, "BBQ Sauce": 1, "Cheddar": 1})
+    ]
+    # (name, price, category)
+    STANDARD_SIDE_DISHES = [
+        ("Caesar Salad", 2.29, SideCategory.APPETIZERS),
+        ("Tossed Salad", 2.29, SideCategory.APPETIZERS),
+        ("Assorted Pop", 1.35, SideCategory.BEVERAGES),
+        ("Assorted Juices", 1.45, SideCategory.BEVERAGES),
+        ("Water", 1.00, SideCategory.BEVERAGES),
+        ("Cookies", 1.00, SideCategory.DESSERTS),
+    ]
+
+    def __init__(self, backend='csv', db_path='pizza_store.db', journal_commit_every=1, load_inventory=True, data_dir='.'):
+        if backend not in ('csv', 'sqlite'):
+            raise ValueError(f"Unknown storage backend '{backend}'.")
         self.actions = []  # List to store actions performed
-        self.inventory_mgr = InventoryManager()
-        self.recipe_mgt = RecipeManagement()
-        self.menu_mgt = MenuManagement()   
-        side_dish_repo = SideDishRepository()
-        self.side_menu_mgt = SideMenuManagement(side_dish_repo)
-        CustomPizzaOrder()
+        self.backend = backend
+        # Every file of the store (CSVs, order journal, databases, snapshot)
+        # lives in data_dir, so one process can run any of several locations.
+        self.data_dir = data_dir
+        self.db_path = self.path(db_path)
+        self.journal_commit_every = journal_commit_every
+        # load_inventory=False leaves the stock empty for snapshot.load_store() to fill.
+        self._load_inventory = load_inventory
+        # Aliases go in before any ingredient name is looked up.
+        self.alias_problems = catalog.load_aliases(self.path(ALIASES_FILE))
+        # Stock held for the counter order being taken (see hold_pizzas).
+        self._holds = []
+
+    def path(self, filename):
+        return os.path.join(self.data_dir, filename)
+
+    # Everything below is created on first use and then kept, so a command
+    # that only prints the menu never opens the order journal, the customer
+    # database or the inventory. The storage backends and the customer,
+    # kitchen and delivery modules are imported the same way.
+
+    @cached_property
+    def db(self):
+        if self.backend != 'sqlite':
+            return None
+        from sqlite_store import SqliteDatabase
+        return SqliteDatabase(self.db_path)
+
+    @cached_property
+    def ingredient_repo(self):
+        if self.db is None:
+            return None  # InventoryManager reads ingredients.csv itself
+        from sqlite_store import SqliteIngredientRepository
+        return SqliteIngredientRepository(self.db)
+
+    @cached_property
+    def recipe_repo(self):
+        if self.db is None:
+            return PizzaRecipeRepository()
+        from sqlite_store import SqlitePizzaRecipeRepository
+        return SqlitePizzaRecipeRepository(self.db)
+
+    @cached_property
+    def menu_repo(self):
+        if self.db is None:
+            return PizzaMenuRepository()
+        from sqlite_store import SqlitePizzaMenuRepository
+        return SqlitePizzaMenuRepository(self.db)
+
+    @cached_property
+    def side_dish_repo(self):
+        if self.db is None:
+            return SideDishRepository()
+        from sqlite_store import SqliteSideDishRepository
+        return SqliteSideDishRepository(self.db)
+
+    @cached_property
+    def order_repo(self):
+        if self.db is None:
+            # Orders are entered one at a time here, so by default make each one
+            # durable immediately; bulk loaders group the fsyncs instead.
+            return OrderRepository(self.path('orders'), commit_every=self.journal_commit_every)
+        from sqlite_store import SqliteOrderRepository
+        return SqliteOrderRepository(self.db)
+
+    @cached_property
+    def inventory_mgr(self):
+        return InventoryManager(self.path('ingredients.csv'), repository=self.ingredient_repo, autoload=self._load_inventory)
+
+    @cached_property
+    def recipe_mgt(self):
+        return RecipeManagement()
+
+    @cached_property
+    def menu_mgt(self):
+        return MenuManagement()
+
+    @cached_property
+    def side_menu_mgt(self):
+        return SideMenuManagement(self.side_dish_repo, self.path('side_dish.csv'))
+
+    @cached_property
+    def availability(self):
+        return AvailabilityService(self.menu_mgt, self.side_menu_mgt, self.inventory_mgr)
+
+    @cached_property
+    def kitchen(self):
+        from kitchen import KitchenScheduler
+        return KitchenScheduler()
+
+    @cached_property
+    def delivery(self):
+        from delivery import DeliverySchedule
+        # The slots taken by orders placed before this run are counted back in.
+        schedule = DeliverySchedule()
+        schedule.load_bookings(self.order_repo.replay())
+        return schedule
+
+    @cached_property
+    def customers(self):
+        from customers import CustomerDirectory
+        # With SQLite the customers go in the store's database, on its connection.
+        return CustomerDirectory(self.db_path if self.db is not None else self.path('customers.db'),
+                                 commit_every=self.journal_commit_every,
+                                 connection=self.db.connection if self.db is not None else None)
+
+    def ingredient_mismatches(self):
+        # Recipe ingredients and build-your-own options the inventory does not
+        # stock but has a close match for, e.g. {'Tomato Slices': ['Tomato']}.
+        # Only the aliases file makes two names the same stock item.
+        from pricing import SAUCES, TOPPINGS
+        names = {name for recipe in self.recipe_mgt.list_recipes() for name in recipe.ingredients}
+        names.update(SAUCES, TOPPINGS)
+        return {name: matches for name, matches in self.inventory_mgr.find_untracked(sorted(names)).items() if matches}
+
+    def close(self):
+        # Flushes and closes whichever of the inventory, journal and customer
+        # directory were opened.
+        created = vars(self)
+        if 'inventory_mgr' in created:
+            self.release_holds()
+            self.inventory_mgr.flush()
+        if 'order_repo' in created:
+            self.order_repo.close()
+        if 'customers' in created:
+            self.customers.close()
 
 
     def print_menu(self, menu_title, options):
@@ -23,6 +170,9 @@ class PizzaStore:
         return input("Please select an option: ")
 
     def handle_csv_input(self, prompt):
+        import csv
+        from io import StringIO
+
         print(prompt)
         ingredients_csv = input()
         ingredients_file_like = StringIO(ingredients_csv)
@@ -49,15 +199,101 @@ class PizzaStore:
 
     def take_order(self):
         customer_info = self.capture_customer_info()
-        pizzas = self.select_pizzas()
-        sides = self.select_sides()
+        last = self.offer_reorder(customer_info)
+        if last is not None:
+            if not self.hold_pizzas(last.pizzas):
+                print("Order not placed.")
+                return None
+            pizzas, sides = last.pizzas, last.sides
+        else:
+            pizzas = self.select_pizzas()
+            sides = self.select_sides()
         delivery_date = input("Delivery Date: ")
         delivery_time = input("Delivery Time: ")
-        return Order(customer_info, delivery_date, delivery_time, pizzas, sides)
-
+        order = Order(customer_info, delivery_date, delivery_time, pizzas, sides)
+        if not self.book_delivery(order):
+            self.release_holds()
+            print("Order not placed.")
+            return None
+        if not self.record_order(order):
+            print("Order not placed: the stock held for it is no longer there.")
+            return None
+        return order
+
+    def hold_pizzas(self, pizzas):
+        # Reserves the ingredients of `pizzas` ((item, quantity) pairs) for the
+        # order being taken, so that no other order can use them meanwhile.
+        # record_order() deducts the holds; release_holds() gives them back.
+        reservation = self.inventory_mgr.reserve_order(Order(None, '', '', list(pizzas), []))
+        if not reservation.success:
+            shortages = ', '.join(f"{name} short by {missing:g}" for name, missing in reservation.shortages.items())
+            print(f"Sorry, not enough stock: {shortages}.")
+            return False
+        self._holds.append(reservation)
+        return True
+
+    def release_holds(self):
+        # Cancels the order being taken: its held stock is available again.
+        holds, self._holds = self._holds, []
+        for reservation in holds:
+            self.inventory_mgr.release(reservation)
+
+    def book_delivery(self, order):
+        # Books a delivery slot, offering the nearest free slots when the
+        # requested one cannot be had; False if the customer takes none.
+        while True:
+            booking = self.schedule_delivery(order)
+            if booking.success:
+                print(f"Delivery booked for the {time.strftime('%Y-%m-%d %H:%M', time.localtime(booking.slot))} slot.")
+                return True
+            print(f"Cannot book that delivery: {booking.reason}.")
+            if not booking.alternatives:
+                return False
+            for number, slot in enumerate(booking.alternatives, 1):
+                print(f"{number}: {time.strftime('%Y-%m-%d %H:%M', time.localtime(slot))}")
+            choice = input("Choose one of these slots (or press Enter to cancel): ")
+            if not (choice.isdigit() and 1 <= int(choice) <= len(booking.alternatives)):
+                return False
+            slot = booking.alternatives[int(choice) - 1]
+            order.delivery_date = time.strftime('%Y-%m-%d', time.localtime(slot))
+            order.delivery_time = time.strftime('%H:%M', time.localtime(slot))
+
+    def schedule_delivery(self, order):
+        # Books the order's delivery slot (see delivery.DeliverySchedule.book);
+        # an order without a date and time is given those of its slot, so the
+        # journal records when it goes out.
+        booking = self.delivery.book(order)
+        if booking.success and not order.delivery_date and not order.delivery_time:
+            order.delivery_date = time.strftime('%Y-%m-%d', time.localtime(booking.slot))
+            order.delivery_time = time.strftime('%H:%M', time.localtime(booking.slot))
+        return booking
+
+    def record_order(self, order, schedule=True):
+        # Deducts the stock held for the order at the counter (hold_pizzas)
+        # and journals it; if the holds can no longer be committed (timed out,
+        # or the stock was taken by another process) they are released and
+        # the order is not recorded: returns False. Bulk ingestion and the
+        # service deduct stock themselves and hold nothing.
+        # schedule=False journals the order without queueing it for the kitchen
+        # (bulk replays and front ends that run their own kitchen).
+        holds, self._holds = self._holds, []
+        if holds and not self.inventory_mgr.commit_all(holds):
+            for reservation in holds:
+                self.inventory_mgr.release(reservation)
+            if order.delivery_slot is not None:
+                self.delivery.unbook(order)
+            return False
+        if order.customer_info:
+            order.customer_info.place_order(order)
+        self.order_repo.append(order)
+        if order.customer_info:
+            self.customers.record_order(order.customer_info, order.order_id)
+        if schedule:
+            self.kitchen.submit(order)
+        return True
 
     def process_recipe_menu(self):
-            recipe_repo = PizzaRecipeRepository()  # Initialize the repository
+            recipe_repo = self.recipe_repo
 
             while True:
                 print("\nRecipe Management Menu:")
@@ -69,12 +305,16 @@ class PizzaStore:
 
                 if selection == "1":
                     name = input("Enter the recipe name: ")
+                    category = input("Enter the category (vegetarian, meat, specialty): ") or None
                     ingredients = self.handle_csv_input("Enter ingredients in CSV format (ingredient_name,amount):")
                     if ingredients:
-                        recipe = PizzaRecipe(name, ingredients)
+                        for ingredient_name, matches in self.inventory_mgr.find_untracked(ingredients).items():
+                            hint = f" Did you mean {', '.join(matches)}?" if matches else ""
+                            print(f"Note: '{ingredient_name}' is not stocked in the inventory.{hint}")
+                        recipe = PizzaRecipe(name, ingredients, category)
                         self.recipe_mgt.add_recipe(recipe)
                         print(f"Recipe '{name}' added.")
-                        recipe_repo.save_recipes(self.recipe_mgt.list_recipes(), 'recipes.csv')
+                        recipe_repo.save_recipes(self.recipe_mgt.list_recipes(), self.path('recipes.csv'))
                     else:
                         print("No valid ingredients provided.")
 
@@ -82,7 +322,7 @@ class PizzaStore:
                     name = input("Enter the recipe name to remove: ")
                     self.recipe_mgt.remove_recipe(name)
                     print(f"Recipe '{name}' removed.")
-                    recipe_repo.save_recipes(self.recipe_mgt.list_recipes(), 'recipes.csv')
+                    recipe_repo.save_recipes(self.recipe_mgt.list_recipes(), self.path('recipes.csv'))
 
                 elif selection == "3":
                     name = input("Enter the recipe name to update: ")
@@ -91,23 +331,22 @@ class PizzaStore:
                         updated = self.recipe_mgt.update_recipe(name, new_ingredients)
                         if updated:
                             print(f"Recipe '{name}' updated.")
-                            recipe_repo.save_recipes(self.recipe_mgt.list_recipes(), 'recipes.csv')
+                            recipe_repo.save_recipes(self.recipe_mgt.list_recipes(), self.path('recipes.csv'))
                         else:
                             print(f"Recipe '{name}' not found.")
                     else:
                         print("No valid ingredients provided.")
 
                 elif selection == "4":
+                    self.availability.rebuild()
                     break
                 else:
                     print("Invalid option. Please try again.")
 
 
     def process_inventory_menu(self):
-                # Create an InventoryManager instance
-        inventory_manager = InventoryManager()
-
-        # Print the initial inventory
+        # The store's own inventory, so changes reach the availability cache.
+        inventory_manager = self.inventory_mgr
 
         # User interface menu
         while True:
@@ -138,8 +377,9 @@ class PizzaStore:
 
         # Print the updated inventory
         inventory_manager.print_inventory()
+        inventory_manager.flush()
     def process_menu_item_menu(self):
-        menu_repo = PizzaMenuRepository()  # Initialize the repository
+        menu_repo = self.menu_repo
 
         while True:
             print("\nMenu Item Management Menu:")
@@ -161,7 +401,7 @@ class PizzaStore:
                     menu_item = PizzaMenuItem(name, description, size, price, category, recipe)
                     self.menu_mgt.add_menu_item(menu_item)
                     print(f"Menu item '{name}' added.")
-                    menu_repo.save_menu_items(self.menu_mgt.list_menu_items(), 'menu_items.csv')
+                    menu_repo.save_menu_items(self.menu_mgt.list_menu_items(), self.path('menu_items.csv'))
                 else:
                     print("Recipe does not exist.")
 
@@ -169,7 +409,7 @@ class PizzaStore:
                 name = input("Enter the menu item name to remove: ")
                 self.menu_mgt.remove_menu_item(name)
                 print(f"Menu item '{name}' removed.")
-                menu_repo.save_menu_items(self.menu_mgt.list_menu_items(), 'menu_items.csv')
+                menu_repo.save_menu_items(self.menu_mgt.list_menu_items(), self.path('menu_items.csv'))
 
             elif selection == "3":
                 name = input("Enter the menu item name to update: ")
@@ -185,11 +425,12 @@ class PizzaStore:
                     updated_menu_item = PizzaMenuItem(name, new_description, new_size, new_price, new_category, new_recipe)
                     self.menu_mgt.update_menu_item(name, updated_menu_item)
                     print(f"Menu item '{name}' updated.")
-                    menu_repo.save_menu_items(self.menu_mgt.list_menu_items(), 'menu_items.csv')
+                    menu_repo.save_menu_items(self.menu_mgt.list_menu_items(), self.path('menu_items.csv'))
                 else:
                     print(f"Menu item '{name}' not found.")
 
             elif selection == "4":
+                self.availability.rebuild()
                 break
             else:
                 print("Invalid option. Please try again.")
@@ -198,12 +439,35 @@ class PizzaStore:
 
     def capture_customer_info(self):
         print("Please enter customer information.")
+        phone = input("Phone number: ")
+        saved = self.customers.find_by_phone(phone)
+        if saved:
+            print(f"Welcome back, {saved.name}! ({saved.email}{', ' + saved.company if saved.company else ''})")
+            if input("Use these details (yes/no)? ").lower() == 'yes':
+                return saved
         name = input("Customer name: ")
         company = input("Company (optional): ")
-        phone = input("Phone number: ")
         email = input("Email address: ")
         customer_info = CustomerInfo(name=name, phone=phone, email=email, company=company)
+        if saved:
+            customer_info.customer_id = saved.customer_id
         return customer_info
+
+    def offer_reorder(self, customer_info):
+        # The customer's last order as a new order, if they want it again.
+        try:
+            last = self.customers.reorder_last(customer_info, self.order_repo, self.menu_mgt, self.side_menu_mgt)
+        except ValueError as error:
+            print(f"The last order cannot be repeated: {error}.")
+            return None
+        if last is None:
+            return None
+        items = [f"{pizza.name} x{quantity}" for pizza, quantity in last.pizza_lines()]
+        items += [f"{side.name} x{quantity}" for side, quantity in last.side_lines()]
+        print(f"Last order: {', '.join(items)} (${last.total():.2f} at today's prices)")
+        if input("Reorder it (yes/no)? ").lower() != 'yes':
+            return None
+        return last
     
 
     
@@ -213,46 +477,29 @@ class PizzaStore:
             print(f"{item.name} - {item.description} - ${item.price}")
         pizza_name = input("Enter the name of the pizza you want to add: ")
         quantity = int(input("Enter the quantity: "))
-        selected_pizza = next((item for item in self.menu_mgt.list_menu_items() if item.name.lower() == pizza_name.lower()), None)
+        selected_pizza = self.menu_mgt.get_menu_item_by_name(pizza_name)
         return [(selected_pizza, quantity)] if selected_pizza else []
 
 
     def populate_standard_pizzas(pizza_store):
-        # Predefined list of standard pizzas
-        standard_pizzas = [
-            ("Pepperoni", "Pepperoni pizza", PizzaSize.LARGE, 15.50, PizzaCategory.MEAT, {"Pepperoni": 1}),
-            ("Hawaiian", "Ham and pineapple pizza", PizzaSize.LARGE, 18.50, PizzaCategory.MEAT, {"Ham": 1, "Pineapple": 1}),
-            ("Deluxe", "Pepperoni, Bacon, Mushrooms, Olives, Peppers, Onion", PizzaSize.LARGE, 19.50, PizzaCategory.SPECIALTY, {"Pepperoni": 1, "Bacon": 1, "Mushrooms": 1, "Olives": 1, "Peppers": 1, "Onion": 1}),
-            ("Meat Lovers", "Pepperoni, Ham, Bacon", PizzaSize.LARGE, 18.50, PizzaCategory.MEAT, {"Pepperoni": 1, "Ham": 1, "Bacon": 1}),
-            ("Vegetarian", "Mushrooms, Olives, Onion, Peppers, Tomato", PizzaSize.LARGE, 19.50, PizzaCategory.VEGETARIAN, {"Mushrooms": 1, "Olives": 1, "Onion": 1, "Peppers": 1, "Tomato": 1}),
-            ("BBQ Chicken", "Chicken, Red Onion, BBQ Sauce, Cheddar", PizzaSize.LARGE, 19.50, PizzaCategory.MEAT, {"Chicken": 1, "Red Onion": 1, "BBQ Sauce": 1, "Cheddar": 1})
-        ]
-        
-        for name, description, size, price, category, ingredients in standard_pizzas:
-            recipe = PizzaRecipe(name, ingredients)
+        for name, description, size, price, category, ingredients in pizza_store.STANDARD_PIZZAS:
+            recipe = PizzaRecipe(name, ingredients, category)
             pizza_store.recipe_mgt.add_recipe(recipe)
             menu_item = PizzaMenuItem(name, description, size, price, category, recipe)
             pizza_store.menu_mgt.add_menu_item(menu_item)
 
 
     def populate_side_dishes(pizza_store):
-        # Predefined list of side dishes
-        side_dishes = [
-            SideItem("Caesar Salad", 2.29, SideCategory.APPETIZERS),
-            SideItem("Tossed Salad", 2.29, SideCategory.APPETIZERS),
-            SideItem("Assorted Pop", 1.35, SideCategory.BEVERAGES),
-            SideItem("Assorted Juices", 1.45, SideCategory.BEVERAGES),
-            SideItem("Water", 1.00, SideCategory.BEVERAGES),
-            SideItem("Cookies", 1.00, SideCategory.DESSERTS),
-        ]
-            
-        for side_item in side_dishes:
-            pizza_store.side_menu_mgt.add_side_item(side_item)
+        # add_side_item saves after every item; write the file once instead.
+        with persistence.batch():
+            for name, price, category in pizza_store.STANDARD_SIDE_DISHES:
+                pizza_store.side_menu_mgt.add_side_item(SideItem(name, price, category))
 
     def select_pizzas(self):
         pizzas = []
+        self.inventory_mgr.refresh()
         print("\n--- Standard Pizzas ---")
-        for menu_item in self.menu_mgt.list_menu_items():
+        for menu_item in self.availability.orderable_menu_items():
             print(f"{menu_item.name} - ${menu_item.price}")
 
         while True:
@@ -261,16 +508,16 @@ class PizzaStore:
                 break
 
             pizza_name = input("Enter the name of the pizza you want to add: ").strip()
-            selected_pizza = None
-            for item in self.menu_mgt.list_menu_items():
-                if item.name.lower() == pizza_name.lower():
-                    selected_pizza = item
-                    break
+            selected_pizza = self.menu_mgt.get_menu_item_by_name(pizza_name)
 
             if selected_pizza:
                 try:
                     quantity = int(input(f"How many of the {selected_pizza.name} pizza would you like to add? "))
-                    pizzas.append((selected_pizza, quantity))
+                    if self.availability.is_available(selected_pizza, quantity):
+                        if self.hold_pizzas([(selected_pizza, quantity)]):
+                            pizzas.append((selected_pizza, quantity))
+                    else:
+                        print(f"Sorry, we can only make {self.availability.max_quantity(selected_pizza):.0f} more {selected_pizza.name} pizza(s) right now.")
                 except ValueError:
                     print("Please enter a valid number.")
             else:
@@ -301,7 +548,7 @@ class PizzaStore:
                 print(f"Side item '{side_name}' not found.")
         return sides
     def process_side_dish_menu(self):
-        side_dish_repo = SideDishRepository()  # Initialize the repository
+        side_dish_repo = self.side_dish_repo
 
         while True:
             print("\nSide Dish Management Menu:")
@@ -314,28 +561,34 @@ class PizzaStore:
             if selection == "1":
                 name = input("Enter the side dish name: ")
                 price = float(input("Enter the price: "))
-                category = input("Enter the category (Appetizers, Desserts, Beverages): ")
-                side_dish = SideItem(name, price, SideCategory[category.upper()])
-                self.side_menu_mgt.add_side_item(side_dish)
+                category = getattr(SideCategory, input("Enter the category (Appetizers, Desserts, Beverages): ").strip().upper(), None)
+                if category is None:
+                    print("Unknown category.")
+                    continue
+                side_dish = SideItem(name, price, category)
+                self.side_menu_mgt.add_side_item(side_dish)  # saves the side dishes
                 print(f"Side dish '{name}' added.")
-                side_dish_repo.save_side_dishes(self.side_menu_mgt.list_side_items(), 'side_dishes.csv')
 
             elif selection == "2":
                 name = input("Enter the side dish name to remove: ")
                 self.side_menu_mgt.remove_side_item(name)
                 print(f"Side dish '{name}' removed.")
-                side_dish_repo.save_side_dishes(self.side_menu_mgt.list_side_items(), 'side_dishes.csv')
+                side_dish_repo.save_side_dishes(self.side_menu_mgt.list_side_items(), self.side_menu_mgt.filename)
 
             elif selection == "3":
                 name = input("Enter the side dish name to update: ")
                 existing_item = self.side_menu_mgt.get_side_item_by_name(name)
                 if existing_item:
                     new_price = float(input("Enter the new price (or press Enter to keep current): ") or existing_item.price)
-                    new_category = input("Enter the new category (Appetizers, Desserts, Beverages) (or press Enter to keep current): ") or existing_item.category.name
-                    updated_side_item = SideItem(name, new_price, SideCategory[new_category.upper()])
+                    new_category = input("Enter the new category (Appetizers, Desserts, Beverages) (or press Enter to keep current): ") or existing_item.category
+                    new_category = getattr(SideCategory, new_category.strip().upper(), None)
+                    if new_category is None:
+                        print("Unknown category.")
+                        continue
+                    updated_side_item = SideItem(name, new_price, new_category)
                     self.side_menu_mgt.update_side_item(name, updated_side_item)
                     print(f"Side dish '{name}' updated.")
-                    side_dish_repo.save_side_dishes(self.side_menu_mgt.list_side_items(), 'side_dishes.csv')
+                    side_dish_repo.save_side_dishes(self.side_menu_mgt.list_side_items(), self.side_menu_mgt.filename)
                 else:
                     print(f"Side dish '{name}' not found.")
 
@@ -353,15 +606,12 @@ class PizzaStore:
         return custom_pizza
 
     def create_order(self):
-        customer_info = self.capture_customer_info()
-        pizzas = self.select_pizzas()
-        sides = self.select_sides()
-        delivery_date = input("Delivery Date: ")
-        delivery_time = input("Delivery Time: ")
-        return Order(customer_info, delivery_date, delivery_time, pizzas, sides)  
+        return self.take_order()
     def take_and_print_order(pizza_store):
         # Take an order and print its summary
         order = pizza_store.take_order()
+        if order is not None:
+            pizza_store.print_order_summary(order)
 
     def print_order_summary(self,order):
         print("\nOrder Summary:")
@@ -381,6 +631,12 @@ class PizzaStore:
         for side, quantity in order.sides:
             print(f"  - {side.name} x{quantity}")
 
+        print(f"\nSubtotal: ${order.subtotal():.2f}")
+        print(f"Tax: ${order.tax():.2f}")
+        print(f"Total: ${order.total():.2f}")
+        ready_at = self.kitchen.predicted_completion(order)
+        if ready_at is not None:
+            print(f"Estimated ready: {time.strftime('%Y-%m-%d %H:%M', time.localtime(ready_at))}")
 
         print("\nActions Performed:")
         for action in self.actions:
@@ -389,18 +645,16 @@ class PizzaStore:
        
 def load_data(pizza_store):
     # ingredient_repo = IngredientRepository()
-    recipe_repo = PizzaRecipeRepository()
-    menu_repo = PizzaMenuRepository()
-    side_dish_repo = SideDishRepository()
-    side_menu_mgmt = SideMenuManagement(side_dish_repo)
+    recipe_repo = pizza_store.recipe_repo
+    menu_repo = pizza_store.menu_repo
 
     # pizza_store.inventory_mgr.ingredients = ingredient_repo.load_ingredients('ingredients.csv')
-    inventory_manager = InventoryManager()
 
     # Print the initial inventory
-    inventory_manager.print_inventory()
-    pizza_store.recipe_mgt.recipes = recipe_repo.load_pizza_recipes('recipes.csv')
-    pizza_store.menu_mgt.menu_items = menu_repo.load_menu_items('menu_items.csv', pizza_store.recipe_mgt)
+    pizza_store.inventory_mgr.print_inventory()
+    pizza_store.recipe_mgt.recipes = recipe_repo.load_pizza_recipes(pizza_store.path('recipes.csv'))
+    pizza_store.menu_mgt.menu_items = menu_repo.load_menu_items(pizza_store.path('menu_items.csv'), pizza_store.recipe_mgt)
+    pizza_store.side_menu_mgt.side_items = pizza_store.side_dish_repo.load_side_dishes(pizza_store.path('side_dish.csv'))
 
 
 def print_header():
@@ -451,12 +705,46 @@ def print_header():
 
 
 
-def main(): 
-    pizza_store = PizzaStore()
+def print_store_menu(pizza_store):
+    for item in pizza_store.menu_mgt.list_menu_items():
+        print(f"{item.name} - {item.description} - ${item.price:.2f}")
+    for side in pizza_store.side_menu_mgt.list_side_items():
+        print(f"{side.name} - ${side.price:.2f}")
+
+
+def main(argv=None): 
+    from instrumentation import configure_from_environment
+    from snapshot import load_store, refresh_snapshot
+
+    parser = argparse.ArgumentParser(description="Pizza store order entry and management.")
+    parser.add_argument('command', nargs='?', choices=('menu', 'reorder'),
+                        help="print the menu, or the ingredients due for reorder, and exit (default: interactive)")
+    parser.add_argument('--sqlite', action='store_true', help="use the SQLite storage backend")
+    parser.add_argument('--data-dir', default='.', help="directory holding this store's files (default: current)")
+    args = parser.parse_args(argv)
+
+    configure_from_environment()
+    backend = 'sqlite' if args.sqlite else 'csv'
+    # The inventory, standard pizzas and sides come from the snapshot when
+    # their sources are unchanged (see snapshot.py).
+    pizza_store = PizzaStore(backend, load_inventory=False, data_dir=args.data_dir)
+    snapshot_file = pizza_store.path(SNAPSHOT_FILE)
+    if args.command == 'menu':
+        load_store(pizza_store, snapshot_file, inventory=False)
+        print_store_menu(pizza_store)
+        return
+    if args.command == 'reorder':
+        load_store(pizza_store, snapshot_file, menu=False)
+        pizza_store.inventory_mgr.check_reorder_levels()
+        return
+    load_store(pizza_store, snapshot_file)
     print_header()    
+    for problem in pizza_store.alias_problems:
+        print(f"Note: {problem}")
+    for ingredient_name, matches in pizza_store.ingredient_mismatches().items():
+        print(f"Note: '{ingredient_name}' is not stocked in the inventory. Did you mean {', '.join(matches)}? "
+              f"(list it in {ALIASES_FILE} if it is the same item)")
     # load_data(pizza_store)
-    pizza_store.populate_standard_pizzas()
-    pizza_store.populate_side_dishes()
 
     order = None
     selected_pizzas = []  # Initialize list for selected pizzas
@@ -482,21 +770,40 @@ def main():
         elif selection == "3":
             pizza_store.process_menu_item_menu()
         if selection == "4":
+            # A new selection replaces the old one, and its held stock.
+            pizza_store.release_holds()
             selected_pizzas = pizza_store.select_pizzas()
         elif selection == "5":
             # Build custom pizza
             custom_pizza = pizza_store.build_custom_pizza()
+            if pizza_store.hold_pizzas([(custom_pizza, 1)]):
+                selected_pizzas.append((custom_pizza, 1))
         elif selection == "6":
             # Add side dish
             selected_sides = pizza_store.select_sides()
         elif selection == "7":
             # Enter customer information
             customer_info = pizza_store.capture_customer_info()
+            if not selected_pizzas and not selected_sides:
+                last = pizza_store.offer_reorder(customer_info)
+                if last is not None and pizza_store.hold_pizzas(last.pizzas):
+                    selected_pizzas, selected_sides = last.pizzas, last.sides
             # Ask for delivery date and time
             delivery_date = input("Enter Delivery Date (e.g., 2023-01-30): ")
             delivery_time = input("Enter Delivery Time (e.g., 18:30): ")
             # Create an order with the selected items and customer info
             order = Order(customer_info, delivery_date, delivery_time, selected_pizzas, selected_sides)
+            # The selection (and its held stock) is kept for another try when
+            # the order is not placed.
+            if not pizza_store.book_delivery(order):
+                print("Order not placed.")
+                order = None
+            elif not pizza_store.record_order(order):
+                print("Order not placed: the stock held for it is no longer there.")
+                order = None
+                selected_pizzas, selected_sides = [], []
+            else:
+                selected_pizzas, selected_sides = [], []
         elif selection == "8":
             # Display order details
             if order:
@@ -505,6 +812,8 @@ def main():
                 print("No order has been created yet.")
         elif selection == "9":
             # Exiting the program
+            refresh_snapshot(pizza_store, snapshot_file)
+            pizza_store.close()
             print("Exiting the program.")
             break
         else:
@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from bussinese import RecipeManagement
+from persistence import atomic_write
+
+# End-of-day sales and ingredient-usage reports.
+#
+# Journaled orders stream through a chain of generators
+#
+#     replay (orders after the checkpoint) -> day/hour placed -> daily rollups
+#
+# so memory depends on the number of days and menu items reported, never on
+# the number of orders or lines. Rollups are kept per day in a checkpoint
+# file, together with the id of the last order they include; the next run
+# replays only the orders journaled since and adds them to the saved days,
+# and reports for a day, a month or any range merge the saved days.
+#
+# Pizza lines are expanded into ingredient use through the recipe amounts
+# the journal recorded with them, or for older journals through the recipe
+# of that name on file (PizzaRecipe.ingredients). Old lines whose recipe is
+# not on file, such as custom pizzas, are counted per recipe name instead.
+
+CHECKPOINT_VERSION = 1
+
+
+class SalesRollup:
+    # Totals for one day, or for several days merged.
+
+    _COUNTERS = ('items', 'item_revenue', 'categories', 'category_revenue', 'sizes', 'size_revenue',
+                 'hours', 'hour_revenue', 'sides', 'side_revenue', 'ingredients', 'unexpanded')
+
+    def __init__(self):
+        self.orders = 0
+        self.orders_with_sides = 0
+        self.revenue = 0.0
+        self.items = Counter()  # (name, size) -> pizzas sold
+        self.item_revenue = Counter()
+        self.categories = Counter()  # pizza category -> pizzas sold
+        self.category_revenue = Counter()
+        self.sizes = Counter()  # size -> pizzas sold
+        self.size_revenue = Counter()
+        self.hours = Counter()  # hour placed -> orders
+        self.hour_revenue = Counter()
+        self.sides = Counter()  # side name -> sold
+        self.side_revenue = Counter()
+        self.ingredients = Counter()  # ingredient name -> amount used
+        self.unexpanded = Counter()  # recipe name -> pizzas whose recipe is not on file
+
+    @property
+    def pizzas(self) -> int:
+        return sum(self.items.values())
+
+    @property
+    def attach_rate(self) -> float:
+        # Share of orders with at least one side dish.
+        return self.orders_with_sides / self.orders if self.orders else 0.0
+
+    @property
+    def average_order(self) -> float:
+        return self.revenue / self.orders if self.orders else 0.0
+
+    def add(self, record: dict, hour: int, ingredients_of) -> None:
+        subtotal = 0.0
+        for name, size, category, price, quantity, recipe_name, *recorded in record['p']:
+            amount = price * quantity
+            subtotal += amount
+            self.items[(name, size)] += quantity
+            self.item_revenue[(name, size)] += amount
+            self.categories[category] += quantity
+            self.category_revenue[category] += amount
+            self.sizes[size] += quantity
+            self.size_revenue[size] += amount
+            recipe = recorded[0] if recorded else ingredients_of(recipe_name)
+            if recipe is None:
+                self.unexpanded[recipe_name] += quantity
+                continue
+            for ingredient, used in recipe.items():
+                self.ingredients[ingredient] += used * quantity
+        for name, _, price, quantity in record['s']:
+            subtotal += price * quantity
+            self.sides[name] += quantity
+            self.side_revenue[name] += price * quantity
+        total = record.get('t')  # journals written before totals were recorded lack it
+        total = subtotal if total is None else total
+        self.orders += 1
+        self.orders_with_sides += bool(record['s'])
+        self.revenue += total
+        self.hours[hour] += 1
+        self.hour_revenue[hour] += total
+
+    def merge(self, other: 'SalesRollup') -> 'SalesRollup':
+        self.orders += other.orders
+        self.orders_with_sides += other.orders_with_sides
+        self.revenue += other.revenue
+        for name in self._COUNTERS:
+            getattr(self, name).update(getattr(other, name))
+        return self
+
+    def to_dict(self) -> dict:
+        # JSON keys must be strings: (name, size) and hour keys become lists of pairs.
+        data = {'orders': self.orders, 'orders_with_sides': self.orders_with_sides, 'revenue': self.revenue}
+        for name in self._COUNTERS:
+            data[name] = [[list(key) if isinstance(key, tuple) else key, value]
+                          for key, value in getattr(self, name).items()]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SalesRollup':
+        rollup = cls()
+        rollup.orders = data['orders']
+        rollup.orders_with_sides = data['orders_with_sides']
+        rollup.revenue = data['revenue']
+        for name in cls._COUNTERS:
+            getattr(rollup, name).update({tuple(key) if isinstance(key, list) else key: value
+                                          for key, value in data[name]})
+        return rollup
+
+
+def recipe_ingredients(recipe_mgt: RecipeManagement):
+    # Recipe name -> its ingredients dict (None if unknown), memoized, since a
+    # day's lines share a handful of recipes.
+    cache = {}
+
+    def ingredients_of(recipe_name: str) -> Optional[dict]:
+        if recipe_name not in cache:
+            recipe = recipe_mgt.get_recipe_by_name(recipe_name) if recipe_name else None
+            cache[recipe_name] = dict(recipe.ingredients) if recipe is not None else None
+        return cache[recipe_name]
+    return ingredients_of
+
+
+def placed_day_hour(records: Iterable[dict]) -> Iterator[Tuple[str, int, dict]]:
+    for record in records:
+        placed = datetime.fromtimestamp(record['ts'] or 0)
+        yield placed.strftime('%Y-%m-%d'), placed.hour, record
+
+
+def rollup_days(records: Iterable[dict], recipe_mgt: RecipeManagement,
+                days: Optional[Dict[str, SalesRollup]] = None) -> Tuple[Dict[str, SalesRollup], int]:
+    # Adds the records to per-day rollups; returns them and the last order id seen.
+    days = {} if days is None else days
+    ingredients_of = recipe_ingredients(recipe_mgt)
+    last_id = 0
+    for day, hour, record in placed_day_hour(records):
+        rollup = days.get(day)
+        if rollup is None:
+            rollup = days[day] = SalesRollup()
+        rollup.add(record, hour, ingredients_of)
+        last_id = max(last_id, record['id'])
+    return days, last_id
+
+
+def _write_json(filename: str, data: dict) -> None:
+    atomic_write(filename, lambda temp_file: json.dump(data, temp_file, separators=(',', ':')))
+
+
+class SalesAnalytics:
+    # Daily rollups of an order repository, kept up to date incrementally.
+
+    def __init__(self, order_repo, recipe_mgt: RecipeManagement, checkpoint: Optional[str] = 'analytics.json'):
+        self._order_repo = order_repo
+        self._recipe_mgt = recipe_mgt
+        self.checkpoint = checkpoint
+        self.days: Dict[str, SalesRollup] = {}
+        self.last_id = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return
+        with open(self.checkpoint) as checkpoint_file:
+            data = json.load(checkpoint_file)
+        if data.get('version') != CHECKPOINT_VERSION:
+            return  # written by another version; rebuilt on the next update()
+        self.days = {day: SalesRollup.from_dict(rollup) for day, rollup in data['days'].items()}
+        self.last_id = data['last_id']
+
+    def save(self) -> None:
+        if self.checkpoint:
+            _write_json(self.checkpoint, {'version': CHECKPOINT_VERSION, 'last_id': self.last_id,
+                                          'days': {day: rollup.to_dict() for day, rollup in sorted(self.days.items())}})
+
+    def rebuild(self) -> int:
+        self.days = {}
+        self.last_id = 0
+        return self.update()
+
+    def update(self) -> int:
+        # Rolls up the orders journaled since the checkpoint; returns how many.
+        if self.last_id > self._order_repo.last_id:
+            # The checkpoint is ahead of the repository (a different or reset
+            # store), so its days cannot be trusted.
+            self.days = {}
+            self.last_id = 0
+        before = sum(rollup.orders for rollup in self.days.values())
+        self.days, last_id = rollup_days(self._order_repo.replay(self.last_id), self._recipe_mgt, self.days)
+        self.last_id = max(self.last_id, last_id)
+        added = sum(rollup.orders for rollup in self.days.values()) - before
+        if added:
+            self.save()
+        return added
+
+    def day(self, day: str) -> SalesRollup:
+        return self.days.get(day) or SalesRollup()
+
+    def report(self, start: str, end: str) -> SalesRollup:
+        # Merged rollup of the days from start to end, inclusive (YYYY-MM-DD).
+        total = SalesRollup()
+        for day, rollup in self.days.items():
+            if start <= day <= end:
+                total.merge(rollup)
+        return total
+
+
+def _top(counter: Counter, revenue: Counter, limit: Optional[int] = None):
+    return [(key, count, revenue.get(key, 0.0)) for key, count in counter.most_common(limit)]
+
+
+def format_report(rollup: SalesRollup, title: str, limit: int = 10) -> str:
+    lines = [title, '=' * len(title)]
+    lines.append(f"Orders: {rollup.orders}   Pizzas: {rollup.pizzas}   Revenue: ${rollup.revenue:,.2f}   "
+                 f"Average order: ${rollup.average_order:,.2f}")
+    lines.append(f"Side dish attach rate: {rollup.attach_rate:.1%}")
+    lines.append("\nTop pizzas:")
+    lines += [f"  {name} ({size}): {count} sold, ${amount:,.2f}"
+              for (name, size), count, amount in _top(rollup.items, rollup.item_revenue, limit)]
+    lines.append("\nBy category:")
+    lines += [f"  {category}: {count} sold, ${amount:,.2f}"
+              for category, count, amount in _top(rollup.categories, rollup.category_revenue)]
+    lines.append("\nBy size:")
+    lines += [f"  {size}: {count} sold, ${amount:,.2f}" for size, count, amount in _top(rollup.sizes, rollup.size_revenue)]
+    lines.append("\nBy hour placed:")
+    lines += [f"  {hour:02d}:00  {rollup.hours[hour]} orders, ${rollup.hour_revenue[hour]:,.2f}"
+              for hour in sorted(rollup.hours)]
+    lines.append("\nSide dishes:")
+    lines += [f"  {name}: {count} sold, ${amount:,.2f}" for name, count, amount in _top(rollup.sides, rollup.side_revenue)]
+    lines.append("\nIngredients used:")
+    lines += [f"  {name}: {amount:g}" for name, amount in sorted(rollup.ingredients.items())]
+    if rollup.unexpanded:
+        lines.append("\nPizzas without a recipe on file (not in ingredient use):")
+        lines += [f"  {name}: {count}" for name, count in rollup.unexpanded.most_common()]
+    return '\n'.join(lines)
+
+
+def _date_range(args) -> Tuple[str, str]:
+    if args.month:
+        first = datetime.strptime(args.month, '%Y-%m').date()
+        last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        return first.isoformat(), last.isoformat()
+    end = args.to or date.today().isoformat()
+    return args.start or end, end
+
+
+def main(argv=None) -> int:
+    from Presentation import PizzaStore
+
+    parser = argparse.ArgumentParser(description="Sales and ingredient-usage report from the journaled orders.")
+    parser.add_argument('--from', dest='start', help="first day, YYYY-MM-DD (default: the --to day)")
+    parser.add_argument('--to', help="last day, YYYY-MM-DD (default: today)")
+    parser.add_argument('--month', help="a whole month, YYYY-MM, instead of --from/--to")
+    parser.add_argument('--checkpoint', help="rollup checkpoint file (default: analytics.json in the data directory)")
+    parser.add_argument('--rebuild', action='store_true', help="ignore the checkpoint and replay every order")
+    parser.add_argument('--sqlite', action='store_true', help="use the SQLite storage backend")
+    parser.add_argument('--data-dir', default='.', help="directory holding the store's files (default: current)")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    start, end = _date_range(args)
+    pizza_store = PizzaStore('sqlite' if args.sqlite else 'csv', data_dir=args.data_dir)
+    pizza_store.populate_standard_pizzas()
+    try:
+        for recipe in pizza_store.recipe_repo.load_pizza_recipes(pizza_store.path('recipes.csv')):
+            if pizza_store.recipe_mgt.get_recipe_by_name(recipe.name) is None:
+                pizza_store.recipe_mgt.add_recipe(recipe)
+    except FileNotFoundError:
+        pass
+    try:
+        analytics = SalesAnalytics(pizza_store.order_repo, pizza_store.recipe_mgt,
+                                   args.checkpoint or pizza_store.path('analytics.json'))
+        added = analytics.rebuild() if args.rebuild else analytics.update()
+        rollup = analytics.report(start, end)
+    finally:
+        pizza_store.close()
+    if args.json:
+        print(json.dumps(dict(rollup.to_dict(), start=start, end=end, attach_rate=rollup.attach_rate)))
+    else:
+        print(f"({added} new orders rolled up, through order {analytics.last_id})", file=sys.stderr)
+        print(format_report(rollup, f"Sales {start}" if start == end else f"Sales {start} to {end}"))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import math
+from typing import Dict, List, Optional
+
+from catalog import catalog
+from bussinese import InventoryManager, MenuManagement, PizzaMenuItem, SideItem, SideMenuManagement
+
+
+class AvailabilityService:
+    # Caches, per menu item, how many can still be made from current stock.
+    #
+    # Entries are computed the first time an item is looked at and kept up to
+    # date from InventoryManager change notifications: only items whose recipe
+    # uses a changed ingredient are recomputed. Ingredients the inventory does
+    # not track never limit an item, and side items have no recipe, so they
+    # are always available. Call rebuild() after recipes or menu items change.
+
+    def __init__(self, menu_mgt: MenuManagement, side_menu_mgt: SideMenuManagement, inventory_mgr: InventoryManager):
+        self._menu_mgt = menu_mgt
+        self._side_menu_mgt = side_menu_mgt
+        self._inventory_mgr = inventory_mgr
+        self._max_quantity: Dict[int, float] = {}   # id(menu item) -> producible count
+        self._items: Dict[int, PizzaMenuItem] = {}
+        self._by_ingredient: Dict[int, Dict[int, PizzaMenuItem]] = {}  # ingredient id -> items using it
+        inventory_mgr.add_listener(self._on_inventory_change)
+
+    def close(self) -> None:
+        self._inventory_mgr.remove_listener(self._on_inventory_change)
+
+    def rebuild(self) -> None:
+        self._max_quantity.clear()
+        self._items.clear()
+        self._by_ingredient.clear()
+        for item in self._menu_mgt.list_menu_items():
+            self._track(item)
+
+    def _compute(self, item: PizzaMenuItem) -> float:
+        count = math.inf
+        recipe = item.recipe
+        for ingredient_id, amount in zip(recipe.ingredient_ids, recipe.amounts):
+            available = self._inventory_mgr.available_by_id(ingredient_id)
+            if available is not None and amount > 0:
+                count = min(count, math.floor(max(available, 0) / amount))
+        return count
+
+    def _track(self, item: PizzaMenuItem) -> float:
+        key = id(item)
+        if key not in self._items:
+            self._items[key] = item
+            for ingredient_id in item.recipe.ingredient_ids:
+                self._by_ingredient.setdefault(ingredient_id, {})[key] = item
+        count = self._max_quantity[key] = self._compute(item)
+        return count
+
+    def _on_inventory_change(self, names: Optional[List[str]]) -> None:
+        if names is None:
+            for key, item in self._items.items():
+                self._max_quantity[key] = self._compute(item)
+            return
+        affected = {}
+        for name in names:
+            affected.update(self._by_ingredient.get(catalog.lookup(name), {}))
+        for key, item in affected.items():
+            self._max_quantity[key] = self._compute(item)
+
+    def max_quantity(self, item) -> float:
+        if isinstance(item, SideItem):
+            return math.inf
+        count = self._max_quantity.get(id(item))
+        if count is None or self._items.get(id(item)) is not item:
+            count = self._track(item)
+        return count
+
+    def is_available(self, item, quantity: int = 1) -> bool:
+        return self.max_quantity(item) >= quantity
+
+    def orderable_menu_items(self) -> List[PizzaMenuItem]:
+        return [item for item in self._menu_mgt.list_menu_items() if self.max_quantity(item) >= 1]
+
+    def orderable_side_items(self) -> List[SideItem]:
+        return [item for item in self._side_menu_mgt.list_side_items() if self.max_quantity(item) >= 1]
@@ -0,0 +1,256 @@
+# Micro-benchmarks of the hot paths, on synthetic data of a chosen size.
+# Run from the repository root:
+#
+#     python benchmarks/hot_paths.py                          # default sizes
+#     python benchmarks/hot_paths.py -n 5000 -m 2000 -k 4000 -q 20000 -o after.json
+#     python benchmarks/hot_paths.py -o after.json --compare before.json
+#     python benchmarks/hot_paths.py --only lookup. --only order.
+#
+# Every case is timed call by call and reported as ops/second (calls divided
+# by the time spent in them) with p50/p99 latencies. The data is generated
+# from --seed, so two runs with the same arguments do the same work; -o saves
+# the results as JSON, and --compare prints the change against a saved run
+# and exits with status 1 if any case got slower by more than --tolerance.
+# A saved run of other sizes or seed is refused (status 2), since its
+# numbers are not comparable. Each case draws its random inputs from its own
+# generator, so --only runs do the same work as the full run.
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bussinese import (CustomerInfo, Ingredient, InventoryManager, MenuManagement, Order, PizzaCategory, PizzaMenuItem,
+                       PizzaRecipe, PizzaSize, RecipeManagement, SideCategory, SideItem, SideMenuManagement)
+from Datalayer import IngredientRepository, OrderRepository, PizzaMenuRepository, PizzaRecipeRepository, SideDishRepository
+
+SIZES = [PizzaSize.SMALL, PizzaSize.MEDIUM, PizzaSize.LARGE]
+CATEGORIES = [PizzaCategory.VEGETARIAN, PizzaCategory.MEAT, PizzaCategory.SPECIALTY]
+SIDE_CATEGORIES = [SideCategory.APPETIZERS, SideCategory.DESSERTS, SideCategory.BEVERAGES]
+WORDS = ['Basil', 'Smoked', 'Garlic', 'Spicy', 'Roasted', 'Sweet', 'Aged', 'Wild', 'Fresh', 'Red', 'Green', 'Golden']
+NOUNS = ['Pepper', 'Onion', 'Cheese', 'Ham', 'Olive', 'Mushroom', 'Tomato', 'Chicken', 'Sausage', 'Pineapple', 'Bacon']
+
+
+class SyntheticStore:
+    # N ingredients, M recipes of 3-8 ingredients each, K menu items over those
+    # recipes in the three sizes, a few dozen sides, and Q random orders, all
+    # written to CSV files in a temporary directory through the repositories.
+
+    def __init__(self, ingredients: int, recipes: int, menu_items: int, orders: int, seed: int = 0):
+        rng = random.Random(seed)
+        self.directory = tempfile.mkdtemp(prefix='pizza-bench-')
+        self.ingredient_names = [f"{rng.choice(WORDS)} {rng.choice(NOUNS)} {i}" for i in range(ingredients)]
+        self.ingredients = [Ingredient(name, 1e9, 'kg', 10) for name in self.ingredient_names]
+        self.recipes = [PizzaRecipe(f"{rng.choice(WORDS)} {rng.choice(NOUNS)} Pizza {i}",
+                                    {name: float(rng.randint(1, 3)) for name in rng.sample(self.ingredient_names, rng.randint(3, 8))},
+                                    rng.choice(CATEGORIES))
+                        for i in range(recipes)]
+        self.menu_items = []
+        for i in range(menu_items):
+            recipe = self.recipes[i // len(SIZES) % len(self.recipes)]
+            self.menu_items.append(PizzaMenuItem(recipe.name, f"Synthetic pizza {i}", SIZES[i % len(SIZES)],
+                                                 round(rng.uniform(8, 25), 2), recipe.category, recipe))
+        self.sides = [SideItem(f"{rng.choice(WORDS)} Side {i}", round(rng.uniform(1, 6), 2), rng.choice(SIDE_CATEGORIES))
+                      for i in range(40)]
+        self.orders = []
+        for i in range(orders):
+            customer = CustomerInfo(f"Customer {i}", f"510-555-{i % 10000:04d}", f"c{i}@example.com")
+            pizzas = [(rng.choice(self.menu_items), rng.randint(1, 3)) for _ in range(rng.randint(1, 4))]
+            sides = [(rng.choice(self.sides), 1) for _ in range(rng.randint(0, 2))]
+            self.orders.append(Order(customer, '2024-05-01', '18:30', pizzas, sides))
+        self.seed = seed
+        IngredientRepository().save_ingredients(self.ingredients, self.path('ingredients.csv'))
+        PizzaRecipeRepository().save_recipes(self.recipes, self.path('recipes.csv'))
+        PizzaMenuRepository().save_menu_items(self.menu_items, self.path('menu_items.csv'))
+        SideDishRepository().save_side_dishes(self.sides, self.path('side_dish.csv'))
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def recipe_mgt(self) -> RecipeManagement:
+        recipe_mgt = RecipeManagement()
+        recipe_mgt.recipes = list(self.recipes)
+        return recipe_mgt
+
+    def menu_mgt(self) -> MenuManagement:
+        menu_mgt = MenuManagement()
+        menu_mgt.menu_items = list(self.menu_items)
+        return menu_mgt
+
+    def side_menu_mgt(self) -> SideMenuManagement:
+        side_menu_mgt = SideMenuManagement(None)
+        side_menu_mgt.side_items = list(self.sides)
+        return side_menu_mgt
+
+    def inventory(self, flush_every=1) -> InventoryManager:
+        shutil.copy(self.path('ingredients.csv'), self.path('inventory.csv'))
+        return InventoryManager(self.path('inventory.csv'), flush_every=flush_every)
+
+    def case_rng(self, name: str) -> random.Random:
+        return random.Random(f"{self.seed}:{name}")
+
+    def mixed_case(self, rng: random.Random, names, count):
+        # Random names from the list, in the casings users type.
+        return [rng.choice((str.lower, str.upper, str.title))(rng.choice(names)) for _ in range(count)]
+
+    def close(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def time_calls(function, arguments) -> list:
+    # Latency of each call in seconds.
+    latencies = []
+    clock = time.perf_counter
+    for argument in arguments:
+        started = clock()
+        function(argument)
+        latencies.append(clock() - started)
+    return latencies
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(latencies) -> dict:
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {'ops': len(latencies), 'ops_per_sec': len(latencies) / total if total else float('inf'),
+            'p50_us': percentile(latencies, 0.50) * 1e6, 'p99_us': percentile(latencies, 0.99) * 1e6}
+
+
+def cases(store: SyntheticStore, repeat: int):
+    # (name, setup); setup() returns (function, arguments) and the function is
+    # called once per argument. Nothing is built for cases that are skipped.
+    # The managers shared by several cases are built once, on first use.
+    recipe_mgt, menu_mgt = functools.lru_cache()(store.recipe_mgt), functools.lru_cache()(store.menu_mgt)
+    side_menu_mgt, inventory = functools.lru_cache()(store.side_menu_mgt), functools.lru_cache()(store.inventory)
+
+    def names(case, candidates):
+        return store.mixed_case(store.case_rng(case), candidates, max(repeat * 100, 1000))
+
+    load_runs = range(repeat)
+    yield ('load.ingredients', lambda: (lambda _: IngredientRepository().load_ingredients(store.path('ingredients.csv')),
+                                        load_runs))
+    yield ('load.recipes', lambda: (lambda _: PizzaRecipeRepository().load_pizza_recipes(store.path('recipes.csv')),
+                                    load_runs))
+    yield ('load.menu_items', lambda: (lambda _: PizzaMenuRepository().load_menu_items(store.path('menu_items.csv'),
+                                                                                       recipe_mgt()), load_runs))
+    yield ('load.side_dishes', lambda: (lambda _: SideDishRepository().load_side_dishes(store.path('side_dish.csv')),
+                                        load_runs))
+    yield ('load.inventory', lambda: (lambda _: InventoryManager(store.path('ingredients.csv')), load_runs))
+
+    yield ('lookup.ingredient', lambda: (inventory().get_ingredient, names('lookup.ingredient', store.ingredient_names)))
+    yield ('lookup.recipe', lambda: (recipe_mgt().get_recipe_by_name,
+                                     names('lookup.recipe', [r.name for r in store.recipes])))
+    yield ('lookup.menu_item', lambda: (menu_mgt().get_menu_item_by_name,
+                                        names('lookup.menu_item', [item.name for item in store.menu_items])))
+    yield ('lookup.side_item', lambda: (side_menu_mgt().get_side_item_by_name,
+                                        names('lookup.side_item', [s.name for s in store.sides])))
+
+    def search_terms():
+        rng = store.case_rng('search.recipes')
+        return [rng.choice(WORDS + NOUNS).lower() for _ in range(max(repeat * 10, 100))]
+    yield ('search.recipes', lambda: (recipe_mgt().search_recipes, search_terms()))
+
+    orders = store.orders
+    # Every call writes the inventory file (the default flush_every=1).
+    yield ('inventory.use_ingredient', lambda: (inventory().use_ingredient,
+                                                [pizza.recipe.ingredients for order in orders[:repeat * 20]
+                                                 for pizza, _ in order.pizza_lines()]))
+    yield ('inventory.use_ingredient_buffered', lambda: (store.inventory(flush_every=None).use_ingredient,
+                                                         [pizza.recipe.ingredients for order in orders
+                                                          for pizza, _ in order.pizza_lines()]))
+    yield ('inventory.use_ingredients_bulk[100]', lambda: (store.inventory().use_ingredients_bulk,
+                                                           [orders[i:i + 100] for i in range(0, len(orders), 100)]))
+
+    def place(order):
+        placed = Order(order.customer_info, order.delivery_date, order.delivery_time, [], [])
+        for pizza, quantity in order.pizza_lines():
+            placed.add_pizza(pizza, quantity)
+        for side, quantity in order.side_lines():
+            placed.add_side_dish(side, quantity)
+        return placed.total()
+    yield ('order.build_and_total', lambda: (place, orders))
+    yield ('order.generate_order_slip', lambda: (lambda order: order.generate_order_slip(), orders))
+    yield ('order.journal_append', lambda: (OrderRepository(store.path('orders'), commit_every=32).append, orders))
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    # Prints the change in ops/s per case; True if none regressed beyond tolerance.
+    ok = True
+    print(f"\n{'case':<40}{'before':>14}{'after':>14}{'change':>9}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = result['ops_per_sec'] / before['ops_per_sec'] - 1
+        flag = ''
+        if change < -tolerance:
+            flag, ok = '  REGRESSION', False
+        print(f"{name:<40}{before['ops_per_sec']:>14,.0f}{result['ops_per_sec']:>14,.0f}{change:>+9.0%}{flag}")
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time the store's hot paths on synthetic data.")
+    parser.add_argument('-n', '--ingredients', type=int, default=500)
+    parser.add_argument('-m', '--recipes', type=int, default=200)
+    parser.add_argument('-k', '--menu-items', type=int, default=600)
+    parser.add_argument('-q', '--orders', type=int, default=5000)
+    parser.add_argument('-r', '--repeat', type=int, default=20, help="runs of each loader; scales the other cases too")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', action='append', help="run only cases starting with this prefix (repeatable)")
+    parser.add_argument('-o', '--output', help="save the results to this JSON file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed ops/s drop before a case counts as slower")
+    args = parser.parse_args(argv)
+
+    parameters = {'ingredients': args.ingredients, 'recipes': args.recipes, 'menu_items': args.menu_items,
+                  'orders': args.orders, 'repeat': args.repeat, 'seed': args.seed}
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        saved = baseline.get('parameters')
+        if saved is None:
+            print(f"warning: {args.compare} does not record its parameters; the comparison may not be like for like",
+                  file=sys.stderr)
+        elif saved != parameters:
+            differences = ', '.join(f"{name} {saved.get(name)} -> {value}" for name, value in parameters.items()
+                                    if saved.get(name) != value)
+            print(f"{args.compare} was run with other parameters ({differences}); not comparing.", file=sys.stderr)
+            return 2
+
+    store = SyntheticStore(args.ingredients, args.recipes, args.menu_items, args.orders, args.seed)
+    results = {}
+    try:
+        print(f"{'case':<40}{'ops':>8}{'ops/s':>14}{'p50 (us)':>12}{'p99 (us)':>12}")
+        for name, setup in cases(store, args.repeat):
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            function, arguments = setup()
+            result = results[name] = summarize(time_calls(function, arguments))
+            print(f"{name:<40}{result['ops']:>8}{result['ops_per_sec']:>14,.0f}{result['p50_us']:>12.1f}{result['p99_us']:>12.1f}")
+    finally:
+        store.close()
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(), 'timestamp': time.time(),
+                       'parameters': parameters,
+                       'results': results}, output, indent=2)
+    if baseline is not None and not compare(results, baseline['results'], args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
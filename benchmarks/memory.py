@@ -0,0 +1,94 @@
+# Per-object memory of the domain classes versus their previous dict-backed
+# layout. Run from the repository root: python benchmarks/memory.py [count]
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bussinese import Ingredient, PizzaRecipe, PizzaMenuItem, SideItem
+
+
+class LegacyIngredient:
+    def __init__(self, name, quantity, unit, reorder_level):
+        self._name = name
+        self._quantity = quantity
+        self._unit = unit
+        self._reorder_level = reorder_level
+
+
+class LegacyPizzaRecipe:
+    def __init__(self, name, ingredients, category=None):
+        self._name = name
+        self._ingredients = ingredients
+        self._category = category
+
+
+class LegacyPizzaMenuItem:
+    def __init__(self, name, description, size, price, category, recipe):
+        self._name = name
+        self._description = description
+        self._size = size
+        self._price = price
+        self._category = category
+        self._recipe = recipe
+
+
+class LegacySideItem:
+    def __init__(self, name, price, category):
+        self.name = name
+        self.price = price
+        self.category = category
+
+
+TOPPINGS = ['Pepperoni', 'Ham', 'Bacon', 'Mushrooms', 'Olives', 'Peppers', 'Onion', 'Tomato', 'Chicken', 'Cheddar']
+
+
+def _text(value):
+    # Build a fresh string each time, like values parsed out of a CSV row.
+    return ''.join(list(value))
+
+
+def make_ingredient(cls, i):
+    return cls(_text(TOPPINGS[i % len(TOPPINGS)]), float(i), _text('kg'), 5)
+
+
+def make_recipe(cls, i):
+    ingredients = {_text(TOPPINGS[(i + j) % len(TOPPINGS)]): 1.0 for j in range(6)}
+    return cls(_text(f'Pizza {i % 50}'), ingredients, _text('meat'))
+
+
+def make_menu_item(cls, i):
+    return cls(_text(f'Pizza {i % 50}'), f'Description {i}', _text('large'), 18.5, _text('meat'), None)
+
+
+def make_side_item(cls, i):
+    return cls(_text('Caesar Salad'), 2.29, _text('Appetizers'))
+
+
+def measure(factory, cls, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory(cls, i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / count
+
+
+def main(count=20000):
+    cases = [
+        ('Ingredient', make_ingredient, LegacyIngredient, Ingredient),
+        ('PizzaRecipe', make_recipe, LegacyPizzaRecipe, PizzaRecipe),
+        ('PizzaMenuItem', make_menu_item, LegacyPizzaMenuItem, PizzaMenuItem),
+        ('SideItem', make_side_item, LegacySideItem, SideItem),
+    ]
+    print(f"{'class':<15}{'before (B)':>12}{'after (B)':>12}{'saved':>8}")
+    for name, factory, legacy_cls, compact_cls in cases:
+        before = measure(factory, legacy_cls, count)
+        after = measure(factory, compact_cls, count)
+        print(f"{name:<15}{before:>12.0f}{after:>12.0f}{1 - after / before:>8.0%}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
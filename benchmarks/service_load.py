@@ -0,0 +1,153 @@
+# Load generator for service.py: many concurrent keep-alive clients placing
+# orders as fast as the service answers. Run from the repository root:
+#
+#     python benchmarks/service_load.py --spawn            # throwaway server in a temp dir
+#     python benchmarks/service_load.py --port 8080 -c 200 -d 10
+#
+# Reports requests/second, latency percentiles and the responses by status,
+# with placed (201) and rejected (409) orders counted separately. The
+# spawned server has its stock topped up and books no delivery slots
+# (service.py --no-slots), so the run measures placing orders rather than
+# turning them away once stock or the next two weeks of slots run out;
+# --book-slots keeps slot booking in. A server started by hand should be run
+# with --no-slots for the same reason.
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length)) if length else None
+
+
+def random_order(menu, rng):
+    pizza = rng.choice(menu['pizzas'])
+    order = {
+        'customer': {'name': 'Load Test', 'phone': f"510-555-{rng.randrange(10000):04d}", 'email': 'load@example.com'},
+        # No date or time: the first free slot, when the server books slots.
+        'delivery_date': '',
+        'delivery_time': '',
+        'pizzas': [{'name': pizza['name'], 'size': pizza['size'], 'quantity': 1}],
+    }
+    if menu['sides'] and rng.random() < 0.5:
+        order['sides'] = [{'name': rng.choice(menu['sides'])['name'], 'quantity': 1}]
+    return order
+
+
+async def client(host, port, menu, deadline, latencies, statuses, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status, _ = await request(reader, writer, 'POST', '/orders', random_order(menu, rng))
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run(host, port, concurrency, duration):
+    reader, writer = await asyncio.open_connection(host, port)
+    _, menu = await request(reader, writer, 'GET', '/menu')
+    writer.close()
+    latencies, statuses = [], Counter()
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(client(host, port, menu, deadline, latencies, statuses, seed)
+                           for seed in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"{len(latencies)} requests from {concurrency} clients in {elapsed:.1f}s: {len(latencies) / elapsed:,.0f} req/s")
+    print(f"latency p50 {percentile(latencies, 0.50) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+          f"max {latencies[-1] * 1000 if latencies else 0:.1f} ms")
+    placed, rejected = statuses.get(201, 0), statuses.get(409, 0)
+    print(f"placed {placed} ({placed / elapsed:,.0f}/s), rejected {rejected} ({rejected / elapsed:,.0f}/s)")
+    print("responses: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+    if rejected:
+        print("warning: orders were rejected, so req/s mixes placed and rejected orders", file=sys.stderr)
+
+
+def spawn_server(book_slots=False):
+    # Runs service.py on a free port in a copy of the data files, so the real
+    # inventory and journal are left alone. The copy's stock is topped up so
+    # that it lasts the whole run.
+    workdir = tempfile.mkdtemp(prefix='pizza-load-')
+    for filename in os.listdir(ROOT):
+        if filename.endswith('.csv'):
+            shutil.copy(os.path.join(ROOT, filename), workdir)
+    inventory = os.path.join(workdir, 'ingredients.csv')
+    with open(inventory, newline='') as source:
+        reader = csv.DictReader(source)
+        fieldnames, rows = reader.fieldnames, [dict(row, quantity='1e9') for row in reader]
+    with open(inventory, 'w', newline='') as target:
+        writer = csv.DictWriter(target, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    command = [sys.executable, os.path.join(ROOT, 'service.py'), '--port', str(port)]
+    if not book_slots:
+        command.append('--no-slots')
+    process = subprocess.Popen(command,
+                               cwd=workdir, env=env, stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()  # "Serving on ..."
+    return process, port, workdir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a running service.py.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('-c', '--concurrency', type=int, default=100)
+    parser.add_argument('-d', '--duration', type=float, default=5.0, help="seconds")
+    parser.add_argument('--spawn', action='store_true', help="start a throwaway server instead of using a running one")
+    parser.add_argument('--book-slots', action='store_true', help="have the spawned server book delivery slots")
+    args = parser.parse_args()
+
+    process = workdir = None
+    if args.spawn:
+        process, args.port, workdir = spawn_server(args.book_slots)
+    try:
+        asyncio.run(run(args.host, args.port, args.concurrency, args.duration))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,15 @@
-from io import StringIO
-from typing import List, Dict, Tuple
+from typing import List, Dict
 from typing import Optional
-import csv
+import heapq
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from array import array
+from catalog import catalog
+from persistence import persistence
+from pricing import pricing_engine
+from search import RecipeSearchIndex
 
 class PizzaSize:
     SMALL = 'small'
@@ -13,13 +21,26 @@ class PizzaCategory:
     MEAT = 'meat'
     SPECIALTY = 'specialty'
 
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+# The domain classes below use __slots__ and interned strings: a store keeps
+# the whole menu and every historical order in memory, so per-object size matters.
+
 class Ingredient:
+    __slots__ = ('_id', '_name', '_quantity', '_unit', '_reorder_level')
+
     def __init__(self, name: str, quantity: float, unit: str, reorder_level: int):
-        self._name = name
+        self._id = catalog.id_for(name)
+        self._name = catalog.name_of(self._id)
         self._quantity = quantity
-        self._unit = unit
+        self._unit = _intern(unit.strip())
         self._reorder_level = reorder_level
 
+    @property
+    def id(self) -> int:
+        return self._id
+
     @property
     def name(self) -> str:
         return self._name
@@ -41,29 +62,55 @@ class Ingredient:
         return self._reorder_level
 
 class PizzaRecipe:
-    def __init__(self, name: str, ingredients: dict):
-        self._name = name
-        self._ingredients = ingredients
+    # Ingredients are stored as parallel arrays of catalog ids and amounts;
+    # the ingredients property still reads and writes a name -> amount dict.
+    __slots__ = ('_name', '_ingredient_ids', '_amounts', '_category')
+
+    def __init__(self, name: str, ingredients: dict, category: Optional['PizzaCategory'] = None):
+        self._name = _intern(name)
+        self.ingredients = ingredients
+        self._category = _intern(category)
 
     @property
     def name(self) -> str:
         return self._name
 
+    @property
+    def category(self) -> Optional['PizzaCategory']:
+        return self._category
+
     @property
     def ingredients(self) -> dict:
-        return self._ingredients
+        name_of = catalog.name_of
+        return {name_of(ingredient_id): amount for ingredient_id, amount in zip(self._ingredient_ids, self._amounts)}
 
     @ingredients.setter
     def ingredients(self, ingredients: dict) -> None:
-        self._ingredients = ingredients
+        # Spellings of the same catalog ingredient are merged.
+        amounts = {}
+        for name, amount in ingredients.items():
+            ingredient_id = catalog.id_for(name)
+            amounts[ingredient_id] = amounts.get(ingredient_id, 0) + amount
+        self._ingredient_ids = array('i', amounts.keys())
+        self._amounts = array('d', amounts.values())
+
+    @property
+    def ingredient_ids(self) -> array:
+        return self._ingredient_ids
+
+    @property
+    def amounts(self) -> array:
+        return self._amounts
 
 class PizzaMenuItem:
+    __slots__ = ('_name', '_description', '_size', '_price', '_category', '_recipe')
+
     def __init__(self, name: str, description: str, size: 'PizzaSize', price: float, category: 'PizzaCategory', recipe: 'PizzaRecipe'):
-        self._name = name
+        self._name = _intern(name)
         self._description = description
-        self._size = size
+        self._size = _intern(size)
         self._price = price
-        self._category = category
+        self._category = _intern(category)
         self._recipe = recipe
 
     @property
@@ -90,46 +137,150 @@ class PizzaMenuItem:
     def recipe(self) -> 'PizzaRecipe':
         return self._recipe
 
+def _name_key(name: str) -> str:
+    return name.casefold()
+
+def _attr_key(value):
+    # Categories and sizes come from both the enums and free-text input.
+    return None if value is None else str(value).strip().casefold()
+
+class _MultiIndex:
+    # Secondary index: key -> items filed under it, in insertion order.
+    def __init__(self):
+        self._buckets = {}
+
+    def add(self, key, item) -> None:
+        self._buckets.setdefault(key, {})[id(item)] = item
+
+    def discard(self, key, item) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.pop(id(item), None)
+            if not bucket:
+                del self._buckets[key]
+
+    def __getstate__(self):
+        # Buckets are keyed by id(), which does not survive pickling.
+        return {key: list(bucket.values()) for key, bucket in self._buckets.items()}
+
+    def __setstate__(self, state):
+        self._buckets = {key: {id(item): item for item in items} for key, items in state.items()}
+
+    def get(self, key) -> list:
+        bucket = self._buckets.get(key)
+        return list(bucket.values()) if bucket else []
+
+    def keys(self) -> list:
+        return list(self._buckets)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
 class RecipeManagement:
     def __init__(self):
-        self._recipes = []
+        self._recipes = {}  # case-folded name -> recipe
+        self._by_category = _MultiIndex()
+        self._search_index = RecipeSearchIndex()
+
+    @property
+    def recipes(self) -> List['PizzaRecipe']:
+        return list(self._recipes.values())
+
+    @recipes.setter
+    def recipes(self, recipes: List['PizzaRecipe']) -> None:
+        self._recipes = {}
+        self._by_category.clear()
+        self._search_index.clear()
+        for recipe in recipes:
+            self.add_recipe(recipe)
 
     def add_recipe(self, recipe: 'PizzaRecipe') -> None:
-        self._recipes.append(recipe)
+        key = _name_key(recipe.name)
+        self.remove_recipe(key)
+        self._recipes[key] = recipe
+        self._by_category.add(_attr_key(recipe.category), recipe)
+        self._search_index.add(key, recipe.name, recipe.ingredients, recipe.ingredient_ids)
 
     def remove_recipe(self, recipe_name: str) -> None:
-        self._recipes = [recipe for recipe in self._recipes if recipe.name != recipe_name]
+        key = _name_key(recipe_name)
+        recipe = self._recipes.pop(key, None)
+        if recipe is not None:
+            self._by_category.discard(_attr_key(recipe.category), recipe)
+            self._search_index.remove(key)
 
     def update_recipe(self, recipe_name: str, new_ingredients: dict) -> bool:
-        for recipe in self._recipes:
-            if recipe.name == recipe_name:
-                recipe.ingredients = new_ingredients
-                return True
-        return False
+        key = _name_key(recipe_name)
+        recipe = self._recipes.get(key)
+        if recipe is None:
+            return False
+        recipe.ingredients = new_ingredients
+        self._search_index.add(key, recipe.name, recipe.ingredients, recipe.ingredient_ids)
+        return True
 
     def get_recipe_by_name(self, recipe_name: str) -> Optional['PizzaRecipe']:
-        for recipe in self._recipes:
-            if recipe.name == recipe_name:
-                return recipe
-        return None
+        return self._recipes.get(_name_key(recipe_name))
 
     def list_recipes(self) -> List['PizzaRecipe']:
-        return self._recipes
+        return list(self._recipes.values())
 
     def list_recipes_by_category(self, category: 'PizzaCategory') -> List['PizzaRecipe']:
-        return [recipe for recipe in self._recipes if recipe.category == category]
+        return self._by_category.get(_attr_key(category))
+
+    def search_recipes(self, keyword: str, whole_words: bool = False) -> List['PizzaRecipe']:
+        # Supports "ham AND pineapple", "bacon OR ham" and prefix terms like "pep*".
+        return [self._recipes[key] for key in self._search_index.search(keyword, whole_words)]
 
-    def search_recipes(self, keyword: str) -> List['PizzaRecipe']:
-        keyword = keyword.lower()
-        return [recipe for recipe in self._recipes if keyword in recipe.name.lower() or 
-                any(keyword in ingredient.lower() for ingredient in recipe.ingredients.keys())]
+    def recipes_using(self, ingredient_name: str) -> List['PizzaRecipe']:
+        ingredient_id = catalog.lookup(ingredient_name)
+        if ingredient_id is None:
+            return []
+        return [self._recipes[key] for key in self._search_index.recipes_using(ingredient_id)]
     
 
 class InventoryManager:
-    def __init__(self, filename='ingredients.csv'):
+    # Thread-safe: quantities are guarded by a fixed set of lock stripes
+    # (ingredient id modulo LOCK_STRIPES), so orders touching different
+    # ingredients proceed in parallel. Adding, removing or reloading
+    # ingredients takes every stripe and swaps in new containers
+    # (copy-on-write), so lookups and iteration need no lock at all.
+    #
+    # Orders can take stock in two phases: reserve()/reserve_order() holds the
+    # ingredients of a whole order atomically, and the Reservation is then
+    # commit()ted on fulfilment or release()d on cancellation; holds not
+    # settled within their timeout are released automatically. Reserved
+    # stock is excluded from what other orders see as available.
+    FIELDNAMES = ['name', 'quantity', 'unit', 'reorder_level']
+    LOCK_STRIPES = 16
+    RESERVATION_TIMEOUT = 300.0  # seconds
+
+    def __init__(self, filename='ingredients.csv', flush_every: Optional[int] = 1, flush_interval: Optional[float] = None,
+                 repository=None, autoload: bool = True):
         self._ingredients = []  # Private attribute
+        self._by_id = {}  # catalog ingredient id -> Ingredient
         self._filename = filename
-        self.load_inventory()
+        # Optional storage backend with load_ingredients/save_ingredients/signature;
+        # by default the inventory is kept in the CSV file.
+        self._repository = repository
+        # Write-behind policy: flush after `flush_every` mutations and/or once
+        # `flush_interval` seconds have passed since the last flush.
+        self._flush_every = flush_every
+        self._flush_interval = flush_interval
+        self._dirty = False
+        self._mutations = 0  # changes made so far
+        self._saved = 0  # changes the file is known to include
+        self._last_flush = time.monotonic()
+        self._signature = None
+        self._listeners = []
+        self._stripes = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self._state_lock = threading.Lock()   # dirty/pending bookkeeping
+        self._flush_lock = threading.Lock()   # one writer of the file at a time
+        self._reload_lock = threading.Lock()
+        self._reserved: Dict[int, float] = {}  # ingredient id -> quantity held by reservations
+        self._expiries = []  # heap of (expires_at, seq, Reservation)
+        self._expiry_lock = threading.Lock()
+        self._reservation_seq = 0
+        if autoload:
+            self.load_inventory()
 
     @property
     def ingredients(self):
@@ -138,54 +289,196 @@ class InventoryManager:
     @property
     def filename(self) -> str:
         return self._filename
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def get_ingredient(self, name: str) -> Optional[Ingredient]:
+        return self._by_id.get(catalog.lookup(name))
+
+    def get_ingredient_by_id(self, ingredient_id: int) -> Optional[Ingredient]:
+        return self._by_id.get(ingredient_id)
+
+    def available_by_id(self, ingredient_id: int) -> Optional[float]:
+        # Stock not held by reservations; None for untracked ingredients.
+        ingredient = self._by_id.get(ingredient_id)
+        if ingredient is None:
+            return None
+        return ingredient.quantity - self._reserved.get(ingredient_id, 0)
+
+    def reserved_by_id(self, ingredient_id: int) -> float:
+        return self._reserved.get(ingredient_id, 0)
+
+    def find_untracked(self, names) -> Dict[str, List[str]]:
+        # Names the inventory does not stock, each with close matches that it
+        # does, e.g. {'Tomato Slices': ['Tomato']}.
+        stocked = {ingredient.name for ingredient in self._ingredients}
+        untracked = {}
+        for name in names:
+            if self.get_ingredient(name) is None:
+                untracked[name] = [match for match in catalog.similar(name) if match in stocked]
+        return untracked
+
+    def add_listener(self, callback) -> None:
+        # callback(names) is called after quantities change, with the names of
+        # the changed ingredients, or None when the whole inventory was reloaded.
+        # Callbacks run on the thread that made the change, outside any lock.
+        self._listeners = self._listeners + [callback]
+
+    def remove_listener(self, callback) -> None:
+        self._listeners = [listener for listener in self._listeners if listener != callback]
+
+    def _notify(self, names) -> None:
+        for callback in self._listeners:
+            callback(names)
+
+    @contextmanager
+    def _locked(self, ingredient_ids=None):
+        # Holds the stripes of `ingredient_ids` (all stripes when None),
+        # always acquired in stripe order so that callers cannot deadlock.
+        if ingredient_ids is None:
+            stripes = self._stripes
+        else:
+            stripes = [self._stripes[n] for n in sorted({ingredient_id % self.LOCK_STRIPES
+                                                          for ingredient_id in ingredient_ids})]
+        for stripe in stripes:
+            stripe.acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes):
+                stripe.release()
+
+    def _file_signature(self):
+        if self._repository is not None:
+            return self._repository.signature(self.filename)
+        return persistence.signature(self.filename)
+
     def load_inventory(self):
         try:
-            with open(self.filename, newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
-                self._ingredients = [Ingredient(row['name'], float(row['quantity']), row['unit'], int(row['reorder_level'])) for row in reader]
+            if self._repository is not None:
+                ingredients = self._repository.load_ingredients(self.filename)
+            else:
+                rows = persistence.load(self.filename, self.FIELDNAMES, ['name'])
+                ingredients = [Ingredient(row['name'], float(row['quantity']), row['unit'], int(row['reorder_level'])) for row in rows]
         except FileNotFoundError:
             print(f"File {self.filename} not found. Starting with an empty inventory.")
-            self._ingredients = []
+            ingredients = []
+        self.restore(ingredients)
+
+    def restore(self, ingredients: List[Ingredient]) -> None:
+        # Installs already-built ingredients as the current stock, e.g. from a
+        # snapshot taken of the file as it is now.
+        by_id = {ingredient.id: ingredient for ingredient in ingredients}
+        signature = self._file_signature()
+        with self._locked():
+            self._ingredients = ingredients
+            self._by_id = by_id
+            with self._state_lock:
+                self._signature = signature
+                self._dirty = False
+                self._saved = self._mutations
+        self._notify(None)
+
+    def refresh(self):
+        self._refresh()
+
+    def _refresh(self):
+        # Unflushed changes win over the file; otherwise only re-read the file
+        # when someone else has modified it since we last loaded or saved it.
+        self.expire_reservations()
+        if self._dirty:
+            self._maybe_flush()
+            return
+        if self._file_signature() != self._signature:
+            with self._reload_lock:
+                if not self._dirty and self._file_signature() != self._signature:
+                    self.load_inventory()
 
     def save_inventory(self):
-        with open(self.filename, 'w', newline='') as csvfile:
-            fieldnames = ['name', 'quantity', 'unit', 'reorder_level']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for ingredient in self._ingredients:
-                writer.writerow({
-                    'name': ingredient.name,
-                    'quantity': ingredient.quantity,
-                    'unit': ingredient.unit,
-                    'reorder_level': ingredient.reorder_level
-                })
-  
-        
+        with self._flush_lock:
+            with self._locked():
+                # A consistent snapshot; the (slow) write happens unlocked.
+                ingredients = [Ingredient(ingredient.name, ingredient.quantity, ingredient.unit, ingredient.reorder_level)
+                               for ingredient in self._ingredients]
+                with self._state_lock:
+                    saving = self._mutations
+
+            def written():
+                # Only now is the file current; inside persistence.batch()
+                # that is when the batch ends, not when this returns.
+                with self._state_lock:
+                    self._signature = self._file_signature()
+                    self._saved = max(self._saved, saving)
+                    self._dirty = self._mutations > self._saved
+                    self._last_flush = time.monotonic()
+
+            if self._repository is not None:
+                self._repository.save_ingredients(ingredients, self.filename)
+                written()
+            else:
+                self._save_csv(ingredients, written)
+
+    def _save_csv(self, ingredients, on_written=None):
+        persistence.save(self.filename, self.FIELDNAMES, ['name'], (
+            {
+                'name': ingredient.name,
+                'quantity': ingredient.quantity,
+                'unit': ingredient.unit,
+                'reorder_level': ingredient.reorder_level
+            }
+            for ingredient in ingredients
+        ), on_written)
+
+    def flush(self):
+        if self._dirty:
+            self.save_inventory()
+
+    def _maybe_flush(self):
+        with self._state_lock:
+            due = (self._flush_every and self._mutations - self._saved >= self._flush_every) or (
+                self._flush_interval is not None and time.monotonic() - self._last_flush >= self._flush_interval)
+        if due:
+            self.flush()
+
+    def _mark_dirty(self, names):
+        with self._state_lock:
+            self._dirty = True
+            self._mutations += 1
+        self._notify(names)
+        self._maybe_flush()
+
     def add_ingredient(self):
         name = input("Enter ingredient name: ")
         quantity = float(input("Enter quantity: "))
         unit = input("Enter unit: ")
         reorder_level = int(input("Enter reorder level: "))
         ingredient = Ingredient(name, quantity, unit, reorder_level)
-        self.load_inventory()
-        if ingredient.name not in [i.name for i in self._ingredients]:
-            self._ingredients.append(ingredient)
-            self.save_inventory()
+        self._refresh()
+        with self._locked():
+            if ingredient.id in self._by_id:
+                return
+            self._ingredients = self._ingredients + [ingredient]
+            self._by_id = dict(self._by_id)
+            self._by_id[ingredient.id] = ingredient
+        self._mark_dirty([ingredient.name])
             
     def remove_ingredient_ui(self):
         name = input("Enter ingredient name to remove: ")
         quantity = float(input("Enter quantity to remove: "))
-        self.load_inventory()
-        for ingredient in self._ingredients:
-            if ingredient.name == name:
-                if quantity >= ingredient.quantity:
-                    self._ingredients.remove(ingredient)
-                else:
-                    ingredient.quantity -= quantity
-                self.save_inventory()
-                break
-        else:
-            print(f"Ingredient with name '{name}' not found.")
+        self._refresh()
+        with self._locked():
+            ingredient = self.get_ingredient(name)
+            if ingredient is None:
+                print(f"Ingredient with name '{name}' not found.")
+                return
+            if quantity >= ingredient.quantity:
+                self._ingredients = [other for other in self._ingredients if other is not ingredient]
+                self._by_id = {other.id: other for other in self._ingredients}
+            else:
+                ingredient.quantity -= quantity
+        self._mark_dirty([ingredient.name])
 
             
     def use_ingredient_ui(self):
@@ -198,21 +491,186 @@ class InventoryManager:
             quantity_used = float(input(f"Enter quantity of {name} used in the recipe: "))
             recipe_ingredients[name] = quantity_used
 
-        self.use_ingredient(recipe_ingredients)
-
-    def use_ingredient(self, recipe_ingredients):
-        self.load_inventory()
+        shortages = self.use_ingredient(recipe_ingredients)
+        for name, missing in shortages.items():
+            print(f"Not enough {name}: {missing:g} short. Nothing was used.")
+
+    def use_ingredient(self, recipe_ingredients) -> Dict[str, float]:
+        # All or nothing, against the stock not held by reservations: returns
+        # the shortages (ingredient name -> quantity missing) and uses nothing
+        # if there are any. Used-up ingredients stay in the inventory at zero
+        # so that they keep showing up in reorder checks; ingredients we don't
+        # track are ignored.
+        self._refresh()
+        used = {}
         for ingredient_name, quantity_used in recipe_ingredients.items():
-            for ingredient in self._ingredients:
-                if ingredient.name == ingredient_name:
-                    if quantity_used >= ingredient.quantity:
-                        self._ingredients.remove(ingredient)
-                    else:
-                        ingredient.quantity -= quantity_used
-                    self.save_inventory()
+            ingredient_id = catalog.lookup(ingredient_name)
+            if ingredient_id is not None:
+                used[ingredient_id] = used.get(ingredient_id, 0) + quantity_used
+        changed, shortages = [], {}
+        with self._locked(used):
+            for ingredient_id, quantity_used in used.items():
+                ingredient = self._by_id.get(ingredient_id)
+                if ingredient is not None:
+                    available = ingredient.quantity - self._reserved.get(ingredient_id, 0)
+                    if quantity_used > available:
+                        shortages[ingredient.name] = quantity_used - available
+            if shortages:
+                return shortages
+            for ingredient_id, quantity_used in used.items():
+                ingredient = self._by_id.get(ingredient_id)
+                if ingredient is not None:
+                    ingredient.quantity -= quantity_used
+                    changed.append(ingredient.name)
+        if changed:
+            self._mark_dirty(changed)
+        return shortages
+
+    def use_ingredients_bulk(self, orders: List['Order']) -> List['FulfillmentResult']:
+        # Orders are checked in sequence against the stock left by the orders
+        # accepted before them; an order is either fulfilled completely or not
+        # at all. Accepted demand is applied in one pass and written once.
+        self._refresh()
+        demands = [order.ingredient_demand_by_id() for order in orders]
+        remaining = {}  # ingredient id -> stock left after accepted orders
+        results = []
+        with self._locked({ingredient_id for demand in demands for ingredient_id in demand}):
+            stock = self._by_id
+            for order, demand in zip(orders, demands):
+                shortages = {}
+                for ingredient_id, needed in demand.items():
+                    ingredient = stock.get(ingredient_id)
+                    if ingredient is None:
+                        continue
+                    available = remaining.get(ingredient_id)
+                    if available is None:
+                        available = ingredient.quantity - self._reserved.get(ingredient_id, 0)
+                    if needed > available:
+                        shortages[ingredient.name] = needed - available
+                if not shortages:
+                    for ingredient_id, needed in demand.items():
+                        ingredient = stock.get(ingredient_id)
+                        if ingredient is not None:
+                            available = remaining.get(ingredient_id)
+                            if available is None:
+                                available = ingredient.quantity - self._reserved.get(ingredient_id, 0)
+                            remaining[ingredient_id] = available - needed
+                results.append(FulfillmentResult(order, shortages))
+            for ingredient_id, available in remaining.items():
+                stock[ingredient_id].quantity = available + self._reserved.get(ingredient_id, 0)
+        if remaining:
+            self._mark_dirty([stock[ingredient_id].name for ingredient_id in remaining])
+        return results
+
+    def reserve(self, ingredients: Dict[str, float], timeout: Optional[float] = None) -> 'Reservation':
+        # ingredients: name -> quantity. Untracked ingredients are not held.
+        demand = {}
+        for name, quantity in ingredients.items():
+            ingredient_id = catalog.lookup(name)
+            if ingredient_id is not None:
+                demand[ingredient_id] = demand.get(ingredient_id, 0) + quantity
+        return self._reserve(demand, timeout)
+
+    def reserve_order(self, order: 'Order', timeout: Optional[float] = None) -> 'Reservation':
+        return self._reserve(order.ingredient_demand_by_id(), timeout)
+
+    def _reserve(self, demand: Dict[int, float], timeout: Optional[float]) -> 'Reservation':
+        # All or nothing: either every tracked ingredient is held, or none is
+        # and the returned reservation lists the shortages.
+        self._refresh()
+        timeout = self.RESERVATION_TIMEOUT if timeout is None else timeout
+        held, shortages = {}, {}
+        with self._locked(demand):
+            for ingredient_id, needed in demand.items():
+                ingredient = self._by_id.get(ingredient_id)
+                if ingredient is None:
+                    continue
+                available = ingredient.quantity - self._reserved.get(ingredient_id, 0)
+                if needed > available:
+                    shortages[ingredient.name] = needed - available
+                held[ingredient_id] = needed
+            if shortages:
+                return Reservation({}, shortages, None)
+            for ingredient_id, needed in held.items():
+                self._reserved[ingredient_id] = self._reserved.get(ingredient_id, 0) + needed
+        reservation = Reservation(held, {}, time.monotonic() + timeout)
+        with self._expiry_lock:
+            self._reservation_seq += 1
+            heapq.heappush(self._expiries, (reservation.expires_at, self._reservation_seq, reservation))
+        if held:
+            self._notify([catalog.name_of(ingredient_id) for ingredient_id in held])
+        return reservation
+
+    def _settle(self, reservation: 'Reservation', state: str) -> bool:
+        return self._settle_all([reservation], state)
+
+    def _settle_all(self, reservations: List['Reservation'], state: str) -> bool:
+        # All of the reservations or none: False if any is no longer held.
+        amounts = {}  # ingredient id -> total held by `reservations`
+        for reservation in reservations:
+            for ingredient_id, amount in reservation.amounts.items():
+                amounts[ingredient_id] = amounts.get(ingredient_id, 0) + amount
+        with self._locked(amounts):
+            if any(reservation.state != Reservation.HELD for reservation in reservations):
+                return False
+            if state == Reservation.COMMITTED and any(
+                    ingredient_id in self._by_id and self._by_id[ingredient_id].quantity < amount - 1e-9
+                    for ingredient_id, amount in amounts.items()):
+                # The held stock is gone (the inventory was edited or reloaded
+                # meanwhile): deduct nothing and leave the holds to be released.
+                return False
+            changed = []
+            for ingredient_id, amount in amounts.items():
+                left = self._reserved.get(ingredient_id, 0) - amount
+                if left > 1e-9:
+                    self._reserved[ingredient_id] = left
+                else:
+                    self._reserved.pop(ingredient_id, None)
+                ingredient = self._by_id.get(ingredient_id)
+                if ingredient is not None:
+                    if state == Reservation.COMMITTED:
+                        ingredient.quantity -= amount
+                    changed.append(ingredient.name)
+            for reservation in reservations:
+                reservation.state = state
+        if state == Reservation.COMMITTED:
+            self._mark_dirty(changed)
+        elif changed:
+            self._notify(changed)
+        return True
+
+    def commit(self, reservation: 'Reservation') -> bool:
+        return self.commit_all([reservation])
+
+    def commit_all(self, reservations: List['Reservation']) -> bool:
+        # Turns holds into one deduction, all of them or none. False if any
+        # was already settled, has timed out (and been released), or its
+        # stock is no longer there.
+        now = time.monotonic()
+        expired = [reservation for reservation in reservations
+                   if reservation.state == Reservation.HELD and now >= reservation.expires_at]
+        for reservation in expired:
+            self._settle(reservation, Reservation.EXPIRED)
+        if expired:
+            return False
+        return self._settle_all(reservations, Reservation.COMMITTED)
+
+    def release(self, reservation: 'Reservation') -> bool:
+        return self._settle(reservation, Reservation.RELEASED)
+
+    def expire_reservations(self) -> int:
+        # Releases the holds whose timeout has passed; returns how many.
+        if not self._expiries:
+            return 0
+        now = time.monotonic()
+        expired = []
+        with self._expiry_lock:
+            while self._expiries and self._expiries[0][0] <= now:
+                expired.append(heapq.heappop(self._expiries)[2])
+        return sum(self._settle(reservation, Reservation.EXPIRED) for reservation in expired)
 
     def check_reorder_levels(self):
-        self.load_inventory()
+        self._refresh()
         reorder_list = []
         for ingredient in self._ingredients:
             if ingredient.quantity <= ingredient.reorder_level:
@@ -228,32 +686,106 @@ class InventoryManager:
 
 
     def print_inventory(self):
-        self.load_inventory()
+        self._refresh()
         for ingredient in self._ingredients:
             print(f"Name: {ingredient.name}")
             print(f"Quantity: {ingredient.quantity} {ingredient.unit}")
             print(f"Reorder Level: {ingredient.reorder_level}")
             print("\n")
 
+class Reservation:
+    HELD = 'held'
+    COMMITTED = 'committed'
+    RELEASED = 'released'
+    EXPIRED = 'expired'
+    REJECTED = 'rejected'
+
+    def __init__(self, amounts: Dict[int, float], shortages: Dict[str, float], expires_at: Optional[float]):
+        self.amounts = amounts  # ingredient id -> quantity held
+        self.shortages = shortages  # ingredient name -> quantity missing
+        self.expires_at = expires_at  # time.monotonic() deadline
+        self.state = self.REJECTED if shortages else self.HELD
+
+    @property
+    def success(self) -> bool:
+        return not self.shortages
+
+class FulfillmentResult:
+    def __init__(self, order: 'Order', shortages: Dict[str, float]):
+        self.order = order
+        self.shortages = shortages  # ingredient name -> quantity missing
+
+    @property
+    def success(self) -> bool:
+        return not self.shortages
+
 class MenuManagement:
     def __init__(self):
-        self.menu_items = [] 
+        # Case-folded name -> items sharing that name (e.g. the same pizza in
+        # several sizes), in insertion order.
+        self._items_by_name = {}
+        self._menu_items = None  # flattened list, rebuilt lazily after changes
+        self._by_category = _MultiIndex()
+        self._by_size = _MultiIndex()
+        self._by_category_size = _MultiIndex()
+
+    @property
+    def menu_items(self) -> List[PizzaMenuItem]:
+        if self._menu_items is None:
+            self._menu_items = [item for items in self._items_by_name.values() for item in items]
+        return self._menu_items
+
+    @menu_items.setter
+    def menu_items(self, menu_items: List[PizzaMenuItem]) -> None:
+        self._items_by_name = {}
+        self._menu_items = None
+        self._by_category.clear()
+        self._by_size.clear()
+        self._by_category_size.clear()
+        for menu_item in menu_items:
+            self.add_menu_item(menu_item)
+
+    def _index_item(self, menu_item: PizzaMenuItem) -> None:
+        category, size = _attr_key(menu_item.category), _attr_key(menu_item.size)
+        self._by_category.add(category, menu_item)
+        self._by_size.add(size, menu_item)
+        self._by_category_size.add((category, size), menu_item)
+
+    def _unindex_item(self, menu_item: PizzaMenuItem) -> None:
+        category, size = _attr_key(menu_item.category), _attr_key(menu_item.size)
+        self._by_category.discard(category, menu_item)
+        self._by_size.discard(size, menu_item)
+        self._by_category_size.discard((category, size), menu_item)
 
     def add_menu_item(self, menu_item: PizzaMenuItem):
-        self.menu_items.append(menu_item)
+        self._items_by_name.setdefault(_name_key(menu_item.name), []).append(menu_item)
+        self._index_item(menu_item)
+        self._menu_items = None
 
     def remove_menu_item(self, name: str):
-        self.menu_items = [item for item in self.menu_items if item.name != name]
+        items = self._items_by_name.pop(_name_key(name), None)
+        if items is not None:
+            for item in items:
+                self._unindex_item(item)
+            self._menu_items = None
 
     def update_menu_item(self, name: str, new_menu_item: PizzaMenuItem):
-        updated = False
-        for i, item in enumerate(self.menu_items):
-            if item.name == name:
-                self.menu_items[i] = new_menu_item
-                updated = True
-                break
-        if not updated:
+        key = _name_key(name)
+        items = self._items_by_name.get(key)
+        if not items:
             print(f"Menu item with name '{name}' not found. No update made.")
+            return
+        self._unindex_item(items[0])
+        new_key = _name_key(new_menu_item.name)
+        if new_key == key:
+            items[0] = new_menu_item
+        else:
+            del items[0]
+            if not items:
+                del self._items_by_name[key]
+            self._items_by_name.setdefault(new_key, []).append(new_menu_item)
+        self._index_item(new_menu_item)
+        self._menu_items = None
     def display_menu(self):
         for item in self.menu_mgt.list_menu_items():
             print(f"Name: {item.name}")
@@ -264,15 +796,25 @@ class MenuManagement:
                 print(f"  - {ingredient}: {amount}")
             print()  
     def get_menu_items_by_category(self, category: PizzaCategory) -> List[PizzaMenuItem]:
-        return [item for item in self.menu_items if item.category == category]
+        return self._by_category.get(_attr_key(category))
     
     def get_menu_items_by_size(self, size: PizzaSize) -> List[PizzaMenuItem]:
-        return [item for item in self.menu_items if item.size == size]
+        return self._by_size.get(_attr_key(size))
+
+    def get_menu_items_by_category_and_size(self, category: PizzaCategory, size: PizzaSize) -> List[PizzaMenuItem]:
+        return self._by_category_size.get((_attr_key(category), _attr_key(size)))
     def get_menu_item_by_name(self, name: str) -> Optional[PizzaMenuItem]:
-        for item in self.menu_items:
-            if item.name.lower() == name.lower():
-                return item
-        return None
+        items = self._items_by_name.get(_name_key(name))
+        return items[0] if items else None
+    def get_menu_item(self, name: str, size: Optional[PizzaSize] = None) -> Optional[PizzaMenuItem]:
+        # The variant of `name` in `size`; any variant when size is None.
+        items = self._items_by_name.get(_name_key(name))
+        if not items:
+            return None
+        if size is None:
+            return items[0]
+        size = _attr_key(size)
+        return next((item for item in items if _attr_key(item.size) == size), None)
     def list_menu_items(self) -> List[PizzaMenuItem]:
         return self.menu_items
 
@@ -288,6 +830,7 @@ class CustomerInfo:
         self.company = company
         self.delivery_date = delivery_date
         self.delivery_time = delivery_time
+        self.customer_id = None  # set once saved in the customer directory
         self.orders = []  
     def place_order(self, order):
         self.orders.append(order)
@@ -295,15 +838,12 @@ class CustomerInfo:
 class CustomPizzaOrder:
     def create_custom_pizza(self):
         print("\n--- Build Your Own Pizza ---")
-        base_price = 14.00
 
         # Options for bases, sauces, toppings, and additional ingredients
-        bases = {"Thin Crust": 2.00, "Thick Crust": 2.50}
-        sauces = {"Tomato": 1.00, "BBQ": 1.50, "White Garlic": 1.25}
-        toppings = {"Pepperoni": 1.75, "Ham": 1.75, "Bacon": 1.75,
-                    "Mushrooms": 1.75, "Onion": 1.75, "Black Olives": 1.75,
-                    "Tomato Slices": 1.75, "Extra Cheese": 1.75, "Pineapple": 1.75}
-        additional_ingredients = {"Chicken": 2.00, "Beef": 2.25, "Cheddar": 1.75}
+        bases = pricing_engine.bases
+        sauces = pricing_engine.sauces
+        toppings = pricing_engine.toppings
+        additional_ingredients = pricing_engine.additional_ingredients
 
         # Let the customer select and customize
         print("Select a base:")
@@ -334,71 +874,91 @@ class CustomPizzaOrder:
                 quantity = int(input(f"Quantity for {ingredient}: "))
                 selected_additional_ingredients[ingredient] = (price, quantity)
 
-        # Calculate total price
-        total_price = base_price
-        total_price += bases.get(selected_base, 0) * base_quantity
-        total_price += sauces.get(selected_sauce, 0) * sauce_quantity
-        total_price += sum(price * qty for price, qty in selected_toppings.values())
-        total_price += sum(price * qty for price, qty in selected_additional_ingredients.values())
-
-        # Display the total price
-        print(f"\nTotal price for your custom pizza: ${total_price:.2f}")
-
         # Create a custom PizzaRecipe and PizzaMenuItem for the order
         custom_ingredients = {selected_base: base_quantity, selected_sauce: sauce_quantity}
         custom_ingredients.update({topping: qty for topping, (_, qty) in selected_toppings.items()})
         custom_ingredients.update({ingredient: qty for ingredient, (_, qty) in selected_additional_ingredients.items()})
-        custom_pizza_recipe = PizzaRecipe("Custom Pizza", custom_ingredients)
-        custom_pizza_item = PizzaMenuItem("Custom Pizza", "Your personalized pizza", PizzaSize.LARGE, total_price, PizzaCategory.SPECIALTY, custom_pizza_recipe)
+
+        custom_pizza_item = self.build_custom_pizza(custom_ingredients)
+
+        # Display the total price
+        print(f"\nTotal price for your custom pizza: ${custom_pizza_item.price:.2f}")
 
         # Return the custom pizza item for ordering
         return custom_pizza_item
 
+    @staticmethod
+    def build_custom_pizza(options: dict, size: 'PizzaSize' = None) -> 'PizzaMenuItem':
+        # options: base/sauce/topping name -> quantity.
+        size = size or PizzaSize.LARGE
+        total_price = pricing_engine.custom_pizza_price(options, size)
+        custom_pizza_recipe = PizzaRecipe("Custom Pizza", options, PizzaCategory.SPECIALTY)
+        return PizzaMenuItem("Custom Pizza", "Your personalized pizza", size, total_price, PizzaCategory.SPECIALTY, custom_pizza_recipe)
+
 class SideCategory:
     APPETIZERS = 'Appetizers'
     DESSERTS = 'Desserts'
     BEVERAGES = 'Beverages'
 
 class SideItem:
+    __slots__ = ('name', 'price', 'category')
+
     def __init__(self, name: str, price: float, category: SideCategory):
-        self.name = name
+        self.name = _intern(name)
         self.price = price
-        self.category = category
+        self.category = _intern(category)
 
 class SideMenuManagement:
-    def __init__(self, side_dish_repo):
-        self.side_items = []
+    def __init__(self, side_dish_repo, filename='side_dish.csv'):
+        self._side_items = {}  # case-folded name -> side item
+        self._by_category = _MultiIndex()
         self.side_dish_repo = side_dish_repo
+        self.filename = filename
+
+    @property
+    def side_items(self):
+        return list(self._side_items.values())
+
+    @side_items.setter
+    def side_items(self, side_items):
+        self._side_items = {}
+        self._by_category.clear()
+        for item in side_items:
+            self._put(item)
+
+    def _put(self, side_item):
+        key = _name_key(side_item.name)
+        self._drop(key)
+        self._side_items[key] = side_item
+        self._by_category.add(_attr_key(side_item.category), side_item)
+
+    def _drop(self, key):
+        item = self._side_items.pop(key, None)
+        if item is not None:
+            self._by_category.discard(_attr_key(item.category), item)
+        return item
 
     def add_side_item(self, side_item):
-        self.side_items.append(side_item)
-        self.side_dish_repo.save_side_dishes(self.side_items, 'side_dish.csv')
+        self._put(side_item)
+        self.side_dish_repo.save_side_dishes(self.side_items, self.filename)
 
     def remove_side_item(self, name):
-        self.side_items = [item for item in self.side_items if item.name != name]
+        self._drop(_name_key(name))
 
     def update_side_item(self, name, new_side_item):
-        updated = False
-        for i, item in enumerate(self.side_items):
-            if item.name == name:
-                self.side_items[i] = new_side_item
-                updated = True
-                break
-        if not updated:
+        if self._drop(_name_key(name)) is None:
             print(f"Side dish with name '{name}' not found. No update made.")
+            return
+        self._put(new_side_item)
 
     def list_side_items(self):
         return self.side_items
 
     def list_side_items_by_category(self, category):
-        return [item for item in self.side_items if item.category == category]
+        return self._by_category.get(_attr_key(category))
  
     def get_side_item_by_name(self, name: str):
-        # Search for a side item by its name and return it
-        for item in self.side_items:
-            if item.name.lower() == name.lower():
-                return item
-        return None
+        return self._side_items.get(_name_key(name))
     
     def display_side_dish(self, side_dish):
         # Display side dish information
@@ -417,35 +977,79 @@ class Order:
         self.delivery_time = delivery_time
         self.pizzas = pizzas  
         self.sides = sides  
-
-        
-
-
-
-    def add_pizza(self, pizza: PizzaMenuItem) -> None:
-        self.pizzas.append(pizza)
-
-    def add_side_dish(self, side_dish: SideItem) -> None:
-        self.sides.append(side_dish)
+        self.order_id = None  # assigned when the order is journaled
+        self.placed_at = None
+        self.delivery_slot = None  # start of the booked delivery slot (epoch seconds), see delivery.py
+        self._subtotal = None  # cached; kept current by add_pizza/add_side_dish
+
+    def add_pizza(self, pizza: PizzaMenuItem, quantity: int = 1) -> None:
+        self.pizzas.append((pizza, quantity))
+        if self._subtotal is not None:
+            self._subtotal += pizza.price * quantity
+
+    def pizza_lines(self):
+        # Pizzas are stored as (item, quantity) tuples; bare items from older
+        # callers count as quantity 1.
+        for entry in self.pizzas:
+            yield entry if isinstance(entry, tuple) else (entry, 1)
+
+    def side_lines(self):
+        for entry in self.sides:
+            yield entry if isinstance(entry, tuple) else (entry, 1)
+
+    def ingredient_demand_by_id(self) -> Dict[int, float]:
+        demand = {}
+        for pizza, quantity in self.pizza_lines():
+            recipe = pizza.recipe
+            for ingredient_id, amount in zip(recipe.ingredient_ids, recipe.amounts):
+                demand[ingredient_id] = demand.get(ingredient_id, 0) + amount * quantity
+        return demand
+
+    def ingredient_demand(self) -> Dict[str, float]:
+        return {catalog.name_of(ingredient_id): amount for ingredient_id, amount in self.ingredient_demand_by_id().items()}
+
+    def add_side_dish(self, side_dish: SideItem, quantity: int = 1) -> None:
+        self.sides.append((side_dish, quantity))
+        if self._subtotal is not None:
+            self._subtotal += side_dish.price * quantity
+
+    def invalidate_totals(self) -> None:
+        # Call after changing self.pizzas or self.sides directly.
+        self._subtotal = None
+
+    def subtotal(self) -> float:
+        if self._subtotal is None:
+            self._subtotal = (sum(pizza.price * quantity for pizza, quantity in self.pizza_lines())
+                              + sum(side.price * quantity for side, quantity in self.side_lines()))
+        return self._subtotal
+
+    def tax(self) -> float:
+        return pricing_engine.tax(self.subtotal())
+
+    def total(self) -> float:
+        return round(self.subtotal() + self.tax(), 2)
 
     def generate_order_slip(self) -> str:
-        order_slip = "Order Slip:\n"
+        lines = ["Order Slip:"]
 
         # Pizzas
         if self.pizzas:
-            order_slip += "Pizzas:\n"
-            for pizza in self.pizzas:
-                order_slip += f"- {pizza.name}\n"
-                order_slip += f"  Ingredients: {', '.join([ingredient for ingredient, amount in pizza.recipe.ingredients.items()])}\n"
+            lines.append("Pizzas:")
+            for pizza, quantity in self.pizza_lines():
+                lines.append(f"- {pizza.name} x{quantity}")
+                lines.append(f"  Ingredients: {', '.join(pizza.recipe.ingredients)}")
 
         # Side Dishes
         if self.sides:
-            order_slip += "Side Dishes:\n"
-            for side_dish in self.sides:
-                order_slip += f"- {side_dish.name}\n"
-                order_slip += f"  Description: {side_dish.description}\n"
-
-        return order_slip
+            lines.append("Side Dishes:")
+            for side_dish, quantity in self.side_lines():
+                lines.append(f"- {side_dish.name} x{quantity}")
+                lines.append(f"  Category: {side_dish.category}")
+
+        lines.append(f"Subtotal: ${self.subtotal():.2f}")
+        lines.append(f"Tax: ${self.tax():.2f}")
+        lines.append(f"Total: ${self.total():.2f}")
+        return "\n".join(lines) + "\n"
 
     def get_side_item_by_name(self, name: str) -> Optional[SideItem]:
         for item in self.menu_mgt.list_side_items():
@@ -0,0 +1,130 @@
+import csv
+import difflib
+import os
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional
+
+
+# alias,name rows: spellings (e.g. build-your-own topping names) that are
+# the same stock item as an ingredient. Kept with the store's data so a
+# location can add its own; names not listed here are never folded together.
+ALIASES_FILE = 'ingredient_aliases.csv'
+
+
+def normalize_name(name: str) -> str:
+    # "  Tomato   Sauce " -> "Tomato Sauce"
+    return " ".join(name.split())
+
+
+class IngredientCatalog:
+    # Central registry of ingredient identities.
+    #
+    # Every ingredient name is normalized (surrounding/repeated whitespace
+    # removed, compared case-insensitively) and assigned a small integer id,
+    # in registration order, that stays the same for the life of the process.
+    # Recipes, the inventory and orders refer to ingredients by these ids, so
+    # matching them is an integer comparison. Aliases map alternative
+    # spellings (e.g. "Black Olives") onto an existing ingredient.
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}   # case-folded normalized name or alias -> id
+        self._names: List[str] = []      # id -> display name (first spelling seen)
+        self._lock = threading.Lock()    # registrations only; lookups are lock-free
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return self.lookup(name) is not None
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return normalize_name(name).casefold()
+
+    def lookup(self, name: str) -> Optional[int]:
+        return self._ids.get(self._key(name))
+
+    def id_for(self, name: str) -> int:
+        key = self._key(name)
+        ingredient_id = self._ids.get(key)
+        if ingredient_id is None:
+            with self._lock:
+                ingredient_id = self._ids.get(key)
+                if ingredient_id is None:
+                    # Publish the name before the id, so a lookup never sees an id without a name.
+                    self._names.append(sys.intern(normalize_name(name)))
+                    ingredient_id = self._ids[key] = len(self._names) - 1
+        return ingredient_id
+
+    def name_of(self, ingredient_id: int) -> str:
+        return self._names[ingredient_id]
+
+    def canonical_name(self, name: str) -> str:
+        return self._names[self.id_for(name)]
+
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    def state(self) -> tuple:
+        with self._lock:
+            return list(self._names), dict(self._ids)
+
+    def restore(self, state: tuple) -> bool:
+        # Adopts the ids of a saved state (see snapshot.py). Only possible
+        # while every id handed out so far means the same in the saved state;
+        # returns False, changing nothing, otherwise.
+        names, ids = state
+        with self._lock:
+            if names[:len(self._names)] != self._names or any(ids.get(key) != value for key, value in self._ids.items()):
+                return False
+            self._names.extend(sys.intern(name) for name in names[len(self._names):])
+            self._ids.update(ids)
+        return True
+
+    def add_alias(self, alias: str, name: str) -> int:
+        ingredient_id = self.id_for(name)
+        key = self._key(alias)
+        with self._lock:
+            existing = self._ids.get(key)
+            if existing is not None and existing != ingredient_id:
+                raise ValueError(f"'{alias}' already names ingredient '{self._names[existing]}'.")
+            self._ids[key] = ingredient_id
+        return ingredient_id
+
+    def load_aliases(self, filename: str) -> List[str]:
+        # Adds the aliases listed in `filename` (a missing file has none).
+        # Returns a message for each row that could not be added.
+        if not os.path.exists(filename):
+            return []
+        problems = []
+        with open(filename, 'r', newline='') as file:
+            for row in csv.DictReader(file):
+                alias, name = (row.get('alias') or '').strip(), (row.get('name') or '').strip()
+                if not alias or not name:
+                    problems.append(f"Skipping incomplete alias row {row}.")
+                    continue
+                try:
+                    self.add_alias(alias, name)
+                except ValueError as error:
+                    problems.append(str(error))
+        return problems
+
+    def similar(self, name: str, limit: int = 3) -> List[str]:
+        # Known ingredients whose name is close to `name`, for "did you mean".
+        key = self._key(name)
+        matches = difflib.get_close_matches(key, [known.casefold() for known in self._names], n=limit, cutoff=0.6)
+        by_key = {known.casefold(): known for known in self._names}
+        names = [by_key[match] for match in matches]
+        # Also catch one name containing the other ("Tomato" / "Tomato Slices").
+        for known in self._names:
+            known_key = known.casefold()
+            if known not in names and known_key != key and (known_key in key or key in known_key):
+                names.append(known)
+        return names[:limit]
+
+    def unknown(self, names: Iterable[str]) -> List[str]:
+        return [name for name in names if self.lookup(name) is None]
+
+
+catalog = IngredientCatalog()
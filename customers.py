@@ -0,0 +1,215 @@
+import sqlite3
+from collections import OrderedDict
+from typing import List, Optional
+
+from bussinese import CustomerInfo, MenuManagement, Order, SideMenuManagement
+from catalog import normalize_name
+from Datalayer import OrderRepository
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    phone TEXT,
+    email TEXT,
+    company TEXT,
+    phone_key TEXT,
+    email_key TEXT,
+    company_key TEXT,
+    last_order_id INTEGER,
+    order_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS customers_phone ON customers (phone_key);
+CREATE INDEX IF NOT EXISTS customers_email ON customers (email_key);
+CREATE INDEX IF NOT EXISTS customers_company ON customers (company_key);
+CREATE TABLE IF NOT EXISTS customer_orders (
+    customer_id INTEGER NOT NULL,
+    order_id INTEGER NOT NULL,
+    PRIMARY KEY (customer_id, order_id)
+) WITHOUT ROWID;
+'''
+
+COLUMNS = 'id, name, phone, email, company, last_order_id, order_count'
+
+
+def phone_key(phone: Optional[str]) -> Optional[str]:
+    # "(510) 555-7777", "510.555.7777" and "+1 510 555 7777" are one customer.
+    digits = ''.join(ch for ch in phone or '' if ch.isdigit())
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    return digits or None
+
+
+def email_key(email: Optional[str]) -> Optional[str]:
+    return (email or '').strip().casefold() or None
+
+
+def company_key(company: Optional[str]) -> Optional[str]:
+    return normalize_name(company or '').casefold() or None
+
+
+class CustomerDirectory:
+    # Persistent customers, looked up by normalized phone, email or company.
+    #
+    # Customers live in an SQLite file whose indexes are read page by page on
+    # demand, so opening a directory of hundreds of thousands of customers
+    # costs nothing up front; recently used customers are kept in a small LRU
+    # cache in front of the indexes. A customer is matched by phone first,
+    # then by email. Each customer links to the ids of their journaled orders,
+    # which is what reorder_last() uses. Writes are committed every
+    # `commit_every` changes, or on commit()/close().
+    #
+    # Given an open `connection` (the store's SQLite database), the directory
+    # shares it instead of opening the file again: a second connection would
+    # hold its own write transaction between commits and lock the store out.
+
+    def __init__(self, path: str = 'customers.db', commit_every: int = 1, cache_size: int = 4096,
+                 connection: Optional[sqlite3.Connection] = None):
+        self.path = path
+        self._owns_connection = connection is None
+        if connection is None:
+            connection = sqlite3.connect(path, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection = connection
+        self._connection.executescript(SCHEMA)
+        self._commit_every = commit_every
+        self._uncommitted = 0
+        self._cache_size = cache_size
+        self._cache: 'OrderedDict[tuple, Optional[tuple]]' = OrderedDict()  # (field, key) -> row
+
+    def __len__(self) -> int:
+        return self._connection.execute('SELECT COUNT(*) FROM customers').fetchone()[0]
+
+    def _row(self, field: str, key: Optional[str]) -> Optional[tuple]:
+        if key is None:
+            return None
+        cache_key = (field, key)
+        if cache_key in self._cache:
+            self._cache.move_to_end(cache_key)
+            return self._cache[cache_key]
+        row = self._connection.execute(
+            f'SELECT {COLUMNS} FROM customers WHERE {field} = ? ORDER BY id LIMIT 1', (key,)).fetchone()
+        self._cache[cache_key] = row
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return row
+
+    @staticmethod
+    def _customer(row: Optional[tuple]) -> Optional[CustomerInfo]:
+        if row is None:
+            return None
+        customer_id, name, phone, email, company, _, _ = row
+        customer = CustomerInfo(name, phone or '', email or '', company or None)
+        customer.customer_id = customer_id
+        return customer
+
+    def get(self, customer_id: int) -> Optional[CustomerInfo]:
+        return self._customer(self._connection.execute(
+            f'SELECT {COLUMNS} FROM customers WHERE id = ?', (customer_id,)).fetchone())
+
+    def find_by_phone(self, phone: str) -> Optional[CustomerInfo]:
+        return self._customer(self._row('phone_key', phone_key(phone)))
+
+    def find_by_email(self, email: str) -> Optional[CustomerInfo]:
+        return self._customer(self._row('email_key', email_key(email)))
+
+    def find(self, phone: str = '', email: str = '') -> Optional[CustomerInfo]:
+        return self.find_by_phone(phone) or self.find_by_email(email)
+
+    def find_by_company(self, company: str) -> List[CustomerInfo]:
+        key = company_key(company)
+        if key is None:
+            return []
+        rows = self._connection.execute(f'SELECT {COLUMNS} FROM customers WHERE company_key = ? ORDER BY id', (key,))
+        return [self._customer(row) for row in rows]
+
+    def _forget(self, *rows) -> None:
+        # Drops cached lookups of these customers' old and new keys.
+        for row in rows:
+            if row is None:
+                continue
+            _, _, phone, email, _, _, _ = row
+            self._cache.pop(('phone_key', phone_key(phone)), None)
+            self._cache.pop(('email_key', email_key(email)), None)
+
+    def _changed(self) -> None:
+        self._uncommitted += 1
+        if self._uncommitted >= self._commit_every:
+            self.commit()
+
+    def upsert(self, customer: CustomerInfo) -> int:
+        # Saves the customer, updating the matching record if there is one, and
+        # sets customer.customer_id. Blank fields never overwrite saved ones.
+        existing = None
+        if customer.customer_id is not None:
+            existing = self._connection.execute(
+                f'SELECT {COLUMNS} FROM customers WHERE id = ?', (customer.customer_id,)).fetchone()
+        existing = existing or self._row('phone_key', phone_key(customer.phone)) or \
+            self._row('email_key', email_key(customer.email))
+        if existing is None:
+            cursor = self._connection.execute(
+                'INSERT INTO customers (name, phone, email, company, phone_key, email_key, company_key) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (customer.name, customer.phone or None, customer.email or None, customer.company or None,
+                 phone_key(customer.phone), email_key(customer.email), company_key(customer.company)))
+            customer.customer_id = cursor.lastrowid
+            self._forget((None, None, customer.phone, customer.email, None, None, None))
+            self._changed()
+        else:
+            customer_id, name, phone, email, company, _, _ = existing
+            name, phone = customer.name or name, customer.phone or phone
+            email, company = customer.email or email, customer.company or company
+            if (name, phone, email, company) != existing[1:5]:
+                self._connection.execute(
+                    'UPDATE customers SET name = ?, phone = ?, email = ?, company = ?, '
+                    'phone_key = ?, email_key = ?, company_key = ? WHERE id = ?',
+                    (name, phone, email, company, phone_key(phone), email_key(email), company_key(company), customer_id))
+                self._forget(existing, (None, None, phone, email, None, None, None))
+                self._changed()
+            customer.customer_id = customer_id
+        return customer.customer_id
+
+    def record_order(self, customer: CustomerInfo, order_id: int) -> int:
+        # Upserts the customer and links the journaled order to them.
+        customer_id = self.upsert(customer)
+        linked = self._connection.execute('INSERT OR IGNORE INTO customer_orders (customer_id, order_id) VALUES (?, ?)',
+                                          (customer_id, order_id)).rowcount
+        if linked:
+            self._connection.execute(
+                'UPDATE customers SET last_order_id = MAX(COALESCE(last_order_id, 0), ?), order_count = order_count + 1 '
+                'WHERE id = ?', (order_id, customer_id))
+            self._forget((None, None, customer.phone, customer.email, None, None, None))
+            self._changed()
+        return customer_id
+
+    def order_ids(self, customer_id: int) -> List[int]:
+        rows = self._connection.execute(
+            'SELECT order_id FROM customer_orders WHERE customer_id = ? ORDER BY order_id', (customer_id,))
+        return [order_id for order_id, in rows]
+
+    def last_order_id(self, customer_id: int) -> Optional[int]:
+        row = self._connection.execute('SELECT last_order_id FROM customers WHERE id = ?', (customer_id,)).fetchone()
+        return row[0] if row else None
+
+    def reorder_last(self, customer: CustomerInfo, order_repo, menu_mgt: Optional[MenuManagement] = None,
+                     side_menu_mgt: Optional[SideMenuManagement] = None) -> Optional[Order]:
+        # A new, unplaced order with the same pizzas and sides as the
+        # customer's last one, at today's menu prices where the items still
+        # exist. The delivery date and time are left for the caller to fill in.
+        customer_id = customer.customer_id
+        order_id = self.last_order_id(customer_id) if customer_id is not None else None
+        record = order_repo.get(order_id) if order_id is not None else None
+        if record is None:
+            return None
+        previous = OrderRepository.record_to_order(record, menu_mgt, side_menu_mgt)
+        return Order(customer, '', '', list(previous.pizza_lines()), list(previous.side_lines()))
+
+    def commit(self) -> None:
+        self._connection.commit()
+        self._uncommitted = 0
+
+    def close(self) -> None:
+        self.commit()
+        if self._owns_connection:
+            self._connection.close()
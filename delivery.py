@@ -0,0 +1,259 @@
+import math
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from bussinese import Order
+from kitchen import parse_delivery
+
+# Delivery slots for advance orders.
+#
+# The days from today to `horizon_days` ahead are cut into fixed slots of
+# `slot_minutes`. Each slot has a pizza capacity (drivers on shift times
+# pizzas per driver; zero outside opening hours) and a running count of
+# booked pizzas. A max segment tree over the slots' remaining capacity finds
+# the first slot at or after a time, or the last one before it, with room
+# for N pizzas in O(log n), so a full slot can be answered with
+# alternatives straight away, and a catering order is booked in one lookup.
+#
+# Catering orders (a company on the customer, or at least
+# `catering_pizzas` pizzas) need `min_notice_hours` notice, the 48 hours
+# printed on the order form; every order needs `lead_minutes`.
+#
+# Bookings live in memory only; load_bookings() counts the orders already
+# journaled back into their slots, which PizzaStore does when it creates
+# the schedule, so a restart does not hand their capacity out again.
+
+
+class _MaxSegmentTree:
+    def __init__(self, values: List[int]):
+        self._size = 1
+        while self._size < max(len(values), 1):
+            self._size *= 2
+        self._tree = [-1] * (2 * self._size)
+        self._tree[self._size:self._size + len(values)] = values
+        for node in range(self._size - 1, 0, -1):
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
+
+    def __getitem__(self, index: int) -> int:
+        return self._tree[self._size + index]
+
+    def __setitem__(self, index: int, value: int) -> None:
+        node = self._size + index
+        self._tree[node] = value
+        node //= 2
+        while node:
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
+            node //= 2
+
+    def first_at_least(self, start: int, need: int) -> Optional[int]:
+        # Smallest index >= start whose value is >= need.
+        return self._first(1, 0, self._size, max(start, 0), need)
+
+    def _first(self, node: int, lo: int, hi: int, start: int, need: int) -> Optional[int]:
+        if hi <= start or self._tree[node] < need:
+            return None
+        if hi - lo == 1:
+            return lo
+        mid = (lo + hi) // 2
+        found = self._first(2 * node, lo, mid, start, need)
+        return found if found is not None else self._first(2 * node + 1, mid, hi, start, need)
+
+    def last_at_least(self, end: int, need: int) -> Optional[int]:
+        # Largest index < end whose value is >= need.
+        return self._last(1, 0, self._size, min(end, self._size), need)
+
+    def _last(self, node: int, lo: int, hi: int, end: int, need: int) -> Optional[int]:
+        if lo >= end or self._tree[node] < need:
+            return None
+        if hi - lo == 1:
+            return lo
+        mid = (lo + hi) // 2
+        found = self._last(2 * node + 1, mid, hi, end, need)
+        return found if found is not None else self._last(2 * node, lo, mid, end, need)
+
+
+class SlotBooking:
+    def __init__(self, order: Optional[Order], pizzas: int, slot: Optional[float], reason: str = '',
+                 alternatives: Optional[List[float]] = None):
+        self.order = order
+        self.pizzas = pizzas
+        self.slot = slot  # epoch seconds of the slot start; None if not booked
+        self.reason = reason
+        self.alternatives = alternatives or []  # other slot starts with room
+
+    @property
+    def success(self) -> bool:
+        return self.slot is not None
+
+
+class DeliverySchedule:
+    def __init__(self, slot_minutes: int = 30, drivers: int = 3, pizzas_per_driver: int = 8,
+                 opening_hours=(11, 22), horizon_days: int = 14, min_notice_hours: float = 48,
+                 lead_minutes: float = 45, catering_pizzas: int = 20, now: Optional[float] = None):
+        self.slot_seconds = slot_minutes * 60
+        self.drivers = drivers
+        self.pizzas_per_driver = pizzas_per_driver
+        self.opening_hours = opening_hours
+        self.horizon_days = horizon_days
+        self.min_notice = min_notice_hours * 3600
+        self.lead = lead_minutes * 60
+        self.catering_pizzas = catering_pizzas
+        self._drivers: Dict[float, int] = {}  # slot start -> drivers, where it differs from `drivers`
+        self._booked: Dict[float, int] = {}   # slot start -> pizzas booked
+        self._base = None
+        self._tree = None
+        self._roll(time.time() if now is None else now)
+
+    def _roll(self, now: float) -> None:
+        # (Re)builds the tree when the first day of the window has passed.
+        today = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+        if self._base == today:
+            return
+        self._base = today
+        self._booked = {slot: count for slot, count in self._booked.items() if slot >= today}
+        self._drivers = {slot: count for slot, count in self._drivers.items() if slot >= today}
+        slots = self.horizon_days * 86400 // self.slot_seconds
+        self._tree = _MaxSegmentTree([self.capacity(self._slot_start(index)) - self._booked.get(self._slot_start(index), 0)
+                                      for index in range(slots)])
+
+    def _slot_start(self, index: int) -> float:
+        return self._base + index * self.slot_seconds
+
+    def _index(self, when: float) -> int:
+        return int((when - self._base) // self.slot_seconds)
+
+    def slot_of(self, when: float) -> float:
+        return self._slot_start(self._index(when))
+
+    def capacity(self, slot: float) -> int:
+        opens, closes = self.opening_hours
+        if not opens <= datetime.fromtimestamp(slot).hour < closes:
+            return 0
+        return self._drivers.get(slot, self.drivers) * self.pizzas_per_driver
+
+    def set_drivers(self, when: float, drivers: int) -> None:
+        slot = self.slot_of(when)
+        self._drivers[slot] = drivers
+        self._update(slot)
+
+    def booked(self, when: float) -> int:
+        return self._booked.get(self.slot_of(when), 0)
+
+    def remaining(self, when: float) -> int:
+        slot = self.slot_of(when)
+        return max(self.capacity(slot) - self._booked.get(slot, 0), 0)
+
+    def _update(self, slot: float) -> None:
+        index = self._index(slot)
+        if 0 <= index < self.horizon_days * 86400 // self.slot_seconds:
+            self._tree[index] = self.capacity(slot) - self._booked.get(slot, 0)
+
+    def earliest_allowed(self, pizzas: int, catering: bool = False, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        notice = self.min_notice if catering or pizzas >= self.catering_pizzas else self.lead
+        return now + notice
+
+    def next_available(self, pizzas: int, after: float, now: Optional[float] = None) -> Optional[float]:
+        # Start of the first slot beginning at or after `after` with room for
+        # `pizzas` (an order of sides only still needs an open slot).
+        self._roll(time.time() if now is None else now)
+        index = self._tree.first_at_least(math.ceil((after - self._base) / self.slot_seconds), max(pizzas, 1))
+        return None if index is None else self._slot_start(index)
+
+    def latest_available(self, pizzas: int, before: float, not_before: float,
+                         now: Optional[float] = None) -> Optional[float]:
+        # Start of the last slot before `before`, but not before `not_before`, with room for `pizzas`.
+        self._roll(time.time() if now is None else now)
+        index = self._tree.last_at_least(self._index(before), max(pizzas, 1))
+        if index is None or self._slot_start(index) < not_before:
+            return None
+        return self._slot_start(index)
+
+    def load_bookings(self, records: Iterable[dict], now: Optional[float] = None) -> int:
+        # records: order journal records (OrderRepository.order_to_record).
+        # Orders in past slots, or with a date/time we cannot read, are
+        # skipped. Returns the number of orders counted.
+        self._roll(time.time() if now is None else now)
+        counted = 0
+        for record in records:
+            try:
+                when = parse_delivery(record['dd'], record['dt'], record.get('ts'))
+            except ValueError:
+                continue
+            slot = None if when is None else self.slot_of(when)
+            if slot is None or slot < self._base:
+                continue
+            self._booked[slot] = self._booked.get(slot, 0) + sum(line[4] for line in record['p'])
+            self._update(slot)
+            counted += 1
+        return counted
+
+    @staticmethod
+    def pizza_count(order: Order) -> int:
+        return sum(quantity for _, quantity in order.pizza_lines())
+
+    def book(self, order: Order, now: Optional[float] = None) -> SlotBooking:
+        # Books the order's pizzas into the slot of its delivery time, or the
+        # first slot with room when it has none. On failure the booking lists
+        # the nearest slots, before and after, that would take it.
+        now = time.time() if now is None else now
+        self._roll(now)
+        pizzas = self.pizza_count(order)
+        if self._tree.first_at_least(0, max(pizzas, 1)) is None:
+            return SlotBooking(order, pizzas, None,
+                               f"no delivery slot in the next {self.horizon_days} days has room for {pizzas} pizzas")
+        catering = bool(order.customer_info and order.customer_info.company)
+        earliest = self.earliest_allowed(pizzas, catering, now)
+        try:
+            requested = parse_delivery(order.delivery_date, order.delivery_time, now)
+        except ValueError as error:
+            return SlotBooking(order, pizzas, None, str(error), self._alternatives(pizzas, earliest, earliest, now))
+        if requested is None:
+            slot = self.next_available(pizzas, earliest, now)
+            if slot is None:
+                return SlotBooking(order, pizzas, None, "no delivery slot has room for this order")
+            return self._reserve(order, pizzas, slot)
+        slot = self.slot_of(requested)
+        if requested < earliest:
+            notice = earliest - now
+            notice = f"{notice / 3600:g} hours" if notice >= 7200 else f"{notice / 60:g} minutes"
+            reason = f"needs at least {notice} notice"
+        elif self._index(requested) >= self.horizon_days * 86400 // self.slot_seconds:
+            reason = f"delivery slots are only open {self.horizon_days} days ahead"
+        elif self.capacity(slot) == 0:
+            reason = "we do not deliver at that time"
+        elif self.remaining(slot) < pizzas:
+            reason = f"the {datetime.fromtimestamp(slot):%H:%M} slot has room for {self.remaining(slot)} more pizzas"
+        else:
+            return self._reserve(order, pizzas, slot)
+        return SlotBooking(order, pizzas, None, reason, self._alternatives(pizzas, requested, earliest, now))
+
+    def _alternatives(self, pizzas: int, requested: float, earliest: float, now: float) -> List[float]:
+        before = self.latest_available(pizzas, requested, earliest, now) if requested > earliest else None
+        after = self.next_available(pizzas, max(requested, earliest), now)
+        return [slot for slot in (before, after) if slot is not None]
+
+    def _reserve(self, order: Order, pizzas: int, slot: float) -> SlotBooking:
+        self._booked[slot] = self._booked.get(slot, 0) + pizzas
+        self._update(slot)
+        order.delivery_slot = slot
+        return SlotBooking(order, pizzas, slot)
+
+    def cancel(self, booking: SlotBooking) -> None:
+        if booking.slot is None or booking.slot not in self._booked:
+            return
+        left = self._booked[booking.slot] - booking.pizzas
+        if left > 0:
+            self._booked[booking.slot] = left
+        else:
+            del self._booked[booking.slot]
+        self._update(booking.slot)
+        if booking.order is not None and booking.order.delivery_slot == booking.slot:
+            booking.order.delivery_slot = None
+        booking.slot = None
+
+    def unbook(self, order: Order) -> None:
+        # Gives back the slot book() put the order in, if any.
+        if order.delivery_slot is not None:
+            self.cancel(SlotBooking(order, self.pizza_count(order), order.delivery_slot))
@@ -0,0 +1,291 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import Counter
+from itertools import groupby, islice
+from typing import Callable, Iterable, Iterator, Optional, TextIO, Tuple
+
+from bussinese import CustomerInfo, CustomPizzaOrder, Order
+from kitchen import parse_delivery
+from pricing import pricing_engine
+
+# Non-interactive order entry for the web and phone channels.
+#
+# Orders stream through a chain of generators, one stage per step:
+#
+#     read (JSONL / CSV / stdin) -> build + validate -> price -> [book delivery] -> deduct -> journal
+#
+# With book_slots (--book-slots, for live web and phone orders) an order is
+# booked into its delivery slot before its stock is deducted, as at the
+# counter (an order without a date and time gets the first free slot), and
+# gives the slot back if it is then rejected. Orders dated in the past are
+# never booked, so a day's orders can be replayed with or without it. Only
+# one wave of `wave_size` orders is held at a time, so memory stays
+# bounded whatever the size of the input. Inventory is deducted per wave with
+# InventoryManager.use_ingredients_bulk (one inventory write per wave) and the
+# journal is committed in groups. Rejected orders are counted by reason and,
+# optionally, written as JSON lines to a rejects file.
+#
+# JSONL input, one order per line:
+#
+#     {"ref": "web-1001",
+#      "customer": {"name": "Ann", "phone": "510-555-0100", "email": "ann@example.com", "company": null},
+#      "delivery_date": "2024-05-01", "delivery_time": "18:30",
+#      "pizzas": [{"name": "Pepperoni", "size": "large", "quantity": 2},
+#                 {"custom": {"Thin Crust": 1, "Tomato": 1, "Ham": 2}, "size": "large"}],
+#      "sides": [{"name": "Water", "quantity": 2}],
+#      "total": 42.75}
+#
+# "total" is optional; when given, an order whose computed total differs is
+# rejected. CSV input has one row per order line with the columns in
+# CSV_FIELDNAMES; consecutive rows with the same ref make up one order.
+
+CSV_FIELDNAMES = ['ref', 'customer_name', 'phone', 'email', 'company', 'delivery_date', 'delivery_time',
+                  'kind', 'name', 'size', 'quantity']
+
+
+class IngestReport:
+    def __init__(self, rejects: Optional[TextIO] = None):
+        self.read = 0
+        self.accepted = 0
+        self.rejected = Counter()  # reason -> count
+        self._rejects = rejects
+        self._started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def reject(self, ref, reason: str, detail: str = '') -> None:
+        self.rejected[reason] += 1
+        if self._rejects is not None:
+            self._rejects.write(json.dumps({'ref': ref, 'reason': reason, 'detail': detail}) + '\n')
+
+    def finish(self) -> 'IngestReport':
+        self.elapsed = time.perf_counter() - self._started
+        return self
+
+    @property
+    def throughput(self) -> float:
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        lines = [f"Read {self.read} orders in {self.elapsed:.2f}s ({self.throughput:,.0f} orders/s).",
+                 f"Accepted: {self.accepted}",
+                 f"Rejected: {sum(self.rejected.values())}"]
+        for reason, count in self.rejected.most_common():
+            lines.append(f"  {reason}: {count}")
+        return "\n".join(lines)
+
+
+def read_jsonl(stream: TextIO, report: IngestReport) -> Iterator[Tuple[object, dict]]:
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        report.read += 1
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            report.reject(f"line {line_no}", 'malformed', str(error))
+            continue
+        if not isinstance(record, dict):
+            report.reject(f"line {line_no}", 'malformed', 'not a JSON object')
+            continue
+        yield record.get('ref', f"line {line_no}"), record
+
+
+def read_csv(stream: TextIO, report: IngestReport) -> Iterator[Tuple[object, dict]]:
+    # Regroups the per-line rows into the same shape as a JSONL record.
+    for ref, rows in groupby(csv.DictReader(stream), key=lambda row: row['ref']):
+        report.read += 1
+        record = None
+        for row in rows:
+            if record is None:
+                record = {
+                    'customer': {'name': row['customer_name'], 'phone': row['phone'],
+                                 'email': row['email'], 'company': row['company'] or None},
+                    'delivery_date': row['delivery_date'],
+                    'delivery_time': row['delivery_time'],
+                    'pizzas': [],
+                    'sides': [],
+                }
+            line = {'name': row['name'], 'size': row['size'] or None, 'quantity': row['quantity'] or 1}
+            if row['kind'] == 'side':
+                record['sides'].append(line)
+            else:
+                record['pizzas'].append(line)
+        yield ref, record
+
+
+def _quantity(line: dict) -> int:
+    # A whole number: an int in JSON (not a bool or a float like 2.9), or
+    # digits in a CSV cell. int() would round 2.9 down and take True as 1.
+    quantity = line.get('quantity', 1)
+    if isinstance(quantity, str) and quantity.strip().isdecimal():
+        quantity = int(quantity)
+    elif type(quantity) is not int:
+        raise ValueError(f"quantity must be a whole number, got {quantity!r}")
+    if quantity < 1:
+        raise ValueError(f"quantity must be at least 1, got {quantity}")
+    return quantity
+
+
+def build_order(record: dict, pizza_store) -> Order:
+    # Resolves every line against the menu indexes. Raises LookupError for
+    # unknown items and KeyError/TypeError/ValueError for malformed records.
+    menu_mgt = pizza_store.menu_mgt
+    side_menu_mgt = pizza_store.side_menu_mgt
+    pizzas = []
+    for line in record.get('pizzas') or ():
+        if 'custom' in line:
+            unknown = [option for option in line['custom'] if not pricing_engine.has_option(option)]
+            if unknown:
+                raise LookupError(f"unknown custom pizza option(s): {', '.join(unknown)}")
+            item = CustomPizzaOrder.build_custom_pizza(line['custom'], line.get('size'))
+        else:
+            item = menu_mgt.get_menu_item(line['name'], line.get('size'))
+            if item is None:
+                size = f" in size '{line['size']}'" if line.get('size') else ''
+                raise LookupError(f"no menu item '{line['name']}'{size}")
+        pizzas.append((item, _quantity(line)))
+    sides = []
+    for line in record.get('sides') or ():
+        item = side_menu_mgt.get_side_item_by_name(line['name'])
+        if item is None:
+            raise LookupError(f"no side item '{line['name']}'")
+        sides.append((item, _quantity(line)))
+    if not pizzas and not sides:
+        raise ValueError('order has no pizzas or sides')
+    customer = record.get('customer')
+    delivery_date = record.get('delivery_date', '')
+    delivery_time = record.get('delivery_time', '')
+    if customer:
+        customer = CustomerInfo(customer.get('name', ''), customer.get('phone', ''), customer.get('email', ''),
+                                customer.get('company'), delivery_date, delivery_time)
+    return Order(customer or None, delivery_date, delivery_time, pizzas, sides)
+
+
+def build_orders(records: Iterable[Tuple[object, dict]], pizza_store,
+                 report: IngestReport) -> Iterator[Tuple[object, Order, Optional[float]]]:
+    for ref, record in records:
+        try:
+            order = build_order(record, pizza_store)
+        except LookupError as error:
+            report.reject(ref, 'unknown item', str(error))
+            continue
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            report.reject(ref, 'invalid', f"{type(error).__name__}: {error}")
+            continue
+        yield ref, order, record.get('total')
+
+
+def price_orders(orders: Iterable[Tuple[object, Order, Optional[float]]],
+                 report: IngestReport) -> Iterator[Tuple[object, Order]]:
+    for ref, order, expected in orders:
+        total = order.total()  # cached on the order for the journal
+        if expected is not None and abs(float(expected) - total) >= 0.005:
+            report.reject(ref, 'price mismatch', f"expected {expected}, computed {total:.2f}")
+            continue
+        yield ref, order
+
+
+def book_deliveries(orders: Iterable[Tuple[object, Order]], pizza_store,
+                    report: IngestReport) -> Iterator[Tuple[object, Order]]:
+    now = time.time()
+    for ref, order in orders:
+        try:
+            when = parse_delivery(order.delivery_date, order.delivery_time, now)
+        except ValueError:
+            when = None  # book() rejects it with the reason
+        if when is not None and when < now:
+            yield ref, order  # already delivered: nothing to book
+            continue
+        booking = pizza_store.schedule_delivery(order)
+        if not booking.success:
+            report.reject(ref, 'no delivery slot', booking.reason)
+            continue
+        yield ref, order
+
+
+def deduct_inventory(orders: Iterable[Tuple[object, Order]], inventory_mgr, report: IngestReport,
+                     wave_size: int = 1000,
+                     on_reject: Optional[Callable[[Order], None]] = None) -> Iterator[Tuple[object, Order]]:
+    # Orders are checked in arrival order within each wave, as at the counter.
+    # on_reject(order) is called for each order turned away.
+    orders = iter(orders)
+    while True:
+        wave = list(islice(orders, wave_size))
+        if not wave:
+            return
+        results = inventory_mgr.use_ingredients_bulk([order for _, order in wave])
+        for (ref, order), result in zip(wave, results):
+            if result.success:
+                yield ref, order
+            else:
+                shortages = ', '.join(f"{name} short by {missing:g}" for name, missing in result.shortages.items())
+                report.reject(ref, 'out of stock', shortages)
+                if on_reject is not None:
+                    on_reject(order)
+
+
+def journal_orders(orders: Iterable[Tuple[object, Order]], pizza_store, report: IngestReport) -> None:
+    for _, order in orders:
+        pizza_store.record_order(order, schedule=False)
+        report.accepted += 1
+    pizza_store.order_repo.commit()
+    pizza_store.customers.commit()
+
+
+def ingest(pizza_store, stream: TextIO, fmt: str = 'jsonl', wave_size: int = 1000,
+           rejects: Optional[TextIO] = None, book_slots: bool = False) -> IngestReport:
+    report = IngestReport(rejects)
+    reader = read_csv if fmt == 'csv' else read_jsonl
+    records = reader(stream, report)
+    orders = build_orders(records, pizza_store, report)
+    orders = price_orders(orders, report)
+    on_reject = None
+    if book_slots:
+        orders = book_deliveries(orders, pizza_store, report)
+        on_reject = pizza_store.delivery.unbook
+    orders = deduct_inventory(orders, pizza_store.inventory_mgr, report, wave_size, on_reject)
+    journal_orders(orders, pizza_store, report)
+    pizza_store.inventory_mgr.flush()
+    return report.finish()
+
+
+def main(argv=None) -> int:
+    from instrumentation import configure_from_environment
+    from Presentation import SNAPSHOT_FILE, PizzaStore
+    from snapshot import load_store
+
+    parser = argparse.ArgumentParser(description="Ingest orders from a JSONL or CSV file (or stdin) without prompts.")
+    parser.add_argument('source', nargs='?', default='-', help="orders file, or - for stdin (default)")
+    parser.add_argument('--format', choices=('jsonl', 'csv'), help="input format (default: from the file extension)")
+    parser.add_argument('--sqlite', action='store_true', help="use the SQLite storage backend")
+    parser.add_argument('--data-dir', default='.', help="directory holding the store's files (default: current)")
+    parser.add_argument('--wave-size', type=int, default=1000, help="orders per inventory deduction wave")
+    parser.add_argument('--rejects', help="write rejected orders to this file as JSON lines")
+    parser.add_argument('--book-slots', action='store_true',
+                        help="book each upcoming order into a delivery slot and reject those that do not fit")
+    args = parser.parse_args(argv)
+
+    configure_from_environment()
+    fmt = args.format or ('csv' if args.source.lower().endswith('.csv') else 'jsonl')
+    pizza_store = PizzaStore('sqlite' if args.sqlite else 'csv', journal_commit_every=args.wave_size, load_inventory=False,
+                             data_dir=args.data_dir)
+    load_store(pizza_store, pizza_store.path(SNAPSHOT_FILE))
+    source = sys.stdin if args.source == '-' else open(args.source, newline='')
+    rejects = open(args.rejects, 'w') if args.rejects else None
+    try:
+        report = ingest(pizza_store, source, fmt, args.wave_size, rejects, args.book_slots)
+    finally:
+        pizza_store.close()
+        if source is not sys.stdin:
+            source.close()
+        if rejects is not None:
+            rejects.close()
+    print(report.summary())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
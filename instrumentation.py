@@ -0,0 +1,318 @@
+import atexit
+import cProfile
+import functools
+import importlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from persistence import atomic_write
+
+# Opt-in timing of the store's hot paths.
+#
+# While disabled nothing is wrapped: the operations in HOT_PATHS are the
+# original methods, so there is no overhead at all. enable() replaces each of
+# them on its class with a wrapper that records the call in the registry,
+# and disable() puts the originals back. Other code can be timed with the
+# @registry.timed(name) decorator or a `with registry.measure(name):` block;
+# those only check a flag while disabled.
+#
+# Every operation keeps its call and error counts, cumulative and maximum
+# time, bytes read and written (for the CSV tables), and its latest
+# RESERVOIR_SIZE latencies for percentiles. snapshot() returns all of it as a
+# dict; write_json() and write_prometheus() save it as a JSON snapshot or in
+# the Prometheus text format (for node_exporter's textfile collector).
+#
+# profile(operations, every) runs every `every`-th call of the given
+# operations under cProfile; dump_profile() writes the accumulated stats for
+# pstats / snakeviz.
+#
+# From the command line, set PIZZA_METRICS=<file> (.json for JSON, anything
+# else for Prometheus text) to enable instrumentation and write the metrics
+# on exit, and PIZZA_PROFILE=<operation>,... (with PIZZA_PROFILE_FILE and
+# PIZZA_PROFILE_EVERY) to profile.
+
+# (module, class, method, operation name, bytes counted)
+HOT_PATHS = [
+    ('persistence', 'CsvTable', 'load', 'csv.load', 'read'),
+    ('persistence', 'CsvTable', 'save', 'csv.save', 'written'),
+    ('Datalayer', 'OrderRepository', 'append', 'journal.append', None),
+    ('Datalayer', 'OrderRepository', 'commit', 'journal.commit', None),
+    ('Datalayer', 'OrderRepository', 'get', 'journal.get', None),
+    ('sqlite_store', 'SqliteOrderRepository', 'append', 'journal.append', None),
+    ('bussinese', 'InventoryManager', 'load_inventory', 'inventory.load', None),
+    ('bussinese', 'InventoryManager', 'save_inventory', 'inventory.save', None),
+    ('bussinese', 'InventoryManager', 'use_ingredient', 'inventory.use_ingredient', None),
+    ('bussinese', 'InventoryManager', 'use_ingredients_bulk', 'inventory.use_ingredients_bulk', None),
+    ('bussinese', 'InventoryManager', 'reserve_order', 'inventory.reserve_order', None),
+    ('bussinese', 'InventoryManager', 'commit', 'inventory.commit', None),
+    ('bussinese', 'InventoryManager', 'release', 'inventory.release', None),
+    ('bussinese', 'RecipeManagement', 'get_recipe_by_name', 'recipes.get_by_name', None),
+    ('bussinese', 'RecipeManagement', 'search_recipes', 'recipes.search', None),
+    ('bussinese', 'MenuManagement', 'get_menu_item_by_name', 'menu.get_by_name', None),
+    ('bussinese', 'MenuManagement', 'get_menu_item', 'menu.get_item', None),
+    ('bussinese', 'MenuManagement', 'get_menu_items_by_size', 'menu.by_size', None),
+    ('bussinese', 'MenuManagement', 'get_menu_items_by_category', 'menu.by_category', None),
+    ('bussinese', 'SideMenuManagement', 'get_side_item_by_name', 'sides.get_by_name', None),
+    ('bussinese', 'Order', '__init__', 'order.create', None),
+    ('bussinese', 'Order', 'total', 'order.total', None),
+    ('bussinese', 'Order', 'generate_order_slip', 'order.slip', None),
+]
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _bytes_read(before, after) -> int:
+    return sum(signature[1] for signature in after if signature)
+
+
+def _bytes_written(before, after) -> int:
+    # A rewritten base file counts in full, the delta log by how much it grew.
+    (base_before, delta_before), (base_after, delta_after) = before, after
+    written = base_after[1] if base_after and base_after != base_before else 0
+    if delta_after and delta_after != delta_before:
+        grown = delta_after[1] - (delta_before[1] if delta_before else 0)
+        written += grown if grown > 0 else delta_after[1]
+    return written
+
+
+class OperationStats:
+    __slots__ = ('name', 'calls', 'errors', 'seconds', 'max_seconds', 'bytes_read', 'bytes_written', '_samples', '_next')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._samples: List[float] = []
+        self._next = 0
+
+    def add(self, seconds: float, error: bool, bytes_read: int, bytes_written: int, reservoir: int) -> None:
+        self.calls += 1
+        self.errors += error
+        self.seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        self.bytes_read += bytes_read
+        self.bytes_written += bytes_written
+        if len(self._samples) < reservoir:
+            self._samples.append(seconds)
+        else:
+            self._samples[self._next] = seconds
+            self._next = (self._next + 1) % reservoir
+
+    def quantiles(self, fractions: Iterable[float] = QUANTILES) -> Dict[float, float]:
+        # Over the latest samples only.
+        samples = sorted(self._samples)
+        if not samples:
+            return {fraction: 0.0 for fraction in fractions}
+        return {fraction: samples[min(len(samples) - 1, int(fraction * len(samples)))] for fraction in fractions}
+
+    def to_dict(self) -> dict:
+        return {'calls': self.calls, 'errors': self.errors, 'seconds': self.seconds, 'max_seconds': self.max_seconds,
+                'bytes_read': self.bytes_read, 'bytes_written': self.bytes_written,
+                'quantiles': {str(fraction): value for fraction, value in self.quantiles().items()}}
+
+
+class Instrumentation:
+    RESERVOIR_SIZE = 1024
+
+    def __init__(self):
+        self.enabled = False
+        self._stats: Dict[str, OperationStats] = {}
+        self._lock = threading.Lock()
+        self._patched = []  # (class, method name, original attribute)
+        self._profiler: Optional[cProfile.Profile] = None
+        self._profile_lock = threading.Lock()  # one profiled call at a time
+        self._profile_operations = frozenset()
+        self._profile_every = 1
+        self._profile_calls: Dict[str, int] = {}
+
+    def enable(self, targets=None) -> None:
+        if self.enabled:
+            return
+        for module_name, class_name, method, operation, io in HOT_PATHS if targets is None else targets:
+            owner = getattr(importlib.import_module(module_name), class_name)
+            original = owner.__dict__.get(method)
+            if original is None:
+                continue
+            self._patched.append((owner, method, original))
+            setattr(owner, method, self._wrap(original, operation, io))
+        self.enabled = True
+
+    def disable(self) -> None:
+        for owner, method, original in reversed(self._patched):
+            setattr(owner, method, original)
+        self._patched = []
+        self.enabled = False
+
+    def _wrap(self, original, operation: str, io: Optional[str]):
+        function = original.__func__ if isinstance(original, (staticmethod, classmethod)) else original
+        clock = time.perf_counter
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            before = args[0].signature() if io else None
+            error = True
+            started = clock()
+            try:
+                if operation in self._profile_operations:
+                    result = self._call_profiled(operation, function, args, kwargs)
+                else:
+                    result = function(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                elapsed = clock() - started
+                bytes_read = bytes_written = 0
+                if io == 'read':
+                    bytes_read = _bytes_read(before, args[0].signature())
+                elif io == 'written':
+                    bytes_written = _bytes_written(before, args[0].signature())
+                self.record(operation, elapsed, error, bytes_read, bytes_written)
+
+        if isinstance(original, staticmethod):
+            return staticmethod(wrapper)
+        if isinstance(original, classmethod):
+            return classmethod(wrapper)
+        return wrapper
+
+    def record(self, operation: str, seconds: float, error: bool = False, bytes_read: int = 0,
+               bytes_written: int = 0) -> None:
+        with self._lock:
+            stats = self._stats.get(operation)
+            if stats is None:
+                stats = self._stats[operation] = OperationStats(operation)
+            stats.add(seconds, error, bytes_read, bytes_written, self.RESERVOIR_SIZE)
+
+    def timed(self, operation: Optional[str] = None):
+        # Decorator; records calls only while instrumentation is enabled.
+        def decorate(function):
+            name = operation or f"{function.__module__}.{function.__qualname__}"
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self.measure(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    @contextmanager
+    def measure(self, operation: str):
+        if not self.enabled:
+            yield
+            return
+        error = True
+        started = time.perf_counter()
+        try:
+            yield
+            error = False
+        finally:
+            self.record(operation, time.perf_counter() - started, error)
+
+    def profile(self, operations: Iterable[str], every: int = 1) -> None:
+        # Profiles every `every`-th call of the operations (HOT_PATHS names).
+        self._profiler = self._profiler or cProfile.Profile()
+        self._profile_every = max(every, 1)
+        self._profile_operations = frozenset(operations)
+
+    def stop_profiling(self) -> None:
+        self._profile_operations = frozenset()
+
+    def _call_profiled(self, operation: str, function, args, kwargs):
+        with self._lock:
+            calls = self._profile_calls[operation] = self._profile_calls.get(operation, 0) + 1
+        if calls % self._profile_every or not self._profile_lock.acquire(blocking=False):
+            return function(*args, **kwargs)
+        try:
+            return self._profiler.runcall(function, *args, **kwargs)
+        finally:
+            self._profile_lock.release()
+
+    def dump_profile(self, path: str) -> bool:
+        if self._profiler is None:
+            return False
+        with self._profile_lock:
+            self._profiler.dump_stats(path)
+        return True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = {}
+            self._profile_calls = {}
+        self._profiler = cProfile.Profile() if self._profiler is not None else None
+
+    def stats(self, operation: str) -> Optional[OperationStats]:
+        return self._stats.get(operation)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            operations = {name: stats.to_dict() for name, stats in sorted(self._stats.items())}
+        return {'enabled': self.enabled, 'timestamp': time.time(), 'operations': operations}
+
+    def to_prometheus(self) -> str:
+        with self._lock:
+            stats = sorted(self._stats.values(), key=lambda stats: stats.name)
+        metrics = [
+            ('pizza_operation_calls_total', 'counter', 'Calls of the operation.', lambda s: s.calls),
+            ('pizza_operation_errors_total', 'counter', 'Calls that raised.', lambda s: s.errors),
+            ('pizza_operation_bytes_read_total', 'counter', 'Bytes read from CSV tables.', lambda s: s.bytes_read),
+            ('pizza_operation_bytes_written_total', 'counter', 'Bytes written to CSV tables.', lambda s: s.bytes_written),
+            ('pizza_operation_max_seconds', 'gauge', 'Slowest call so far.', lambda s: s.max_seconds),
+        ]
+        lines = []
+        for name, kind, description, value in metrics:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            lines += [f'{name}{{operation="{s.name}"}} {value(s)}' for s in stats]
+        lines += ["# HELP pizza_operation_seconds Latency of the operation (quantiles over recent calls).",
+                  "# TYPE pizza_operation_seconds summary"]
+        for s in stats:
+            for fraction, value in s.quantiles().items():
+                lines.append(f'pizza_operation_seconds{{operation="{s.name}",quantile="{fraction}"}} {value}')
+            lines.append(f'pizza_operation_seconds_sum{{operation="{s.name}"}} {s.seconds}')
+            lines.append(f'pizza_operation_seconds_count{{operation="{s.name}"}} {s.calls}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str) -> None:
+        _write_text(path, self.to_prometheus())
+
+    def write_json(self, path: str) -> None:
+        _write_text(path, json.dumps(self.snapshot(), indent=2))
+
+    def write(self, path: str) -> None:
+        if path.endswith('.json'):
+            self.write_json(path)
+        else:
+            self.write_prometheus(path)
+
+
+def _write_text(path: str, text: str) -> None:
+    # Write-then-rename, so a collector never reads a half-written file.
+    atomic_write(path, lambda output: output.write(text))
+
+
+registry = Instrumentation()
+
+
+def configure_from_environment(environ=os.environ) -> bool:
+    # For the command-line entry points; returns True if instrumentation was enabled.
+    metrics_path = environ.get('PIZZA_METRICS')
+    profile = environ.get('PIZZA_PROFILE')
+    if not metrics_path and not profile:
+        return False
+    registry.enable()
+    if metrics_path:
+        atexit.register(registry.write, metrics_path)
+    if profile:
+        registry.profile([operation.strip() for operation in profile.split(',') if operation.strip()],
+                         int(environ.get('PIZZA_PROFILE_EVERY') or 1))
+        atexit.register(registry.dump_profile, environ.get('PIZZA_PROFILE_FILE') or 'profile.pstats')
+    return True
@@ -0,0 +1,249 @@
+import heapq
+import itertools
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from bussinese import Order, PizzaMenuItem, PizzaSize
+
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%d.%m.%Y')
+TIME_FORMATS = ('%H:%M', '%H:%M:%S', '%I:%M %p', '%I:%M%p', '%I %p', '%I%p')
+DEFAULT_DELIVERY_TIME = '18:00'  # for orders that give a date but no time
+COOK_TIMES = {PizzaSize.SMALL: 6 * 60, PizzaSize.MEDIUM: 7 * 60, PizzaSize.LARGE: 8 * 60}  # seconds per oven cycle
+
+
+@lru_cache(maxsize=4096)  # a day's orders share a handful of dates and times
+def _parse(value: str, formats) -> Optional[datetime]:
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    return None
+
+
+def parse_delivery(delivery_date: str, delivery_time: str, now: Optional[float] = None) -> Optional[float]:
+    # Delivery date/time strings -> epoch seconds; None when neither is given.
+    # A missing date means today. Raises ValueError for text we cannot read.
+    date_text = (delivery_date or '').strip()
+    time_text = (delivery_time or '').strip().upper()
+    if not date_text and not time_text:
+        return None
+    now = time.time() if now is None else now
+    day = _parse(date_text, DATE_FORMATS) if date_text else datetime.fromtimestamp(now)
+    clock = _parse(time_text or DEFAULT_DELIVERY_TIME, TIME_FORMATS)
+    if day is None or clock is None:
+        raise ValueError(f"cannot read delivery date/time '{delivery_date} {delivery_time}'")
+    return day.replace(hour=clock.hour, minute=clock.minute, second=clock.second, microsecond=0).timestamp()
+
+
+def parse_deadline(delivery_date: str, delivery_time: str, now: Optional[float] = None) -> float:
+    # Like parse_delivery, but an order without a usable date/time is due right away.
+    now = time.time() if now is None else now
+    try:
+        deadline = parse_delivery(delivery_date, delivery_time, now)
+    except ValueError:
+        return now
+    return now if deadline is None else deadline
+
+
+class MakeTicket:
+    # One pizza line of an accepted order, waiting to be cooked.
+    __slots__ = ('order', 'item', 'quantity', 'deadline')
+
+    def __init__(self, order: Order, item: PizzaMenuItem, quantity: int, deadline: float):
+        self.order = order
+        self.item = item
+        self.quantity = quantity
+        self.deadline = deadline
+
+
+class Batch:
+    # Pizzas of one kind cooked together in one oven cycle.
+    def __init__(self, oven: int, key: tuple, tickets: List[Tuple[MakeTicket, int]], start: float, done: float):
+        self.oven = oven
+        self.key = key
+        self.tickets = tickets  # (ticket, pizzas of it in this batch)
+        self.start = start
+        self.done = done
+
+    @property
+    def name(self) -> str:
+        return self.key[0]
+
+    @property
+    def size(self) -> str:
+        return self.key[1]
+
+    @property
+    def quantity(self) -> int:
+        return sum(count for _, count in self.tickets)
+
+
+class KitchenScheduler:
+    # Production queue for the ovens.
+    #
+    # Accepted orders are split into make-tickets, one per pizza line, and
+    # filed by pizza kind (name, size and recipe, so two identical custom
+    # pizzas batch together too). Each kind keeps a heap of its tickets by
+    # delivery deadline, and a global heap orders the kinds by their most
+    # urgent ticket; stale global entries are skipped when popped instead of
+    # being removed. Dispatching takes the most urgent kind and fills one
+    # oven cycle with up to `oven_capacity` of its pizzas, including every
+    # ticket due within `batch_window` seconds of the first, on the oven that
+    # frees up first; no batch starts more than `start_window` seconds before
+    # its deadline. submit() and next_batch() are O(log n) per ticket.
+    #
+    # predicted_completions() simulates the rest of the queue on copies of
+    # these heaps, so it costs O(n log n) and does not change the schedule.
+
+    def __init__(self, ovens: int = 2, oven_capacity: int = 10, cook_times: Optional[Dict[str, float]] = None,
+                 batch_window: float = 15 * 60, start_window: float = 60 * 60):
+        self.oven_capacity = oven_capacity
+        self.cook_times = dict(COOK_TIMES if cook_times is None else cook_times)
+        self.batch_window = batch_window
+        self.start_window = start_window  # earliest a batch may start before its deadline
+        self._ovens: List[Tuple[float, int]] = [(0.0, oven) for oven in range(ovens)]  # heap of (free at, oven)
+        self._groups: Dict[tuple, list] = {}  # pizza kind -> heap of (deadline, seq, ticket)
+        self._queue: List[Tuple[float, int, tuple]] = []  # heap of (earliest deadline, seq, pizza kind)
+        self._remaining: Dict[MakeTicket, int] = {}  # ticket -> pizzas not yet in an oven
+        self._unfinished: Dict[int, int] = {}  # id(order) -> pizzas not yet out of the oven
+        self._dispatched_done: Dict[int, float] = {}  # id(order) -> latest end of its batches so far
+        self._in_oven: List[Batch] = []
+        self._pending_pizzas = 0
+        self._seq = itertools.count()
+
+    @property
+    def ovens(self) -> int:
+        return len(self._ovens)
+
+    @property
+    def queue_depth(self) -> int:
+        # Pizzas waiting for an oven.
+        return self._pending_pizzas
+
+    @property
+    def pending_tickets(self) -> int:
+        return len(self._remaining)
+
+    @property
+    def in_oven(self) -> List[Batch]:
+        return list(self._in_oven)
+
+    def cook_time(self, size) -> float:
+        return self.cook_times.get(size, max(self.cook_times.values()))
+
+    @staticmethod
+    def pizza_key(item: PizzaMenuItem) -> tuple:
+        recipe = item.recipe
+        return (item.name, item.size, tuple(recipe.ingredient_ids), tuple(recipe.amounts))
+
+    def submit(self, order: Order, now: Optional[float] = None) -> int:
+        # Returns the number of tickets created (orders with only sides need none).
+        deadline = parse_deadline(order.delivery_date, order.delivery_time, now)
+        tickets = 0
+        for item, quantity in order.pizza_lines():
+            if quantity <= 0:
+                continue
+            ticket = MakeTicket(order, item, quantity, deadline)
+            key = self.pizza_key(item)
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = []
+            if not group or deadline < group[0][0]:
+                heapq.heappush(self._queue, (deadline, next(self._seq), key))
+            heapq.heappush(group, (deadline, next(self._seq), ticket))
+            self._remaining[ticket] = quantity
+            self._unfinished[id(order)] = self._unfinished.get(id(order), 0) + quantity
+            self._pending_pizzas += quantity
+            tickets += 1
+        return tickets
+
+    def _dispatch(self, groups, queue, ovens, remaining, now: float, due_only: bool = False) -> Optional[Batch]:
+        # Fills the next oven cycle; shared by the real schedule and predictions.
+        # With due_only, nothing is dispatched that may not start by `now`.
+        while queue:
+            deadline, seq, key = heapq.heappop(queue)
+            group = groups.get(key)
+            if not group or group[0][0] != deadline:
+                continue  # stale entry
+            if due_only and deadline - self.start_window > now:
+                heapq.heappush(queue, (deadline, seq, key))
+                return None
+            free_at, oven = heapq.heappop(ovens)
+            start = max(now, free_at, deadline - self.start_window)
+            capacity = self.oven_capacity
+            taken = []
+            while group and capacity and group[0][0] <= deadline + self.batch_window:
+                ticket = group[0][2]
+                left = remaining[ticket]
+                count = min(left, capacity)
+                taken.append((ticket, count))
+                capacity -= count
+                if count == left:
+                    heapq.heappop(group)
+                    del remaining[ticket]
+                else:
+                    remaining[ticket] = left - count
+            if group:
+                heapq.heappush(queue, (group[0][0], next(self._seq), key))
+            else:
+                del groups[key]
+            done = start + self.cook_time(key[1])
+            heapq.heappush(ovens, (done, oven))
+            return Batch(oven, key, taken, start, done)
+        return None
+
+    def next_batch(self, now: Optional[float] = None) -> Optional[Batch]:
+        # The batch to put in the oven that is free now, or None if every oven
+        # is busy or nothing is due to start yet.
+        now = time.time() if now is None else now
+        if not self._remaining or self._ovens[0][0] > now:
+            return None
+        batch = self._dispatch(self._groups, self._queue, self._ovens, self._remaining, now, due_only=True)
+        if batch is not None:
+            self._pending_pizzas -= batch.quantity
+            self._in_oven.append(batch)
+            for ticket, _ in batch.tickets:
+                key = id(ticket.order)
+                self._dispatched_done[key] = max(self._dispatched_done.get(key, 0.0), batch.done)
+        return batch
+
+    def finish(self, batch: Batch, now: Optional[float] = None) -> List[Order]:
+        # Records a batch as out of the oven; returns the orders now complete.
+        now = time.time() if now is None else now
+        self._in_oven.remove(batch)
+        self._ovens = [(now if oven == batch.oven else free_at, oven) for free_at, oven in self._ovens]
+        heapq.heapify(self._ovens)
+        ready = []
+        for ticket, count in batch.tickets:
+            key = id(ticket.order)
+            left = self._unfinished[key] - count
+            if left:
+                self._unfinished[key] = left
+            else:
+                del self._unfinished[key]
+                self._dispatched_done.pop(key, None)
+                ready.append(ticket.order)
+        return ready
+
+    def predicted_completions(self, now: Optional[float] = None) -> Dict[int, float]:
+        # id(order) -> when its last pizza should come out of the oven, for
+        # every order still in the kitchen.
+        now = time.time() if now is None else now
+        groups = {key: list(group) for key, group in self._groups.items()}
+        queue = list(self._queue)
+        ovens = list(self._ovens)
+        remaining = dict(self._remaining)
+        completions = dict(self._dispatched_done)
+        while True:
+            batch = self._dispatch(groups, queue, ovens, remaining, now)
+            if batch is None:
+                return completions
+            for ticket, _ in batch.tickets:
+                key = id(ticket.order)
+                completions[key] = max(completions.get(key, 0.0), batch.done)
+
+    def predicted_completion(self, order: Order, now: Optional[float] = None) -> Optional[float]:
+        return self.predicted_completions(now).get(id(order))
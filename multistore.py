@@ -0,0 +1,315 @@
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from catalog import catalog, normalize_name
+from Datalayer import IngredientRepository, PizzaMenuRepository, PizzaRecipeRepository
+from persistence import CsvTable
+
+# Chain-wide view of the inventories of many stores, each in its own data
+# directory (ingredients.csv, recipes.csv, menu_items.csv, as used by
+# PizzaStore(data_dir=...)).
+#
+# summarize_store() reads and checks one store's files and reduces them to a
+# small picklable summary: the stock of each ingredient, what is at or below
+# its reorder level, and the problems found in the files. Ingredients are
+# keyed by name (compared case-insensitively, with the aliases of one chain-wide
+# aliases file resolved), since catalog ids are only meaningful inside one
+# process. summarize_chain() runs
+# it for every store on a ProcessPoolExecutor and merges the summaries into a
+# ChainInventory, which gives:
+#
+#     shortages   per store, the ingredients at or below their reorder level
+#     transfers   stock to move from stores with plenty to stores that are short
+#     reorder     what the chain still has to order after those transfers
+#
+# A short store is topped up to `buffer` times its reorder level; a store can
+# give away whatever it holds above `buffer` times its own level. Transfers
+# only pair stores that stock the ingredient in the same unit.
+
+EPSILON = 1e-9
+
+
+@lru_cache(maxsize=None)
+def ingredient_key(name: str) -> str:
+    return catalog.canonical_name(name).casefold()
+
+
+def _name_key(name: str) -> str:
+    return normalize_name(name).casefold()
+
+
+def _load_aliases(filename: Optional[str]) -> List[str]:
+    # Also the worker initializer, so every process folds the same names.
+    return catalog.load_aliases(filename) if filename else []
+
+
+def _load_rows(data_dir: str, filename: str, fieldnames, key_fields, problems: List[str]) -> Optional[List[dict]]:
+    # The file's rows with its delta log applied, or None if it is missing or
+    # unreadable. Read only, so none of the persistence layer's state is kept.
+    try:
+        return list(CsvTable(os.path.join(data_dir, filename), fieldnames, key_fields).read()[0].values())
+    except FileNotFoundError:
+        return None
+    except (OSError, csv.Error, UnicodeDecodeError) as error:
+        problems.append(f"{filename}: {error}")
+        return None
+
+
+def summarize_store(data_dir: str) -> dict:
+    # Runs in the worker processes; returns only plain data.
+    problems = []
+    stock = {}  # ingredient key -> (name, quantity, unit, reorder level)
+    rows = _load_rows(data_dir, 'ingredients.csv', IngredientRepository.FIELDNAMES, ['name'], problems)
+    if rows is None and not problems:
+        problems.append("ingredients.csv not found")
+    for row in rows or ():
+        name = normalize_name(row.get('name') or '')
+        if not name:
+            problems.append("ingredients.csv: a row has no name")
+            continue
+        try:
+            quantity, reorder_level = float(row['quantity']), int(row['reorder_level'])
+        except (KeyError, TypeError, ValueError):
+            problems.append(f"ingredients.csv: {name}: invalid quantity or reorder level")
+            continue
+        if not math.isfinite(quantity) or quantity < 0 or reorder_level < 0:
+            problems.append(f"ingredients.csv: {name}: negative quantity or reorder level")
+            continue
+        key = ingredient_key(name)
+        if key in stock:
+            problems.append(f"ingredients.csv: {name}: listed more than once")
+            continue
+        stock[key] = (name, quantity, (row.get('unit') or '').strip(), reorder_level)
+
+    recipes = set()
+    unstocked = {}  # ingredient name -> recipes using it
+    for row in _load_rows(data_dir, 'recipes.csv', PizzaRecipeRepository.FIELDNAMES,
+                          PizzaRecipeRepository.KEY_FIELDS, problems) or ():
+        recipe, ingredient = normalize_name(row.get('recipe_name') or ''), normalize_name(row.get('ingredient_name') or '')
+        try:
+            float(row['amount'])
+        except (KeyError, TypeError, ValueError):
+            problems.append(f"recipes.csv: {recipe}: invalid amount of {ingredient}")
+            continue
+        recipes.add(_name_key(recipe))
+        if ingredient_key(ingredient) not in stock:
+            unstocked.setdefault(ingredient, set()).add(recipe)
+    for ingredient, used_by in sorted(unstocked.items()):
+        problems.append(f"recipes.csv: {ingredient} is used by {', '.join(sorted(used_by))} but not stocked")
+
+    menu_items = 0
+    for row in _load_rows(data_dir, 'menu_items.csv', PizzaMenuRepository.FIELDNAMES,
+                          PizzaMenuRepository.KEY_FIELDS, problems) or ():
+        menu_items += 1
+        if _name_key(row.get('recipe_name') or '') not in recipes:
+            problems.append(f"menu_items.csv: {row.get('name')} uses unknown recipe {row.get('recipe_name')}")
+        try:
+            float(row['price'])
+        except (KeyError, TypeError, ValueError):
+            problems.append(f"menu_items.csv: {row.get('name')} has an invalid price")
+
+    return {
+        'store': os.path.basename(os.path.normpath(data_dir)) or data_dir,
+        'data_dir': data_dir,
+        'stock': stock,
+        'reorder': sorted(name for name, quantity, _, level in stock.values() if quantity <= level),
+        'recipes': len(recipes),
+        'menu_items': menu_items,
+        'problems': problems,
+    }
+
+
+class ChainInventory:
+    def __init__(self, buffer: float = 2.0):
+        self.buffer = buffer
+        self.stores: List[dict] = []  # summaries, without their stock
+        self._store_names = set()
+        self._names: Dict[str, str] = {}  # ingredient key -> display name (first spelling seen)
+        self._holdings: Dict[str, list] = {}  # ingredient key -> [(store, quantity, unit, reorder level)]
+        self._plan = None
+
+    def add(self, summary: dict) -> None:
+        store = summary['store']
+        if store in self._store_names:
+            # Same directory name under two chains: tell them apart by path.
+            store = summary['store'] = summary['data_dir']
+        self._store_names.add(store)
+        for key, (name, quantity, unit, reorder_level) in summary['stock'].items():
+            self._names.setdefault(key, name)
+            self._holdings.setdefault(key, []).append((store, quantity, unit, reorder_level))
+        self.stores.append({field: value for field, value in summary.items() if field != 'stock'})
+        self._plan = None
+
+    def shortages(self) -> Dict[str, List[dict]]:
+        shortages = {}
+        for key, holdings in self._holdings.items():
+            for store, quantity, unit, reorder_level in holdings:
+                if quantity <= reorder_level:
+                    shortages.setdefault(store, []).append({
+                        'ingredient': self._names[key], 'quantity': quantity, 'unit': unit,
+                        'reorder_level': reorder_level, 'needed': max(self.buffer * reorder_level - quantity, 0.0)})
+        for entries in shortages.values():
+            entries.sort(key=lambda entry: entry['ingredient'])
+        return dict(sorted(shortages.items()))
+
+    def plan(self) -> tuple:
+        # (transfers, reorder): largest needs are covered first, from the
+        # stores with the most to spare; what is left over is reordered.
+        if self._plan is not None:
+            return self._plan
+        transfers, reorder = [], []
+        for key, holdings in self._holdings.items():
+            name = self._names[key]
+            by_unit = {}
+            for store, quantity, unit, reorder_level in holdings:
+                by_unit.setdefault(unit, []).append((store, quantity, self.buffer * reorder_level, reorder_level))
+            for unit, entries in by_unit.items():
+                needs = sorted(((target - quantity, store) for store, quantity, target, level in entries
+                                if quantity <= level and target - quantity > EPSILON), key=lambda e: (-e[0], e[1]))
+                if not needs:
+                    continue
+                spares = sorted(([quantity - target, store] for store, quantity, target, _ in entries
+                                 if quantity - target > EPSILON), key=lambda e: (-e[0], e[1]))
+                short_stores, remaining, donor = [], 0.0, 0
+                for need, store in needs:
+                    while need > EPSILON and donor < len(spares):
+                        moved = min(need, spares[donor][0])
+                        transfers.append({'ingredient': name, 'unit': unit, 'quantity': moved,
+                                          'from': spares[donor][1], 'to': store})
+                        need -= moved
+                        spares[donor][0] -= moved
+                        if spares[donor][0] <= EPSILON:
+                            donor += 1
+                    if need > EPSILON:
+                        short_stores.append(store)
+                        remaining += need
+                if short_stores:
+                    reorder.append({'ingredient': name, 'unit': unit, 'quantity': remaining,
+                                    'stores': sorted(short_stores)})
+        transfers.sort(key=lambda transfer: (transfer['ingredient'], transfer['to'], transfer['from']))
+        reorder.sort(key=lambda entry: (entry['ingredient'], entry['unit']))
+        self._plan = (transfers, reorder)
+        return self._plan
+
+    def problems(self) -> Dict[str, List[str]]:
+        problems = {summary['store']: list(summary['problems']) for summary in self.stores if summary['problems']}
+        for key, holdings in self._holdings.items():
+            units = sorted({unit for _, _, unit, _ in holdings})
+            if len(units) > 1:
+                problems.setdefault('(chain)', []).append(
+                    f"{self._names[key]} is stocked in different units ({', '.join(units)}); no transfers between them")
+        return problems
+
+    def to_dict(self) -> dict:
+        transfers, reorder = self.plan()
+        return {'stores': len(self.stores), 'buffer': self.buffer, 'reorder': reorder, 'transfers': transfers,
+                'shortages': self.shortages(), 'problems': self.problems()}
+
+
+def find_stores(paths: Iterable[str]) -> List[str]:
+    # A path holding ingredients.csv is a store; any other directory is a
+    # chain, whose subdirectories holding ingredients.csv are its stores.
+    stores = []
+    for path in paths:
+        if os.path.isfile(os.path.join(path, 'ingredients.csv')) or not os.path.isdir(path):
+            stores.append(path)
+            continue
+        with os.scandir(path) as entries:
+            stores.extend(sorted(entry.path for entry in entries
+                                 if entry.is_dir() and os.path.isfile(os.path.join(entry.path, 'ingredients.csv'))))
+    return stores
+
+
+def summarize_chain(data_dirs: Iterable[str], workers: Optional[int] = None, buffer: float = 2.0,
+                    chunksize: Optional[int] = None, aliases: Optional[str] = None) -> ChainInventory:
+    # workers=None uses every core; workers=1 (or a single store) skips the pool.
+    # aliases: an alias,name CSV (see catalog.py) applied to every store.
+    data_dirs = list(data_dirs)
+    chain = ChainInventory(buffer)
+    workers = min(workers or os.cpu_count() or 1, max(len(data_dirs), 1))
+    if workers == 1:
+        _load_aliases(aliases)
+        for data_dir in data_dirs:
+            chain.add(summarize_store(data_dir))
+        return chain
+    if chunksize is None:
+        # A few chunks per worker: few round trips, still balanced.
+        chunksize = max(1, len(data_dirs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_aliases, initargs=(aliases,)) as pool:
+        for summary in pool.map(summarize_store, data_dirs, chunksize=chunksize):
+            chain.add(summary)
+    return chain
+
+
+def format_report(chain: ChainInventory) -> str:
+    transfers, reorder = chain.plan()
+    shortages, problems = chain.shortages(), chain.problems()
+    lines = [f"Chain inventory: {len(chain.stores)} stores, {len(shortages)} with shortages, "
+             f"{len(transfers)} transfers suggested"]
+    lines.append("\nReorder (after transfers):")
+    for entry in reorder:
+        lines.append(f"  {entry['ingredient']:<24}{entry['quantity']:>12.2f} {entry['unit']:<6}"
+                     f"  for {', '.join(entry['stores'])}")
+    if not reorder:
+        lines.append("  nothing")
+    lines.append("\nTransfers:")
+    for transfer in transfers:
+        lines.append(f"  {transfer['ingredient']:<24}{transfer['quantity']:>12.2f} {transfer['unit']:<6}"
+                     f"  {transfer['from']} -> {transfer['to']}")
+    if not transfers:
+        lines.append("  none")
+    lines.append("\nShortages:")
+    for store, entries in shortages.items():
+        items = ', '.join(f"{entry['ingredient']} {entry['quantity']:g}/{entry['reorder_level']} {entry['unit']}".rstrip()
+                          for entry in entries)
+        lines.append(f"  {store}: {items}")
+    if not shortages:
+        lines.append("  none")
+    if problems:
+        lines.append("\nProblems:")
+        for store, messages in problems.items():
+            for message in messages:
+                lines.append(f"  {store}: {message}")
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Chain-wide inventory, reorder list and transfer suggestions.")
+    parser.add_argument('paths', nargs='+', help="store data directories, or directories of them")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    parser.add_argument('--chunksize', type=int, help="stores handed to a worker at a time")
+    parser.add_argument('--buffer', type=float, default=2.0,
+                        help="top short stores up to, and keep donors above, this multiple of the reorder level")
+    parser.add_argument('--aliases', help="alias,name CSV of spellings that are the same ingredient in every store")
+    parser.add_argument('--json', action='store_true', help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    stores = find_stores(args.paths)
+    if not stores:
+        print("No store directories found.", file=sys.stderr)
+        return 1
+    if args.aliases and not os.path.isfile(args.aliases):
+        print(f"Aliases file {args.aliases} not found.", file=sys.stderr)
+        return 1
+    for problem in _load_aliases(args.aliases):
+        print(f"{args.aliases}: {problem}", file=sys.stderr)
+    chain = summarize_chain(stores, args.workers, args.buffer, args.chunksize, args.aliases)
+    if args.json:
+        print(json.dumps(chain.to_dict()))
+    else:
+        print(format_report(chain))
+    print(f"({len(stores)} stores in {time.perf_counter() - started:.2f}s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
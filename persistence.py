@@ -0,0 +1,256 @@
+import csv
+import os
+import tempfile
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DELTA_SUFFIX = '.delta'
+
+
+def file_signature(filename: str):
+    # (mtime, size) of the file, or None when it does not exist: enough to
+    # tell whether another process has rewritten it.
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def atomic_write(filename: str, write: Callable, mode: str = 'w') -> None:
+    # Calls write(file) on a temp file in the same directory, fsyncs it, then
+    # renames it over the target, so readers (and a crash) see either the old
+    # or the new file. The temp file is removed if anything fails. Text files
+    # are opened with newline='' (csv needs it; nothing else translates).
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temp_name = tempfile.mkstemp(prefix='.' + os.path.basename(filename) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode, newline=None if 'b' in mode else '') as temp_file:
+            write(temp_file)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_name, filename)
+    except BaseException:
+        try:
+            os.unlink(temp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def atomic_write_rows(filename: str, fieldnames: Sequence[str], rows: Iterable[dict]) -> None:
+    def write(temp_file):
+        writer = csv.DictWriter(temp_file, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    atomic_write(filename, write)
+
+
+class CsvTable:
+    # One CSV file plus, optionally, a delta log of changed rows.
+    #
+    # Rows are identified by `key_fields`. With the delta log enabled, save()
+    # compares the new rows against the last loaded/saved state and appends
+    # only the upserts and deletes to "<file>.delta"; the base file is
+    # rewritten (atomically) once the log grows past `compact_ratio` times the
+    # table size. load() applies the log on top of the base file.
+    #
+    # Each delta row carries a crc32 of its values, like the order journal's
+    # records. Reading stops at the first incomplete or corrupt row (a crash
+    # during an append), and load() then compacts the table so later appends
+    # never follow a torn row.
+
+    def __init__(self, filename: str, fieldnames: Sequence[str], key_fields: Sequence[str],
+                 delta_log: bool = False, compact_ratio: float = 0.5):
+        self.filename = filename
+        self.fieldnames = list(fieldnames)
+        self.key_fields = list(key_fields)
+        self.delta_log = delta_log
+        self.compact_ratio = compact_ratio
+        self._rows: Optional[Dict[Tuple[str, ...], dict]] = None  # last state known to be on disk
+        self._delta_entries = 0
+        self._signature = None
+
+    @property
+    def delta_filename(self) -> str:
+        return self.filename + DELTA_SUFFIX
+
+    def signature(self):
+        return (file_signature(self.filename), file_signature(self.delta_filename))
+
+    def _key(self, row: dict) -> Tuple[str, ...]:
+        return tuple(row[field] for field in self.key_fields)
+
+    def _normalize(self, row: dict) -> dict:
+        return {field: '' if row.get(field) is None else str(row.get(field)) for field in self.fieldnames}
+
+    def _checksum(self, op: str, row: dict) -> str:
+        values = [op] + ['' if row.get(field) is None else str(row.get(field)) for field in self.fieldnames]
+        return f"{zlib.crc32(chr(31).join(values).encode('utf-8')):08x}"
+
+    def _valid_delta(self, row: dict, checked: bool) -> bool:
+        if None in row or any(value is None for value in row.values()) or row.get('op') not in ('U', 'D'):
+            return False
+        return not checked or row['crc'] == self._checksum(row['op'], row)
+
+    def _delta_has_checksums(self) -> bool:
+        with open(self.delta_filename, newline='') as delta_file:
+            return 'crc' in (next(csv.reader(delta_file), None) or ())
+
+    def read(self) -> Tuple[Dict[Tuple[str, ...], dict], int, bool]:
+        # The current rows by key (delta log applied), the number of delta
+        # entries applied and whether the log was intact, without touching
+        # the table's saved state.
+        rows = {}
+        with open(self.filename, newline='') as csvfile:
+            for row in csv.DictReader(csvfile):
+                rows[self._key(row)] = row
+        entries, intact = 0, True
+        if os.path.exists(self.delta_filename):
+            with open(self.delta_filename, newline='') as delta_file:
+                reader = csv.DictReader(delta_file)
+                checked = 'crc' in (reader.fieldnames or ())  # logs written before checksums have none
+                for row in reader:
+                    if not self._valid_delta(row, checked):
+                        intact = False
+                        break
+                    op = row.pop('op')
+                    row.pop('crc', None)
+                    key = self._key(row)
+                    if op == 'D':
+                        rows.pop(key, None)
+                    else:
+                        rows[key] = row
+                    entries += 1
+        return rows, entries, intact
+
+    def load(self) -> List[dict]:
+        rows, entries, intact = self.read()
+        if not intact:
+            self._rewrite({key: self._normalize(row) for key, row in rows.items()})
+            return list(rows.values())
+        self._rows = {key: self._normalize(row) for key, row in rows.items()}
+        self._delta_entries = entries
+        self._signature = self.signature()
+        return list(rows.values())
+
+    def save(self, rows: Iterable[dict]) -> None:
+        new_rows = {}
+        for row in rows:
+            row = self._normalize(row)
+            new_rows[self._key(row)] = row
+        # Only diff against our snapshot if nobody else touched the files since.
+        if not self.delta_log or self._rows is None or self.signature() != self._signature:
+            self._rewrite(new_rows)
+            return
+        changes = [dict(row, op='U') for key, row in new_rows.items() if self._rows.get(key) != row]
+        changes += [dict(zip(self.key_fields, key), op='D') for key in self._rows if key not in new_rows]
+        for change in changes:
+            change['crc'] = self._checksum(change['op'], change)
+        if not changes:
+            return
+        if self._delta_entries + len(changes) > self.compact_ratio * max(len(new_rows), 1):
+            self._rewrite(new_rows)
+            return
+        new_file = not os.path.exists(self.delta_filename)
+        if not new_file and not self._delta_has_checksums():
+            self._rewrite(new_rows)
+            return
+        with open(self.delta_filename, 'a', newline='') as delta_file:
+            writer = csv.DictWriter(delta_file, fieldnames=['op'] + self.fieldnames + ['crc'])
+            if new_file:
+                writer.writeheader()
+            writer.writerows(changes)
+            delta_file.flush()
+            os.fsync(delta_file.fileno())
+        self._rows = new_rows
+        self._delta_entries += len(changes)
+        self._signature = self.signature()
+
+    def _rewrite(self, rows: Dict[Tuple[str, ...], dict]) -> None:
+        atomic_write_rows(self.filename, self.fieldnames, rows.values())
+        if os.path.exists(self.delta_filename):
+            os.unlink(self.delta_filename)
+        self._rows = rows
+        self._delta_entries = 0
+        self._signature = self.signature()
+
+
+class CsvPersistence:
+    # Shared registry of CsvTables used by every CSV repository.
+    #
+    # Inside a batch() block saves are only recorded; each table is written
+    # once, with its latest rows, when the outermost block exits. A save can
+    # pass on_written, called once its rows are actually on disk. One lock
+    # guards the registry, the pending saves and the table writes, since the
+    # inventory is saved from several threads.
+
+    def __init__(self, delta_log: bool = False):
+        self.delta_log = delta_log
+        self._tables: Dict[str, CsvTable] = {}
+        self._batch_depth = 0
+        self._pending: Dict[str, Tuple[CsvTable, List[dict], List[Callable[[], None]]]] = {}
+        self._lock = threading.RLock()
+
+    def table(self, filename: str, fieldnames: Sequence[str], key_fields: Sequence[str]) -> CsvTable:
+        path = os.path.abspath(filename)
+        with self._lock:
+            table = self._tables.get(path)
+            if table is None or table.fieldnames != list(fieldnames):
+                table = self._tables[path] = CsvTable(filename, fieldnames, key_fields)
+            table.delta_log = self.delta_log
+            return table
+
+    def load(self, filename: str, fieldnames: Sequence[str], key_fields: Sequence[str]) -> List[dict]:
+        with self._lock:
+            self.flush(filename)
+            return self.table(filename, fieldnames, key_fields).load()
+
+    def save(self, filename: str, fieldnames: Sequence[str], key_fields: Sequence[str], rows: Iterable[dict],
+             on_written: Optional[Callable[[], None]] = None) -> None:
+        with self._lock:
+            table = self.table(filename, fieldnames, key_fields)
+            if self._batch_depth:
+                path = os.path.abspath(filename)
+                callbacks = self._pending[path][2] if path in self._pending else []
+                if on_written is not None:
+                    callbacks.append(on_written)
+                self._pending[path] = (table, list(rows), callbacks)
+                return
+            table.save(rows)
+        if on_written is not None:
+            on_written()
+
+    def signature(self, filename: str):
+        return (file_signature(filename), file_signature(filename + DELTA_SUFFIX))
+
+    def flush(self, filename: Optional[str] = None) -> None:
+        with self._lock:
+            if filename is None:
+                entries, self._pending = list(self._pending.values()), {}
+            else:
+                entry = self._pending.pop(os.path.abspath(filename), None)
+                entries = [entry] if entry is not None else []
+            for table, rows, _ in entries:
+                table.save(rows)
+        for _, _, callbacks in entries:
+            for on_written in callbacks:
+                on_written()
+
+    @contextmanager
+    def batch(self):
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                done = not self._batch_depth
+            if done:
+                self.flush()
+
+
+persistence = CsvPersistence()
@@ -0,0 +1,106 @@
+from typing import Dict, List
+
+import numpy as np
+
+from catalog import catalog
+from bussinese import InventoryManager, MenuManagement, PizzaMenuItem, PizzaRecipe, RecipeManagement
+
+
+class CapacityPlanner:
+    # Recipes compiled into a dense recipe x ingredient matrix and the
+    # inventory into a stock vector, so planning questions become matrix ops.
+    #
+    # Ingredients that appear in recipes but are not tracked by the inventory
+    # get a column too; they never limit production (same rule as
+    # InventoryManager.use_ingredients_bulk) and have no stock.
+
+    def __init__(self, recipe_mgt: RecipeManagement, inventory_mgr: InventoryManager):
+        self._recipe_mgt = recipe_mgt
+        self._inventory_mgr = inventory_mgr
+        self.compile()
+
+    def compile(self) -> None:
+        # Columns are indexed by catalog ingredient id, so recipes (which
+        # already store id arrays) scatter straight into their rows.
+        recipes = self._recipe_mgt.list_recipes()
+        tracked_ids = [ingredient.id for ingredient in self._inventory_mgr.ingredients]
+        ids = list(tracked_ids)
+        columns = {ingredient_id: j for j, ingredient_id in enumerate(ids)}
+        for recipe in recipes:
+            for ingredient_id in recipe.ingredient_ids:
+                if ingredient_id not in columns:
+                    columns[ingredient_id] = len(ids)
+                    ids.append(ingredient_id)
+        column_of = np.full(len(catalog), -1, dtype=np.intp)
+        column_of[ids] = np.arange(len(ids))
+
+        matrix = np.zeros((len(recipes), len(ids)))
+        for i, recipe in enumerate(recipes):
+            matrix[i, column_of[np.frombuffer(recipe.ingredient_ids, dtype=np.intc)]] = np.frombuffer(recipe.amounts)
+        ingredient_names = [catalog.name_of(ingredient_id) for ingredient_id in ids]
+
+        self._recipes: List[PizzaRecipe] = recipes
+        self._rows = {recipe.name.casefold(): i for i, recipe in enumerate(recipes)}
+        self._ingredient_names = ingredient_names
+        self._columns = columns
+        self._tracked = np.zeros(len(ingredient_names), dtype=bool)
+        self._tracked[:len(tracked_ids)] = True
+        self.matrix = matrix
+        self.refresh_inventory()
+
+    def refresh_inventory(self) -> None:
+        stock = np.zeros(len(self._ingredient_names))
+        for ingredient in self._inventory_mgr.ingredients:
+            # Ingredients added since compile() have no column until recompiled.
+            column = self._columns.get(ingredient.id)
+            if column is not None:
+                stock[column] = ingredient.quantity
+        self.stock = stock
+
+    @property
+    def recipes(self) -> List[PizzaRecipe]:
+        return self._recipes
+
+    @property
+    def ingredient_names(self) -> List[str]:
+        return self._ingredient_names
+
+    def max_producible(self) -> Dict[str, float]:
+        # For every recipe: min over its tracked ingredients of stock // amount.
+        # Recipes without tracked ingredients are unlimited (inf).
+        limiting = (self.matrix > 0) & self._tracked
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(limiting, np.floor(self.stock / np.where(limiting, self.matrix, 1)), np.inf)
+        counts = ratios.min(axis=1) if ratios.size else np.full(len(self._recipes), np.inf)
+        return {recipe.name: float(count) for recipe, count in zip(self._recipes, counts)}
+
+    def forecast_vector(self, forecast: Dict[str, float]) -> np.ndarray:
+        counts = np.zeros(len(self._recipes))
+        for recipe_name, count in forecast.items():
+            row = self._rows.get(recipe_name.casefold())
+            if row is None:
+                raise KeyError(f"Recipe '{recipe_name}' not found.")
+            counts[row] += count
+        return counts
+
+    def demand(self, forecast: Dict[str, float]) -> Dict[str, float]:
+        # Total ingredient demand for a forecast of pizza counts per recipe.
+        totals = self.forecast_vector(forecast) @ self.matrix
+        return {name: float(total) for name, total in zip(self._ingredient_names, totals) if total}
+
+    def shortfall(self, forecast: Dict[str, float]) -> Dict[str, float]:
+        # Tracked ingredients whose stock does not cover the forecast.
+        missing = self.forecast_vector(forecast) @ self.matrix - self.stock
+        missing[~self._tracked] = 0
+        return {name: float(amount) for name, amount in zip(self._ingredient_names, missing) if amount > 0}
+
+    def recipes_needing(self, ingredient_name: str) -> List[PizzaRecipe]:
+        column = self._columns.get(catalog.lookup(ingredient_name))
+        if column is None:
+            return []
+        return [self._recipes[i] for i in np.flatnonzero(self.matrix[:, column] > 0)]
+
+    def unavailable_if_out(self, ingredient_name: str, menu_mgt: MenuManagement) -> List[PizzaMenuItem]:
+        # Menu items that could no longer be made if the ingredient ran out.
+        names = {recipe.name.casefold() for recipe in self.recipes_needing(ingredient_name)}
+        return [item for item in menu_mgt.list_menu_items() if item.recipe.name.casefold() in names]
@@ -0,0 +1,98 @@
+from typing import Dict, Iterable, List, Tuple
+
+BASE_PRICE = 14.00
+BASES = {"Thin Crust": 2.00, "Thick Crust": 2.50}
+SAUCES = {"Tomato": 1.00, "BBQ": 1.50, "White Garlic": 1.25}
+TOPPINGS = {"Pepperoni": 1.75, "Ham": 1.75, "Bacon": 1.75,
+            "Mushrooms": 1.75, "Onion": 1.75, "Black Olives": 1.75,
+            "Tomato Slices": 1.75, "Extra Cheese": 1.75, "Pineapple": 1.75}
+ADDITIONAL_INGREDIENTS = {"Chicken": 2.00, "Beef": 2.25, "Cheddar": 1.75}
+SIZE_MULTIPLIERS = {"small": 0.75, "medium": 0.875, "large": 1.00}
+TAX_RATE = 0.0  # set to the store's sales-tax rate
+
+
+class PricingEngine:
+    # All build-your-own price tables compiled into one case-insensitive
+    # option -> (kind, unit price) lookup, plus size multipliers and tax.
+
+    def __init__(self, base_price: float = BASE_PRICE, bases: Dict[str, float] = BASES,
+                 sauces: Dict[str, float] = SAUCES, toppings: Dict[str, float] = TOPPINGS,
+                 additional_ingredients: Dict[str, float] = ADDITIONAL_INGREDIENTS,
+                 size_multipliers: Dict[str, float] = SIZE_MULTIPLIERS, tax_rate: float = TAX_RATE):
+        self.base_price = base_price
+        self.bases = dict(bases)
+        self.sauces = dict(sauces)
+        self.toppings = dict(toppings)
+        self.additional_ingredients = dict(additional_ingredients)
+        self.size_multipliers = {size.casefold(): multiplier for size, multiplier in size_multipliers.items()}
+        self.tax_rate = tax_rate
+        self._options: Dict[str, Tuple[str, float]] = {}
+        for kind, table in (('base', self.bases), ('sauce', self.sauces), ('topping', self.toppings),
+                            ('additional', self.additional_ingredients)):
+            for option, price in table.items():
+                self._options[option.casefold()] = (kind, price)
+
+    def has_option(self, option: str) -> bool:
+        return option.strip().casefold() in self._options
+
+    def option_price(self, option: str) -> float:
+        entry = self._options.get(option.strip().casefold())
+        return entry[1] if entry else 0.0
+
+    def size_multiplier(self, size) -> float:
+        return self.size_multipliers.get(str(size).casefold(), 1.0)
+
+    def custom_pizza_price(self, options: Dict[str, int], size='large') -> float:
+        # options: option name -> quantity, across bases, sauces and toppings.
+        # Unknown options are free, as they always were.
+        price = self.base_price + sum(self.option_price(option) * quantity for option, quantity in options.items())
+        return price * self.size_multiplier(size)
+
+    def tax(self, subtotal: float) -> float:
+        return subtotal * self.tax_rate
+
+    @staticmethod
+    def _order_lines(order) -> Iterable[Tuple[float, float]]:
+        # (unit price, quantity) pairs of an Order or of a journaled order record.
+        if isinstance(order, dict):
+            for line in order['p']:
+                yield line[3], line[4]
+            for line in order['s']:
+                yield line[2], line[3]
+            return
+        for pizza, quantity in order.pizza_lines():
+            yield pizza.price, quantity
+        for side, quantity in order.side_lines():
+            yield side.price, quantity
+
+    def price_orders(self, orders: Iterable) -> 'BatchTotals':
+        # Prices a whole batch (Orders or journal records) with array arithmetic.
+        import numpy as np
+
+        prices: List[float] = []
+        quantities: List[float] = []
+        owners: List[int] = []
+        count = 0
+        for count, order in enumerate(orders, 1):
+            for price, quantity in self._order_lines(order):
+                prices.append(price)
+                quantities.append(quantity)
+                owners.append(count - 1)
+        subtotals = np.bincount(np.asarray(owners, dtype=np.intp),
+                                weights=np.asarray(prices) * np.asarray(quantities), minlength=count)
+        taxes = subtotals * self.tax_rate
+        return BatchTotals(subtotals, taxes, np.round(subtotals + taxes, 2))
+
+
+class BatchTotals:
+    def __init__(self, subtotals, taxes, totals):
+        self.subtotals = subtotals
+        self.taxes = taxes
+        self.totals = totals
+
+    @property
+    def grand_total(self) -> float:
+        return float(self.totals.sum())
+
+
+pricing_engine = PricingEngine()
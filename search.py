@@ -0,0 +1,157 @@
+import re
+from typing import Dict, Iterable, List, Set
+
+_WORD = re.compile(r"[^\W_]+")
+_OR = re.compile(r"\s+OR\s+", re.IGNORECASE)
+_AND = re.compile(r"\s+AND\s+", re.IGNORECASE)
+
+
+def _fold(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+class RecipeSearchIndex:
+    # Inverted index over recipe names and ingredient names.
+    #
+    # Every searchable string (a recipe name or an ingredient name) is a
+    # "field". Fields map to the recipes that contain them, words map to the
+    # fields they occur in, and n-grams map to fields for substring queries.
+    # Recipes are identified by the key RecipeManagement files them under;
+    # recipes_using() goes by catalog ingredient id, so aliases resolve.
+
+    def __init__(self, gram_size: int = 3):
+        self._n = gram_size
+        self._seq = 0
+        self._order: Dict[str, int] = {}            # recipe key -> insertion order
+        self._recipe_fields: Dict[str, Set[str]] = {}
+        self._field_recipes: Dict[str, Set[str]] = {}
+        self._ingredient_recipes: Dict[int, Set[str]] = {}  # ingredient id -> recipe keys
+        self._recipe_ingredients: Dict[str, Set[int]] = {}
+        self._words: Dict[str, Set[str]] = {}       # word -> fields
+        self._grams: Dict[str, Set[str]] = {}       # n-gram -> fields
+        self._short_fields: Set[str] = set()        # fields shorter than one n-gram
+
+    def _grams_of(self, text: str) -> Set[str]:
+        n = self._n
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    def _add_field(self, field: str, key: str) -> None:
+        recipes = self._field_recipes.get(field)
+        if recipes is None:
+            recipes = self._field_recipes[field] = set()
+            for word in _WORD.findall(field):
+                self._words.setdefault(word, set()).add(field)
+            if len(field) < self._n:
+                self._short_fields.add(field)
+            for gram in self._grams_of(field):
+                self._grams.setdefault(gram, set()).add(field)
+        recipes.add(key)
+
+    def _remove_field(self, field: str, key: str) -> None:
+        recipes = self._field_recipes.get(field)
+        if recipes is None:
+            return
+        recipes.discard(key)
+        if recipes:
+            return
+        del self._field_recipes[field]
+        for word in _WORD.findall(field):
+            fields = self._words.get(word)
+            if fields is not None:
+                fields.discard(field)
+                if not fields:
+                    del self._words[word]
+        self._short_fields.discard(field)
+        for gram in self._grams_of(field):
+            fields = self._grams.get(gram)
+            if fields is not None:
+                fields.discard(field)
+                if not fields:
+                    del self._grams[gram]
+
+    def add(self, key: str, name: str, ingredient_names: Iterable[str], ingredient_ids: Iterable[int] = ()) -> None:
+        self.remove(key)
+        self._seq += 1
+        self._order[key] = self._seq
+        fields = {_fold(ingredient) for ingredient in ingredient_names} | {_fold(name)}
+        ingredient_ids = set(ingredient_ids)
+        self._recipe_fields[key] = fields
+        self._recipe_ingredients[key] = ingredient_ids
+        for field in fields:
+            self._add_field(field, key)
+        for ingredient_id in ingredient_ids:
+            self._ingredient_recipes.setdefault(ingredient_id, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        if key not in self._order:
+            return
+        del self._order[key]
+        for field in self._recipe_fields.pop(key):
+            self._remove_field(field, key)
+        for ingredient_id in self._recipe_ingredients.pop(key):
+            recipes = self._ingredient_recipes[ingredient_id]
+            recipes.discard(key)
+            if not recipes:
+                del self._ingredient_recipes[ingredient_id]
+
+    def clear(self) -> None:
+        self.__init__(self._n)
+
+    def _fields_containing(self, term: str) -> Set[str]:
+        if len(term) >= self._n:
+            postings = sorted((self._grams.get(gram, ()) for gram in self._grams_of(term)), key=len)
+            if not postings or not postings[0]:
+                return set()
+            candidates = set(postings[0]).intersection(*postings[1:])
+        else:
+            # Too short to have its own n-gram: any longer field containing the
+            # term has an n-gram containing it, so scan the n-gram vocabulary.
+            candidates = set(self._short_fields)
+            for gram, fields in self._grams.items():
+                if term in gram:
+                    candidates |= fields
+        return {field for field in candidates if term in field}
+
+    def _fields_with_prefix(self, prefix: str) -> Set[str]:
+        return {field for field in self._fields_containing(prefix)
+                if any(word.startswith(prefix) for word in _WORD.findall(field))}
+
+    def _match_term(self, term: str, whole_words: bool) -> Set[str]:
+        if term.endswith("*"):
+            fields = self._fields_with_prefix(term[:-1])
+        elif whole_words:
+            words = _WORD.findall(term)
+            if not words:
+                return set()
+            fields = set.intersection(*(self._words.get(word, set()) for word in words))
+            fields = {field for field in fields if term in field}
+        else:
+            fields = self._fields_containing(term)
+        keys = set()
+        for field in fields:
+            keys |= self._field_recipes[field]
+        return keys
+
+    def search(self, query: str, whole_words: bool = False) -> List[str]:
+        # "a AND b OR c" is (a AND b) OR c; terms match anywhere in a recipe
+        # name or ingredient name, or as a word prefix when written "term*".
+        # AND/OR are recognised in any case; an empty query matches every recipe.
+        if not query.strip():
+            return sorted(self._order, key=self._order.__getitem__)
+        keys: Set[str] = set()
+        for clause in _OR.split(query.strip()):
+            terms = [_fold(term) for term in _AND.split(clause) if term.strip()]
+            if not terms:
+                continue
+            matched = None
+            for term in terms:
+                hits = self._match_term(term, whole_words)
+                matched = hits if matched is None else matched & hits
+                if not matched:
+                    break
+            keys |= matched
+        return sorted(keys, key=self._order.__getitem__)
+
+    def recipes_using(self, ingredient_id: int) -> List[str]:
+        keys = self._ingredient_recipes.get(ingredient_id, ())
+        return sorted(keys, key=self._order.__getitem__)
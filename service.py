@@ -0,0 +1,310 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import List, Optional, Tuple
+
+from ingest import build_order
+from instrumentation import configure_from_environment, registry
+
+# Order-taking service for terminals and kiosks, on asyncio and the standard
+# library only.
+#
+#     GET  /menu          pizzas (with how many can still be made) and sides
+#     POST /orders        place an order; body as one line of ingest.py input
+#     GET  /orders/<id>   status and contents of a placed order
+#     GET  /health
+#     GET  /metrics       operation timings, when instrumentation is enabled
+#
+# Requests are parsed and validated on the event loop. Everything that
+# touches the store's inventory, journal or availability cache runs on one
+# dedicated thread, fed by a single writer task: orders queued while a batch
+# is being applied are booked into their delivery slots, deducted together
+# (use_ingredients_bulk) and journaled with one commit, so latency stays bounded as the number of concurrent
+# clients grows and the event loop never blocks on disk.
+
+MAX_HEADER_LINES = 100
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def _slot_text(slot: float) -> str:
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(slot))
+
+
+class RequestError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class OrderService:
+    def __init__(self, pizza_store, max_batch: int = 256, book_slots: bool = True):
+        self._store = pizza_store
+        self._max_batch = max_batch
+        self._book_slots = book_slots  # False accepts orders without a delivery slot (load tests)
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='store')
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self) -> None:
+        if self._writer is not None:
+            self._queue.put_nowait(None)
+            await self._writer
+            self._writer = None
+        await self._run(self._close_store)
+        self._executor.shutdown()
+
+    def _close_store(self) -> None:
+        self._store.close()
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def menu(self) -> dict:
+        return await self._run(self._menu)
+
+    def _menu(self) -> dict:
+        self._store.inventory_mgr.refresh()
+        availability = self._store.availability
+        pizzas = []
+        for item in self._store.menu_mgt.list_menu_items():
+            count = availability.max_quantity(item)
+            pizzas.append({'name': item.name, 'description': item.description, 'size': item.size,
+                           'category': item.category, 'price': item.price,
+                           'available': None if math.isinf(count) else count})
+        sides = [{'name': item.name, 'category': item.category, 'price': item.price}
+                 for item in self._store.side_menu_mgt.list_side_items()]
+        return {'pizzas': pizzas, 'sides': sides}
+
+    async def place_order(self, record: dict) -> Tuple[HTTPStatus, dict]:
+        try:
+            order = build_order(record, self._store)
+        except LookupError as error:
+            raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, str(error))
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"{type(error).__name__}: {error}")
+        total = order.total()
+        expected = record.get('total')
+        if expected is not None and abs(float(expected) - total) >= 0.005:
+            raise RequestError(HTTPStatus.CONFLICT, f"expected total {expected}, computed {total:.2f}")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((order, future))
+        return await future
+
+    async def _write_loop(self) -> None:
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is None:
+                break
+            batch = [entry]
+            while len(batch) < self._max_batch and not self._queue.empty():
+                entry = self._queue.get_nowait()
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            try:
+                results = await self._run(self._apply, [order for order, _ in batch])
+            except Exception as error:
+                results = [(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(error)})] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _apply(self, orders: List) -> List[Tuple[HTTPStatus, dict]]:
+        # An order that gets no delivery slot is not deducted; one that is out
+        # of stock gives its slot back.
+        results = {}  # position in `orders` -> response
+        booked = []
+        for position, order in enumerate(orders):
+            if not self._book_slots:
+                booked.append(position)
+                continue
+            booking = self._store.schedule_delivery(order)
+            if booking.success:
+                booked.append(position)
+            else:
+                results[position] = (HTTPStatus.CONFLICT, {'error': 'no delivery slot', 'reason': booking.reason,
+                                                           'alternatives': [_slot_text(slot) for slot in booking.alternatives]})
+        fulfilled = self._store.inventory_mgr.use_ingredients_bulk([orders[position] for position in booked])
+        for position, result in zip(booked, fulfilled):
+            order = result.order
+            if result.success:
+                self._store.record_order(order, schedule=False)
+                results[position] = (HTTPStatus.CREATED, {'id': order.order_id, 'status': 'placed', 'total': order.total(),
+                                                          'delivery': None if order.delivery_slot is None
+                                                          else _slot_text(order.delivery_slot)})
+            else:
+                if order.delivery_slot is not None:
+                    self._store.delivery.unbook(order)
+                results[position] = (HTTPStatus.CONFLICT, {'error': 'out of stock', 'shortages': result.shortages})
+        self._store.order_repo.commit()
+        self._store.customers.commit()
+        return [results[position] for position in range(len(orders))]
+
+    async def order_status(self, order_id: int) -> Optional[dict]:
+        record = await self._run(self._store.order_repo.get, order_id)
+        if record is None:
+            return None
+        return {
+            'id': record['id'],
+            'status': 'placed',
+            'placed_at': record['ts'],
+            'delivery_date': record['dd'],
+            'delivery_time': record['dt'],
+            'pizzas': [{'name': name, 'size': size, 'price': price, 'quantity': quantity}
+                       for name, size, _, price, quantity, *_ in record['p']],
+            'sides': [{'name': name, 'price': price, 'quantity': quantity} for name, _, price, quantity in record['s']],
+            'total': record['t'],
+        }
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[HTTPStatus, dict]:
+        path = path.split('?', 1)[0].rstrip('/') or '/'
+        if path == '/health':
+            return HTTPStatus.OK, {'status': 'ok', 'queued': self._queue.qsize()}
+        if path == '/metrics':
+            if not registry.enabled:
+                raise RequestError(HTTPStatus.NOT_FOUND, 'instrumentation is disabled (set PIZZA_METRICS)')
+            return HTTPStatus.OK, registry.snapshot()
+        if path == '/menu':
+            if method != 'GET':
+                raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, 'use GET')
+            return HTTPStatus.OK, await self.menu()
+        if path == '/orders':
+            if method != 'POST':
+                raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, 'use POST')
+            try:
+                record = json.loads(body)
+            except ValueError as error:
+                raise RequestError(HTTPStatus.BAD_REQUEST, f"invalid JSON: {error}")
+            if not isinstance(record, dict):
+                raise RequestError(HTTPStatus.BAD_REQUEST, 'the order must be a JSON object')
+            return await self.place_order(record)
+        if path.startswith('/orders/'):
+            if method != 'GET':
+                raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, 'use GET')
+            order_id = path[len('/orders/'):]
+            status = await self.order_status(int(order_id)) if order_id.isdigit() else None
+            if status is None:
+                raise RequestError(HTTPStatus.NOT_FOUND, f"no order {order_id}")
+            return HTTPStatus.OK, status
+        raise RequestError(HTTPStatus.NOT_FOUND, f"no route {path}")
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    # Returns (method, path, keep_alive, body), or None once the client is done.
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    parts = request_line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise RequestError(HTTPStatus.BAD_REQUEST, 'malformed request line')
+    method, path, version = parts
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise RequestError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, 'too many header lines')
+    length = int(headers.get('content-length') or 0)
+    if length > MAX_BODY_BYTES:
+        raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'request body too large')
+    body = await reader.readexactly(length) if length else b''
+    keep_alive = headers.get('connection', '').lower() != 'close' and (
+        version != 'HTTP/1.0' or headers.get('connection', '').lower() == 'keep-alive')
+    return method, path, keep_alive, body
+
+
+def _response(status: HTTPStatus, payload: dict, keep_alive: bool) -> bytes:
+    body = json.dumps(payload).encode('utf-8')
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+async def handle_connection(service: OrderService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            keep_alive = False
+            try:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, keep_alive, body = request
+                status, payload = await service.dispatch(method, path, body)
+            except RequestError as error:
+                status, payload = error.status, {'error': str(error)}
+            except ValueError:
+                status, payload = HTTPStatus.BAD_REQUEST, {'error': 'malformed request'}
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(pizza_store, host: str = '127.0.0.1', port: int = 8080, unix_path: Optional[str] = None,
+                max_batch: int = 256, book_slots: bool = True) -> None:
+    service = OrderService(pizza_store, max_batch, book_slots)
+    await service.start()
+
+    async def on_connection(reader, writer):
+        await handle_connection(service, reader, writer)
+
+    if unix_path:
+        server = await asyncio.start_unix_server(on_connection, path=unix_path)
+        print(f"Serving on unix:{unix_path}", flush=True)
+    else:
+        server = await asyncio.start_server(on_connection, host, port, backlog=1024)
+        print(f"Serving on http://{host}:{server.sockets[0].getsockname()[1]}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main(argv=None) -> None:
+    from Presentation import SNAPSHOT_FILE, PizzaStore
+    from snapshot import load_store
+
+    parser = argparse.ArgumentParser(description="Serve the menu and order placement over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--unix', help="listen on this Unix socket path instead of TCP")
+    parser.add_argument('--sqlite', action='store_true', help="use the SQLite storage backend")
+    parser.add_argument('--data-dir', default='.', help="directory holding the store's files (default: current)")
+    parser.add_argument('--max-batch', type=int, default=256, help="most orders applied per inventory/journal batch")
+    parser.add_argument('--no-slots', action='store_true',
+                        help="accept orders without booking delivery slots (for load tests)")
+    args = parser.parse_args(argv)
+
+    configure_from_environment()
+    # Durability comes from the writer's commit after every batch.
+    pizza_store = PizzaStore('sqlite' if args.sqlite else 'csv', journal_commit_every=args.max_batch, load_inventory=False,
+                             data_dir=args.data_dir)
+    load_store(pizza_store, pizza_store.path(SNAPSHOT_FILE))
+    try:
+        asyncio.run(serve(pizza_store, args.host, args.port, args.unix, args.max_batch, not args.no_slots))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
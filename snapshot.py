@@ -0,0 +1,230 @@
+import json
+import mmap
+import pickle
+import struct
+import sys
+import time
+import zlib
+from typing import Dict, Optional
+
+from catalog import ALIASES_FILE, catalog
+from persistence import DELTA_SUFFIX, atomic_write
+
+# Binary snapshot of a store's built state, for fast startup.
+#
+# A snapshot file has three sections, each its own pickle:
+#
+#     catalog     the ingredient catalog, so ingredient ids stay the same
+#     inventory   the inventory's ingredients
+#     menu        the recipe and menu managers with all their indexes (the
+#                 recipe search index included) and the side dishes
+#
+# The header (JSON) gives each section's place in the file and a checksum of
+# what it was built from: crc32 of the aliases file for the catalog, crc32 of
+# the inventory CSV and its delta log for the inventory, and crc32 of the store's STANDARD_PIZZAS and
+# STANDARD_SIDE_DISHES for the menu. load_store() memory-maps the file and
+# unpickles only the sections whose source is unchanged; anything else is
+# rebuilt from the CSVs and code as before, and the snapshot is rewritten.
+# The menu section is only ever pickled right after the menu was built, so
+# it never carries edits made at the counter; refresh_snapshot() copies it
+# over unchanged when it saves the inventory at shutdown.
+#
+# A snapshot of another format version, or whose catalog ids clash with ids
+# already handed out, is ignored. The SQLite backend is not snapshotted.
+#
+# File layout: MAGIC, struct HEADER (format version, header length), the
+# header, then the sections.
+
+MAGIC = b'PIZZASNP'
+HEADER = struct.Struct('<HI')
+SNAPSHOT_VERSION = 1
+
+
+def file_checksum(filename: str) -> Optional[str]:
+    # crc32 of a CSV file and its delta log; None if neither exists.
+    checksum, found = 0, False
+    for path in (filename, filename + DELTA_SUFFIX):
+        try:
+            with open(path, 'rb') as source:
+                checksum = zlib.crc32(source.read(), checksum)
+            found = True
+        except FileNotFoundError:
+            checksum = zlib.crc32(b'\0', checksum)
+    return f"{checksum:08x}" if found else None
+
+
+def menu_checksum(pizza_store) -> str:
+    definition = repr((pizza_store.STANDARD_PIZZAS, pizza_store.STANDARD_SIDE_DISHES)).encode('utf-8')
+    return f"{zlib.crc32(definition):08x}"
+
+
+def _pickle(value) -> bytes:
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def pickle_menu(pizza_store) -> bytes:
+    return _pickle((pizza_store.recipe_mgt, pizza_store.menu_mgt, pizza_store.side_menu_mgt.side_items))
+
+
+class Snapshot:
+    # An open, memory-mapped snapshot file; sections are unpickled on demand.
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        try:
+            self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._mapped[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a store snapshot")
+            version, header_length = HEADER.unpack_from(self._mapped, len(MAGIC))
+            if version != SNAPSHOT_VERSION:
+                raise ValueError(f"{path} is snapshot format {version}, not {SNAPSHOT_VERSION}")
+            start = len(MAGIC) + HEADER.size
+            self.header = json.loads(self._mapped[start:start + header_length])
+            self._base = start + header_length
+        except BaseException:
+            self.close()
+            raise
+
+    def source(self, name: str):
+        section = self.header['sections'].get(name)
+        return None if section is None else section.get('source')
+
+    def raw(self, name: str) -> Optional[bytes]:
+        section = self.header['sections'].get(name)
+        if section is None:
+            return None
+        offset = self._base + section['offset']
+        return self._mapped[offset:offset + section['length']]
+
+    def load(self, name: str):
+        section = self.header['sections'][name]
+        offset = self._base + section['offset']
+        with memoryview(self._mapped) as view:
+            return pickle.loads(view[offset:offset + section['length']])
+
+    def close(self) -> None:
+        mapped = getattr(self, '_mapped', None)
+        if mapped is not None:
+            mapped.close()
+        self._file.close()
+
+
+def open_snapshot(path: Optional[str]) -> Optional[Snapshot]:
+    if not path:
+        return None
+    try:
+        return Snapshot(path)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def write_snapshot(path: str, sections: Dict[str, tuple]) -> None:
+    # sections: name -> (pickled bytes, source checksum(s))
+    layout, offset = {}, 0
+    for name, (data, source) in sections.items():
+        layout[name] = {'offset': offset, 'length': len(data), 'source': source}
+        offset += len(data)
+    header = json.dumps({'sections': layout, 'created': time.time(),
+                         'python': list(sys.version_info[:2])}).encode('utf-8')
+
+    def write(output):
+        output.write(MAGIC + HEADER.pack(SNAPSHOT_VERSION, len(header)) + header)
+        for data, _ in sections.values():
+            output.write(data)
+    atomic_write(path, write, 'wb')
+
+
+def save_snapshot(pizza_store, path: str, menu: Optional[tuple] = None) -> None:
+    # menu: (pickled menu, its source) to store; None pickles the store's menu as it is now.
+    if menu is None:
+        menu = (pickle_menu(pizza_store), {'menu': menu_checksum(pizza_store), 'side_dishes': file_checksum(pizza_store.side_menu_mgt.filename)})
+    write_snapshot(path, {
+        'catalog': (_pickle(catalog.state()), file_checksum(pizza_store.path(ALIASES_FILE))),
+        'inventory': (_pickle(pizza_store.inventory_mgr.ingredients), file_checksum(pizza_store.inventory_mgr.filename)),
+        'menu': menu,
+    })
+
+
+def _adopt(target, restored) -> None:
+    # Moves a restored manager's state into the store's own instance, which
+    # the availability service and the UI already hold.
+    vars(target).clear()
+    vars(target).update(vars(restored))
+
+
+def _restore(pizza_store, snapshot: Snapshot, inventory: bool, menu: bool) -> tuple:
+    # Restores what was asked for and is still current. Returns whether the
+    # inventory was restored, and the menu section kept (bytes, source) or None.
+    inventory_restored = False
+    try:
+        if snapshot.source('catalog') != file_checksum(pizza_store.path(ALIASES_FILE)) or \
+                not catalog.restore(snapshot.load('catalog')):
+            return False, None
+        inventory_source = snapshot.source('inventory')
+        if inventory and inventory_source is not None and \
+                inventory_source == file_checksum(pizza_store.inventory_mgr.filename):
+            pizza_store.inventory_mgr.restore(snapshot.load('inventory'))
+            inventory_restored = True
+        menu_source = snapshot.source('menu')
+        if not menu or menu_source is None or menu_source.get('menu') != menu_checksum(pizza_store):
+            return inventory_restored, None
+        recipe_mgt, menu_mgt, side_items = snapshot.load('menu')
+    except (KeyError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return inventory_restored, None
+    _adopt(pizza_store.recipe_mgt, recipe_mgt)
+    _adopt(pizza_store.menu_mgt, menu_mgt)
+    pizza_store.side_menu_mgt.side_items = side_items
+    if menu_source.get('side_dishes') != file_checksum(pizza_store.side_menu_mgt.filename):
+        # As populate_side_dishes() would have written it.
+        pizza_store.side_dish_repo.save_side_dishes(side_items, pizza_store.side_menu_mgt.filename)
+    return inventory_restored, (snapshot.raw('menu'), menu_source)
+
+
+def load_store(pizza_store, path: Optional[str] = 'store.snapshot', inventory: bool = True, menu: bool = True) -> str:
+    # Fills a store created with load_inventory=False: its inventory, the
+    # standard pizzas and the side dishes (or only the inventory or only the
+    # menu, for commands that need no more). Returns where they came from:
+    # 'snapshot', 'partial' (some parts rebuilt) or 'sources'. The snapshot
+    # is only rewritten after loading both.
+    use_snapshot = bool(path) and pizza_store.db is None
+    snapshot = open_snapshot(path) if use_snapshot else None
+    inventory_restored, menu_section = False, None
+    if snapshot is not None:
+        try:
+            inventory_restored, menu_section = _restore(pizza_store, snapshot, inventory, menu)
+        finally:
+            snapshot.close()
+    if inventory and not inventory_restored:
+        pizza_store.inventory_mgr.load_inventory()
+    if menu and menu_section is None:
+        pizza_store.populate_standard_pizzas()
+        pizza_store.populate_side_dishes()
+    # The availability cache fills lazily, and nothing has been looked up yet.
+    if inventory_restored == inventory and (menu_section is not None) == menu:
+        return 'snapshot'
+    if use_snapshot and inventory and menu:
+        save_snapshot(pizza_store, path, menu_section)
+    return 'partial' if inventory_restored or menu_section is not None else 'sources'
+
+
+def refresh_snapshot(pizza_store, path: Optional[str] = 'store.snapshot') -> bool:
+    # Saves the inventory into the snapshot if it changed since (e.g. after a
+    # day of orders), so the next start is fast too. The menu section is
+    # copied over as it is.
+    if not path or pizza_store.db is not None:
+        return False
+    pizza_store.inventory_mgr.flush()
+    snapshot = open_snapshot(path)
+    if snapshot is None:
+        return False
+    try:
+        if snapshot.source('inventory') == file_checksum(pizza_store.inventory_mgr.filename):
+            return False
+        menu_source = snapshot.source('menu')
+        menu = (snapshot.raw('menu'), menu_source) if menu_source is not None else None
+    finally:
+        snapshot.close()
+    if menu is None:
+        return False
+    save_snapshot(pizza_store, path, menu)
+    return True
@@ -0,0 +1,325 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import List, Optional
+
+from bussinese import Ingredient, PizzaRecipe, PizzaMenuItem, RecipeManagement, SideItem, MenuManagement, SideMenuManagement, Order
+from Datalayer import IngredientRepository, PizzaRecipeRepository, PizzaMenuRepository, SideDishRepository, OrderRepository
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS ingredients (
+    name TEXT PRIMARY KEY,
+    quantity REAL NOT NULL,
+    unit TEXT NOT NULL,
+    reorder_level INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS recipes (
+    name TEXT PRIMARY KEY,
+    category TEXT
+);
+CREATE INDEX IF NOT EXISTS recipes_category ON recipes (category);
+CREATE TABLE IF NOT EXISTS recipe_ingredients (
+    recipe_name TEXT NOT NULL REFERENCES recipes (name) ON DELETE CASCADE,
+    ingredient_name TEXT NOT NULL,
+    amount REAL NOT NULL,
+    PRIMARY KEY (recipe_name, ingredient_name)
+);
+CREATE INDEX IF NOT EXISTS recipe_ingredients_ingredient ON recipe_ingredients (ingredient_name);
+CREATE TABLE IF NOT EXISTS menu_items (
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    size TEXT NOT NULL,
+    price REAL NOT NULL,
+    category TEXT NOT NULL,
+    recipe_name TEXT NOT NULL,
+    PRIMARY KEY (name, size)
+);
+CREATE INDEX IF NOT EXISTS menu_items_category_size ON menu_items (category, size);
+CREATE INDEX IF NOT EXISTS menu_items_size ON menu_items (size);
+CREATE TABLE IF NOT EXISTS side_items (
+    name TEXT PRIMARY KEY,
+    price REAL NOT NULL,
+    category TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS side_items_category ON side_items (category);
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    placed_at REAL,
+    customer_name TEXT,
+    phone TEXT,
+    email TEXT,
+    company TEXT,
+    delivery_date TEXT,
+    delivery_time TEXT,
+    total REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_phone ON orders (phone);
+CREATE INDEX IF NOT EXISTS orders_placed_at ON orders (placed_at);
+CREATE TABLE IF NOT EXISTS order_lines (
+    order_id INTEGER NOT NULL REFERENCES orders (id) ON DELETE CASCADE,
+    line_no INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size TEXT,
+    category TEXT,
+    price REAL NOT NULL,
+    quantity INTEGER NOT NULL,
+    recipe_name TEXT,
+    ingredients TEXT,
+    PRIMARY KEY (order_id, line_no)
+);
+CREATE INDEX IF NOT EXISTS order_lines_name ON order_lines (name);
+'''
+
+
+class SqliteDatabase:
+    # One connection per store, in WAL mode so readers never block the writer.
+    # Every multi-row mutation runs inside a single `with db.transaction():`.
+
+    def __init__(self, path: str = 'pizza_store.db'):
+        self.path = path
+        # The connection may be handed to another thread (service.py's store
+        # thread), but is only ever used by one thread at a time.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('PRAGMA foreign_keys=ON')
+        self.connection.executescript(SCHEMA)
+        columns = {row[1] for row in self.connection.execute('PRAGMA table_info(order_lines)')}
+        if 'ingredients' not in columns:  # databases created before recipe amounts were recorded
+            self.connection.execute('ALTER TABLE order_lines ADD COLUMN ingredients TEXT')
+
+    def transaction(self):
+        return self.connection
+
+    def data_version(self) -> int:
+        # Changes whenever another connection commits to the database.
+        return self.connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class SqliteIngredientRepository:
+    # The filename arguments are accepted for drop-in compatibility with the
+    # CSV repositories and ignored.
+
+    def __init__(self, db: SqliteDatabase):
+        self._db = db
+
+    def signature(self, filename: str = None):
+        return self._db.data_version()
+
+    def save_ingredients(self, ingredients: List[Ingredient], filename: str = None) -> None:
+        with self._db.transaction() as connection:
+            connection.execute('DELETE FROM ingredients')
+            connection.executemany(
+                'INSERT INTO ingredients (name, quantity, unit, reorder_level) VALUES (?, ?, ?, ?)',
+                [(i.name, i.quantity, i.unit, i.reorder_level) for i in ingredients])
+
+    def load_ingredients(self, filename: str = None) -> List[Ingredient]:
+        rows = self._db.connection.execute(
+            'SELECT name, quantity, unit, reorder_level FROM ingredients ORDER BY rowid')
+        return [Ingredient(name, quantity, unit, reorder_level) for name, quantity, unit, reorder_level in rows]
+
+
+class SqlitePizzaRecipeRepository:
+    def __init__(self, db: SqliteDatabase):
+        self._db = db
+
+    def save_recipes(self, recipes: List[PizzaRecipe], filename: str = None):
+        with self._db.transaction() as connection:
+            connection.execute('DELETE FROM recipe_ingredients')
+            connection.execute('DELETE FROM recipes')
+            connection.executemany('INSERT INTO recipes (name, category) VALUES (?, ?)',
+                                   [(recipe.name, recipe.category) for recipe in recipes])
+            connection.executemany(
+                'INSERT INTO recipe_ingredients (recipe_name, ingredient_name, amount) VALUES (?, ?, ?)',
+                [(recipe.name, name, amount) for recipe in recipes for name, amount in recipe.ingredients.items()])
+
+    def load_pizza_recipes(self, filename: str = None) -> List[PizzaRecipe]:
+        recipes = {}
+        for name, category in self._db.connection.execute('SELECT name, category FROM recipes ORDER BY rowid'):
+            recipes[name] = (category, {})
+        rows = self._db.connection.execute(
+            'SELECT recipe_name, ingredient_name, amount FROM recipe_ingredients ORDER BY rowid')
+        for recipe_name, ingredient_name, amount in rows:
+            recipes[recipe_name][1][ingredient_name] = amount
+        return [PizzaRecipe(name, ingredients, category) for name, (category, ingredients) in recipes.items()]
+
+
+class SqlitePizzaMenuRepository:
+    def __init__(self, db: SqliteDatabase):
+        self._db = db
+
+    def save_menu_items(self, menu_items: List[PizzaMenuItem], filename: str = None):
+        with self._db.transaction() as connection:
+            connection.execute('DELETE FROM menu_items')
+            connection.executemany(
+                'INSERT INTO menu_items (name, description, size, price, category, recipe_name) VALUES (?, ?, ?, ?, ?, ?)',
+                [(item.name, item.description, item.size, item.price, item.category, item.recipe.name)
+                 for item in menu_items])
+
+    def load_menu_items(self, filename: str = None, recipe_mgt: RecipeManagement = None) -> List[PizzaMenuItem]:
+        menu_items = []
+        rows = self._db.connection.execute(
+            'SELECT name, description, size, price, category, recipe_name FROM menu_items ORDER BY rowid')
+        for name, description, size, price, category, recipe_name in rows:
+            recipe = recipe_mgt.get_recipe_by_name(recipe_name)
+            if not recipe:
+                print(f"Recipe '{recipe_name}' not found. Skipping menu item '{name}'.")
+                continue
+            menu_items.append(PizzaMenuItem(name, description, size, price, category, recipe))
+        return menu_items
+
+
+class SqliteSideDishRepository:
+    def __init__(self, db: SqliteDatabase):
+        self._db = db
+
+    def save_side_dishes(self, side_dishes: List[SideItem], filename: str = None) -> None:
+        with self._db.transaction() as connection:
+            connection.execute('DELETE FROM side_items')
+            connection.executemany('INSERT INTO side_items (name, price, category) VALUES (?, ?, ?)',
+                                   [(side.name, side.price, side.category) for side in side_dishes])
+
+    def load_side_dishes(self, filename: str = None) -> List[SideItem]:
+        rows = self._db.connection.execute('SELECT name, price, category FROM side_items ORDER BY rowid')
+        return [SideItem(name, price, category) for name, price, category in rows]
+
+
+class SqliteOrderRepository:
+    # Same interface and record format as the journal-based OrderRepository.
+
+    def __init__(self, db: SqliteDatabase):
+        self._db = db
+
+    @property
+    def last_id(self) -> int:
+        return self._db.connection.execute('SELECT COALESCE(MAX(id), 0) FROM orders').fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._db.connection.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+
+    def append(self, order: Order) -> int:
+        # Orders that already have an id (e.g. from the journal) keep it.
+        order.placed_at = order.placed_at or time.time()
+        with self._db.transaction() as connection:
+            order.order_id = self._insert(connection, OrderRepository.order_to_record(order))
+        return order.order_id
+
+    def append_records(self, records) -> int:
+        # Journal records, ids kept, all in one transaction (one commit, not
+        # one per order).
+        count = 0
+        with self._db.transaction() as connection:
+            for record in records:
+                self._insert(connection, record)
+                count += 1
+        return count
+
+    def _insert(self, connection, record: dict) -> int:
+        name, phone, email, company = record['c'] or (None, None, None, None)
+        cursor = connection.execute(
+            'INSERT INTO orders (id, placed_at, customer_name, phone, email, company, delivery_date, delivery_time, total) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (record['id'], record['ts'], name, phone, email, company, record['dd'], record['dt'], record['t']))
+        order_id = cursor.lastrowid
+        lines = [(order_id, n, 'pizza', name, size, category, price, quantity, recipe_name,
+                  json.dumps(recorded[0]) if recorded else None)
+                 for n, (name, size, category, price, quantity, recipe_name, *recorded) in enumerate(record['p'])]
+        lines += [(order_id, len(record['p']) + n, 'side', name, None, category, price, quantity, None, None)
+                  for n, (name, category, price, quantity) in enumerate(record['s'])]
+        connection.executemany(
+            'INSERT INTO order_lines (order_id, line_no, kind, name, size, category, price, quantity, recipe_name, ingredients) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', lines)
+        return order_id
+
+    def commit(self) -> None:
+        pass  # every append (or append_records) is its own transaction
+
+    def close(self) -> None:
+        pass
+
+    def _records(self, where: str, params: tuple):
+        # Orders and their lines come from two cursors walked in step (both
+        # ordered by order id), rather than one lines query per order.
+        connection = self._db.connection
+        orders = connection.execute(
+            'SELECT id, placed_at, customer_name, phone, email, company, delivery_date, delivery_time, total '
+            f'FROM orders WHERE {where} ORDER BY id', params)
+        lines = connection.execute(
+            'SELECT order_id, kind, name, size, category, price, quantity, recipe_name, ingredients FROM order_lines '
+            f'WHERE order_id IN (SELECT id FROM orders WHERE {where}) ORDER BY order_id, line_no', params)
+        line = next(lines, None)
+        for order_id, placed_at, name, phone, email, company, delivery_date, delivery_time, total in orders:
+            record = {
+                'id': order_id,
+                'ts': placed_at,
+                'c': None if name is None and phone is None else [name, phone, email, company],
+                'dd': delivery_date,
+                'dt': delivery_time,
+                'p': [],
+                's': [],
+                't': total,
+            }
+            while line is not None and line[0] <= order_id:
+                if line[0] == order_id:
+                    _, kind, line_name, size, category, price, quantity, recipe_name, ingredients = line
+                    if kind == 'pizza':
+                        pizza = [line_name, size, category, price, quantity, recipe_name]
+                        if ingredients is not None:
+                            pizza.append(json.loads(ingredients))
+                        record['p'].append(pizza)
+                    else:
+                        record['s'].append([line_name, category, price, quantity])
+                line = next(lines, None)
+            yield record
+
+    def replay(self, after_id: int = 0):
+        return self._records('id > ?', (after_id,))
+
+    def get(self, order_id: int) -> Optional[dict]:
+        return next(self._records('id = ?', (order_id,)), None)
+
+    def load_orders(self, menu_mgt: Optional[MenuManagement] = None,
+                    side_menu_mgt: Optional[SideMenuManagement] = None) -> List[Order]:
+        return [OrderRepository.record_to_order(record, menu_mgt, side_menu_mgt) for record in self.replay()]
+
+
+def migrate_csv_to_sqlite(db_path: str = 'pizza_store.db', data_dir: str = '.', orders_dir: Optional[str] = None) -> SqliteDatabase:
+    # One-shot import of the CSV files (and optionally the order journal).
+    db = SqliteDatabase(db_path)
+    path = lambda filename: os.path.join(data_dir, filename)
+    recipe_mgt = RecipeManagement()
+    recipe_mgt.recipes = PizzaRecipeRepository().load_pizza_recipes(path('recipes.csv'))
+    SqliteIngredientRepository(db).save_ingredients(IngredientRepository().load_ingredients(path('ingredients.csv')))
+    SqlitePizzaRecipeRepository(db).save_recipes(recipe_mgt.list_recipes())
+    SqlitePizzaMenuRepository(db).save_menu_items(PizzaMenuRepository().load_menu_items(path('menu_items.csv'), recipe_mgt))
+    SqliteSideDishRepository(db).save_side_dishes(SideDishRepository().load_side_dishes(path('side_dish.csv')))
+    if orders_dir is not None and os.path.isdir(orders_dir):
+        journal = OrderRepository(orders_dir)
+        orders = SqliteOrderRepository(db)
+        migrated = orders.last_id
+        orders.append_records(journal.replay(migrated))
+        journal.close()
+    return db
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import a store's CSV files and order journal into SQLite.")
+    parser.add_argument('--data-dir', default='.', help="directory holding the store's files (default: current)")
+    parser.add_argument('--db', default='pizza_store.db', help="database file, relative to the data directory")
+    args = parser.parse_args(argv)
+
+    db_path = os.path.join(args.data_dir, args.db)
+    migrate_csv_to_sqlite(db_path, args.data_dir, os.path.join(args.data_dir, 'orders')).close()
+    print(f"Migrated the CSV files to {db_path}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    # The store resolves its files relative to the working directory.
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def write_inventory(path, rows):
+    # rows: (name, quantity, unit, reorder level)
+    with open(path, 'w', newline='') as inventory:
+        inventory.write('name,quantity,unit,reorder_level\n')
+        for row in rows:
+            inventory.write(','.join(str(value) for value in row) + '\n')
+
+
+def make_order(pizza='Pepperoni', quantity=1, date='2024-05-01', time='18:30', phone='510-555-0100', ingredients=None):
+    from bussinese import CustomerInfo, Order, PizzaMenuItem, PizzaRecipe, PizzaSize
+
+    recipe = PizzaRecipe(pizza, ingredients or {'Cheese': 1}, 'meat')
+    item = PizzaMenuItem(pizza, f"{pizza} pizza", PizzaSize.LARGE, 15.5, 'meat', recipe)
+    return Order(CustomerInfo('Customer', phone, 'customer@example.com'), date, time, [(item, quantity)], [])
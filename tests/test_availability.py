@@ -0,0 +1,84 @@
+import builtins
+import math
+from datetime import date, timedelta
+
+from availability import AvailabilityService
+from bussinese import InventoryManager, MenuManagement, PizzaMenuItem, PizzaRecipe, PizzaSize, SideItem, SideMenuManagement
+from tests.conftest import write_inventory
+
+DAY = (date.today() + timedelta(days=3)).isoformat()
+
+
+def _item(name, ingredients):
+    return PizzaMenuItem(name, '', PizzaSize.LARGE, 15.0, 'meat', PizzaRecipe(name, ingredients, 'meat'))
+
+
+def test_only_items_using_a_changed_ingredient_are_recomputed(store_dir, monkeypatch):
+    write_inventory('ingredients.csv', [('Cheese', 10, 'kg', 1), ('Ham', 3, 'kg', 1)])
+    inventory = InventoryManager('ingredients.csv')
+    menu = MenuManagement()
+    cheese, ham = _item('Cheese', {'Cheese': 2}), _item('Ham', {'Ham': 1, 'Cheese': 1})
+    truffle = _item('Truffle', {'Truffle': 1})  # not stocked, so never the limit
+    for item in (cheese, ham, truffle):
+        menu.add_menu_item(item)
+    availability = AvailabilityService(menu, SideMenuManagement(None), inventory)
+    availability.rebuild()
+    assert [availability.max_quantity(item) for item in (cheese, ham, truffle)] == [5, 3, math.inf]
+    assert availability.max_quantity(SideItem('Water', 1.0, 'Beverages')) == math.inf
+
+    computed = []
+    compute = availability._compute
+    monkeypatch.setattr(availability, '_compute', lambda item: computed.append(item.name) or compute(item))
+    assert inventory.use_ingredient({'Ham': 2}) == {}
+    assert computed == ['Ham']
+    assert availability.max_quantity(ham) == 1
+    assert availability.max_quantity(cheese) == 5 and computed == ['Ham']  # served from the cache
+    reservation = inventory.reserve({'Cheese': 9})
+    assert sorted(computed[1:]) == ['Cheese', 'Ham']
+    assert [availability.max_quantity(item) for item in (cheese, ham)] == [0, 1]
+    assert availability.orderable_menu_items() == [ham, truffle]
+    inventory.release(reservation)
+    assert availability.max_quantity(cheese) == 5
+
+    # A replaced menu item is tracked afresh rather than read from its predecessor's entry.
+    cheaper = _item('Cheese', {'Cheese': 1})
+    menu.update_menu_item('Cheese', cheaper)
+    assert availability.max_quantity(cheaper) == 10
+    availability.close()
+
+
+def test_counter_orders_use_up_an_item(store_dir, monkeypatch):
+    from Presentation import PizzaStore
+
+    write_inventory('ingredients.csv', [('Pepperoni', 3, 'kg', 1), ('Ham', 5, 'kg', 1)])
+    pizza_store = PizzaStore()
+    pizza_store.populate_standard_pizzas()
+    menu_item = pizza_store.menu_mgt.get_menu_item_by_name
+    availability = pizza_store.availability
+
+    def while_held():
+        # The selected pizzas' stock is held, so it is already spoken for.
+        assert availability.max_quantity(menu_item('Pepperoni')) == 1
+        assert availability.max_quantity(menu_item('Meat Lovers')) == 1
+        assert availability.max_quantity(menu_item('Hawaiian')) == 5
+    answers = iter(['510-555-0110', 'Ann', '', 'ann@example.com', 'yes', 'Pepperoni', '2', 'no', 'no', while_held,
+                    DAY, '18:30',
+                    '510-555-0111', 'Bob', '', 'bob@example.com', 'yes', 'Pepperoni', '1', 'no', 'no', DAY, '18:30',
+                    'yes', 'Pepperoni', '1', 'no'])
+
+    def answer(prompt=''):
+        value = next(answers)
+        if callable(value):
+            value()
+            value = next(answers)
+        return value
+    monkeypatch.setattr(builtins, 'input', answer)
+    assert pizza_store.take_order() is not None
+    assert availability.max_quantity(menu_item('Pepperoni')) == 1
+    assert pizza_store.take_order() is not None
+    assert availability.max_quantity(menu_item('Pepperoni')) == 0
+    assert [item.name for item in availability.orderable_menu_items()] == ['Hawaiian', 'Vegetarian', 'BBQ Chicken']
+    # The counter now turns a Pepperoni away.
+    assert pizza_store.select_pizzas() == []
+    assert next(answers, None) is None
+    pizza_store.close()
@@ -0,0 +1,51 @@
+from bussinese import PizzaRecipe, RecipeManagement
+from catalog import IngredientCatalog, catalog
+from tests.conftest import write_inventory
+
+
+def _write_aliases(path, rows):
+    with open(path, 'w', newline='') as aliases:
+        aliases.write('alias,name\n')
+        for alias, name in rows:
+            aliases.write(f'{alias},{name}\n')
+
+
+def test_aliases_come_from_the_data_file(store_dir):
+    _write_aliases('aliases.csv', [('Black Olives', 'Olives'), ('Ripe Olives', '')])
+    ingredients = IngredientCatalog()
+    problems = ingredients.load_aliases('aliases.csv')
+    assert ingredients.lookup('black olives') == ingredients.lookup('Olives')
+    assert ingredients.lookup('Tomato Slices') is None
+    assert len(problems) == 1
+    assert IngredientCatalog().load_aliases('missing.csv') == []
+
+
+def test_conflicting_alias_is_reported(store_dir):
+    ingredients = IngredientCatalog()
+    ingredients.id_for('Tomato Slices')
+    _write_aliases('aliases.csv', [('Tomato Slices', 'Tomato')])
+    assert ingredients.load_aliases('aliases.csv') == ["'Tomato Slices' already names ingredient 'Tomato Slices'."]
+    assert ingredients.lookup('Tomato Slices') != ingredients.lookup('Tomato')
+
+
+def test_recipes_using_resolves_aliases(store_dir):
+    _write_aliases('aliases.csv', [('Kalamata Olive', 'Test Olive')])
+    assert catalog.load_aliases('aliases.csv') == []
+    recipe_mgt = RecipeManagement()
+    recipe_mgt.add_recipe(PizzaRecipe("Greek", {"Test Olive": 1, "Feta": 1}))
+    recipe_mgt.add_recipe(PizzaRecipe("Plain", {"Feta": 1}))
+    assert [recipe.name for recipe in recipe_mgt.recipes_using("Kalamata Olive")] == ["Greek"]
+    assert [recipe.name for recipe in recipe_mgt.recipes_using("feta")] == ["Greek", "Plain"]
+    assert recipe_mgt.recipes_using("Anchovies") == []
+
+
+def test_store_reports_unstocked_close_matches(store_dir):
+    from Presentation import PizzaStore
+
+    write_inventory('ingredients.csv', [('Cheese', 10, 'kg', 2), ('Tomato', 10, 'kg', 2), ('Pepperoni', 10, 'kg', 2)])
+    pizza_store = PizzaStore()
+    pizza_store.recipe_mgt.add_recipe(PizzaRecipe("Pepperoni", {"Pepperoni": 1, "Extra Cheese": 1}))
+    mismatches = pizza_store.ingredient_mismatches()
+    assert mismatches['Tomato Slices'] == ['Tomato']
+    assert mismatches['Extra Cheese'] == ['Cheese']
+    assert 'Pepperoni' not in mismatches
@@ -0,0 +1,82 @@
+import pytest
+
+from bussinese import CustomerInfo, CustomPizzaOrder, PizzaSize
+from customers import CustomerDirectory, company_key, email_key, phone_key
+from Datalayer import OrderRepository
+from tests.conftest import make_order
+
+
+def test_keys_normalize_contact_details():
+    assert phone_key('(510) 555-7777') == phone_key('+1 510.555.7777') == '5105557777'
+    assert phone_key('') is None
+    assert email_key(' Ann@Example.COM ') == 'ann@example.com'
+    assert company_key('  Acme   Corp ') == company_key('acme corp')
+    assert company_key(None) is None
+
+
+def test_upsert_matches_by_phone_then_email(store_dir):
+    directory = CustomerDirectory()
+    ann = CustomerInfo('Ann', '510-555-0100', 'ann@example.com', 'Acme')
+    ann_id = directory.upsert(ann)
+    # Same phone, written differently; blank fields keep what was saved.
+    again = CustomerInfo('Ann Lee', '(510) 555 0100', '')
+    assert directory.upsert(again) == ann_id
+    saved = directory.find_by_email('ANN@example.com')
+    assert (saved.name, saved.email, saved.company) == ('Ann Lee', 'ann@example.com', 'Acme')
+    # No phone match: the email finds her, and the cached phone lookup follows the change.
+    assert directory.upsert(CustomerInfo('Ann', '415-555-0199', 'ann@example.com')) == ann_id
+    assert directory.find_by_phone('510-555-0100') is None
+    assert directory.find_by_phone('415 555 0199').customer_id == ann_id
+    bob_id = directory.upsert(CustomerInfo('Bob', '510-555-0101', 'bob@example.com', 'ACME'))
+    assert [customer.customer_id for customer in directory.find_by_company('acme')] == [ann_id, bob_id]
+    assert len(directory) == 2
+    directory.close()
+    assert CustomerDirectory().find(email='bob@example.com').customer_id == bob_id
+
+
+def test_orders_are_linked_once(store_dir):
+    directory = CustomerDirectory(commit_every=100)
+    ann = CustomerInfo('Ann', '510-555-0100', 'ann@example.com')
+    for order_id in (3, 7, 7, 5):
+        directory.record_order(ann, order_id)
+    assert directory.order_ids(ann.customer_id) == [3, 5, 7]
+    assert directory.last_order_id(ann.customer_id) == 7
+    directory.close()
+
+
+@pytest.mark.parametrize('backend', ['csv', 'sqlite'])
+def test_reorder_rebuilds_custom_pizzas_from_the_journal(store_dir, backend):
+    from Presentation import PizzaStore
+
+    pizza_store = PizzaStore(backend)
+    pizza_store.populate_standard_pizzas()
+    custom = CustomPizzaOrder.build_custom_pizza({'Thin Crust': 1, 'Tomato': 1, 'Ham': 2}, PizzaSize.SMALL)
+    order = make_order('Pepperoni', quantity=2)
+    order.pizzas[0] = (pizza_store.menu_mgt.get_menu_item('Pepperoni', PizzaSize.LARGE), 2)
+    order.add_pizza(custom, 3)
+    assert pizza_store.record_order(order, schedule=False)
+    pizza_store.close()
+
+    pizza_store = PizzaStore(backend)
+    pizza_store.populate_standard_pizzas()
+    customer = pizza_store.customers.find_by_phone('510-555-0100')
+    again = pizza_store.customers.reorder_last(customer, pizza_store.order_repo, pizza_store.menu_mgt,
+                                               pizza_store.side_menu_mgt)
+    (pepperoni, _), (rebuilt, quantity) = again.pizza_lines()
+    assert pepperoni is pizza_store.menu_mgt.get_menu_item('Pepperoni', PizzaSize.LARGE)
+    assert (rebuilt.name, rebuilt.size, rebuilt.price, quantity) == ('Custom Pizza', PizzaSize.SMALL, custom.price, 3)
+    assert rebuilt.recipe.ingredients == {'Thin Crust': 1, 'Tomato': 1, 'Ham': 2}
+    assert again.ingredient_demand()['Ham'] == 6
+    assert again.customer_info is customer and again.order_id is None
+    pizza_store.close()
+
+
+def test_unrecorded_recipe_off_the_menu_is_rejected():
+    # A journal line from before recipe amounts were recorded.
+    record = {'id': 4, 'ts': 1.0, 'c': None, 'dd': '', 'dt': '', 's': [], 't': 31.0,
+              'p': [['Custom Pizza', 'large', 'specialty', 15.5, 2, 'Custom Pizza']]}
+    with pytest.raises(ValueError, match="order 4: large 'Custom Pizza' is not on the menu"):
+        OrderRepository.record_to_order(record)
+    record['p'][0].append({'Cheese': 2})
+    order = OrderRepository.record_to_order(record)
+    assert order.ingredient_demand() == {'Cheese': 4}
@@ -0,0 +1,72 @@
+import io
+import json
+from datetime import date, timedelta
+
+from ingest import ingest
+from kitchen import parse_delivery
+from tests.conftest import make_order, write_inventory
+
+# Far enough ahead for any notice, inside the booking horizon.
+DAY = (date.today() + timedelta(days=3)).isoformat()
+
+
+def _store():
+    from Presentation import PizzaStore
+
+    return PizzaStore()
+
+
+def test_bookings_survive_a_restart(store_dir):
+    pizza_store = _store()
+    first = make_order(quantity=20, date=DAY, time='18:30')
+    assert pizza_store.schedule_delivery(first).success
+    pizza_store.record_order(first, schedule=False)
+    pizza_store.close()
+
+    pizza_store = _store()
+    booking = pizza_store.schedule_delivery(make_order(quantity=10, date=DAY, time='18:40'))
+    assert not booking.success
+    assert "room for 4 more" in booking.reason
+    assert pizza_store.schedule_delivery(make_order(quantity=4, date=DAY, time='18:30')).success
+    pizza_store.close()
+
+
+def _record(ref, quantity, clock):
+    return json.dumps({'ref': ref, 'delivery_date': DAY, 'delivery_time': clock,
+                       'pizzas': [{'name': 'Pepperoni', 'size': 'large', 'quantity': quantity}]}) + '\n'
+
+
+def test_ingest_rejects_orders_that_do_not_fit(store_dir):
+    write_inventory('ingredients.csv', [('Pepperoni', 30, 'kg', 2)])
+    pizza_store = _store()
+    pizza_store.populate_standard_pizzas()
+    stream = io.StringIO(_record('a', 15, '18:30') + _record('b', 15, '18:30') +
+                         _record('c', 15, '19:30') + _record('d', 5, '20:30'))
+    report = ingest(pizza_store, stream, book_slots=True)
+    assert report.accepted == 2
+    assert report.rejected == {'no delivery slot': 1, 'out of stock': 1}
+    # The order that was out of stock gave its slot back.
+    assert pizza_store.delivery.booked(parse_delivery(DAY, '20:30')) == 0
+    assert pizza_store.delivery.booked(parse_delivery(DAY, '18:30')) == 15
+    pizza_store.close()
+
+    pizza_store = _store()
+    assert pizza_store.delivery.booked(parse_delivery(DAY, '19:30')) == 15
+    pizza_store.close()
+
+
+def test_replaying_past_orders_books_nothing(store_dir):
+    write_inventory('ingredients.csv', [('Pepperoni', 1000, 'kg', 2)])
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    records = ''.join(json.dumps({'ref': f'r{i}', 'delivery_date': yesterday, 'delivery_time': '18:30',
+                                  'pizzas': [{'name': 'Pepperoni', 'size': 'large', 'quantity': 20}]}) + '\n'
+                      for i in range(10))
+    for book_slots in (False, True):
+        pizza_store = _store()
+        pizza_store.populate_standard_pizzas()
+        report = ingest(pizza_store, io.StringIO(records), book_slots=book_slots)
+        assert report.accepted == 10
+        assert not report.rejected
+        pizza_store.close()
+    # Ten times the slot's capacity went through, and no future slot was taken.
+    assert _store().delivery.booked(parse_delivery(DAY, '18:30')) == 0
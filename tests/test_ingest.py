@@ -0,0 +1,28 @@
+import pytest
+
+from ingest import IngestReport, _quantity, build_orders
+
+
+@pytest.mark.parametrize('quantity', [2.9, 2.0, True, '2.5', '', 'two', None, 0, '-1'])
+def test_quantity_must_be_a_whole_number(quantity):
+    with pytest.raises(ValueError):
+        _quantity({'quantity': quantity})
+
+
+def test_quantity_from_json_or_csv():
+    assert _quantity({}) == 1
+    assert _quantity({'quantity': 3}) == 3
+    assert _quantity({'quantity': ' 12 '}) == 12
+
+
+def test_fractional_quantity_rejects_the_order(store_dir):
+    from Presentation import PizzaStore
+
+    pizza_store = PizzaStore()
+    pizza_store.populate_side_dishes()
+    report = IngestReport()
+    records = [(ref, {'sides': [{'name': 'Water', 'quantity': quantity}]})
+               for ref, quantity in (('a', 2), ('b', 2.9), ('c', True), ('d', '2'))]
+    accepted = [ref for ref, _, _ in build_orders(records, pizza_store, report)]
+    assert accepted == ['a', 'd']
+    assert report.rejected == {'invalid': 2}
@@ -0,0 +1,61 @@
+from bussinese import InventoryManager
+from tests.conftest import write_inventory
+
+
+def _quantities(filename):
+    # As a fresh reader of the file sees them.
+    return {ingredient.name: ingredient.quantity for ingredient in InventoryManager(filename, flush_every=None).ingredients}
+
+
+def test_buffered_changes_are_written_on_flush(store_dir):
+    write_inventory('ingredients.csv', [('Cheese', 10, 'kg', 2), ('Ham', 5, 'kg', 1)])
+    inventory = InventoryManager('ingredients.csv', flush_every=None)
+    inventory.use_ingredient({'Cheese': 3})
+    assert inventory.dirty
+    assert _quantities('ingredients.csv')['Cheese'] == 10
+    inventory.flush()
+    assert not inventory.dirty
+    assert _quantities('ingredients.csv') == {'Cheese': 7, 'Ham': 5}
+
+
+def test_flush_every_n_mutations(store_dir):
+    write_inventory('ingredients.csv', [('Cheese', 10, 'kg', 2)])
+    inventory = InventoryManager('ingredients.csv', flush_every=2)
+    inventory.use_ingredient({'Cheese': 1})
+    assert inventory.dirty
+    inventory.use_ingredient({'Cheese': 1})
+    assert not inventory.dirty
+    assert _quantities('ingredients.csv')['Cheese'] == 8
+
+
+def test_external_edit_is_picked_up(store_dir):
+    write_inventory('ingredients.csv', [('Cheese', 10, 'kg', 2)])
+    inventory = InventoryManager('ingredients.csv', flush_every=None)
+    write_inventory('ingredients.csv', [('Cheese', 4, 'kg', 2), ('Ham', 1, 'kg', 1)])
+    inventory.refresh()
+    assert inventory.get_ingredient('ham').quantity == 1
+    assert inventory.get_ingredient('Cheese').quantity == 4
+
+
+def test_use_ingredient_cannot_take_reserved_stock(store_dir):
+    write_inventory('ingredients.csv', [('Cheese', 25, 'kg', 2)])
+    inventory = InventoryManager('ingredients.csv', flush_every=None)
+    reservation = inventory.reserve({'Cheese': 20})
+    assert reservation.success
+    assert inventory.use_ingredient({'Cheese': 20}) == {'Cheese': 15}
+    assert inventory.get_ingredient('Cheese').quantity == 25
+    assert inventory.commit(reservation)
+    assert inventory.get_ingredient('Cheese').quantity == 5
+    assert inventory.use_ingredient({'Cheese': 5}) == {}
+    assert inventory.get_ingredient('Cheese').quantity == 0
+
+
+def test_commit_fails_when_held_stock_is_gone(store_dir):
+    write_inventory('ingredients.csv', [('Cheese', 25, 'kg', 2)])
+    inventory = InventoryManager('ingredients.csv', flush_every=None)
+    reservation = inventory.reserve({'Cheese': 20})
+    write_inventory('ingredients.csv', [('Cheese', 10, 'kg', 2)])
+    inventory.refresh()
+    assert not inventory.commit(reservation)
+    assert inventory.get_ingredient('Cheese').quantity == 10
+    assert inventory.release(reservation)
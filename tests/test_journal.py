@@ -0,0 +1,61 @@
+import os
+import time
+
+import Datalayer
+from Datalayer import OrderRepository
+from tests.conftest import make_order
+
+
+def _segment(directory):
+    names = sorted(name for name in os.listdir(directory) if name.endswith(OrderRepository.SEGMENT_SUFFIX))
+    return os.path.join(directory, names[-1])
+
+
+def test_torn_tail_is_truncated_on_recovery(store_dir):
+    journal = OrderRepository('orders', commit_every=1)
+    for _ in range(3):
+        journal.append(make_order())
+    journal.close()
+    segment = _segment('orders')
+    intact = os.path.getsize(segment)
+    with open(segment, 'ab') as damaged:
+        damaged.write(b'1234abcd {"id": 4, "ts"')  # crash mid-write
+
+    journal = OrderRepository('orders', commit_every=1)
+    assert len(journal) == 3 and journal.last_id == 3
+    assert os.path.getsize(segment) == intact
+    assert journal.append(make_order()) == 4
+    assert [record['id'] for record in journal.replay()] == [1, 2, 3, 4]
+    journal.close()
+
+
+def test_corrupt_record_is_not_replayed(store_dir):
+    journal = OrderRepository('orders', commit_every=1)
+    journal.append(make_order())
+    journal.append(make_order())
+    journal.close()
+    segment = _segment('orders')
+    with open(segment, 'rb') as source:
+        lines = source.readlines()
+    lines[1] = lines[1].replace(b'"Customer"', b'"Cu5tomer"')  # checksum no longer matches
+    with open(segment, 'wb') as target:
+        target.writelines(lines)
+
+    journal = OrderRepository('orders', commit_every=1)
+    assert [record['id'] for record in journal.replay()] == [1]
+    journal.close()
+
+
+def test_a_lone_append_reaches_the_os_and_is_fsynced_on_the_interval(store_dir, monkeypatch):
+    fsyncs = []
+    real_fsync = Datalayer.os.fsync
+    monkeypatch.setattr(Datalayer.os, 'fsync', lambda fd: (fsyncs.append(fd), real_fsync(fd)))
+    journal = OrderRepository('orders', commit_every=32, commit_interval=0.05)
+    journal.append(make_order())
+    with open(_segment('orders'), 'rb') as segment:
+        assert segment.read().count(b'\n') == 1
+    deadline = time.monotonic() + 5
+    while not fsyncs and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert fsyncs
+    journal.close()
@@ -0,0 +1,105 @@
+from kitchen import KitchenScheduler, parse_delivery
+from tests.conftest import make_order
+
+DAY = '2024-05-01'
+COOK = 8 * 60  # make_order's pizzas are large
+
+
+def _due(clock):
+    return parse_delivery(DAY, clock)
+
+
+def _batch_summary(batch):
+    return batch.name, batch.quantity, [(ticket.order, count) for ticket, count in batch.tickets]
+
+
+def test_most_urgent_kind_goes_first_and_batches_its_window():
+    kitchen = KitchenScheduler(ovens=2, oven_capacity=10)
+    early = make_order('Pepperoni', quantity=4, date=DAY, time='18:30')
+    urgent = make_order('Margherita', quantity=2, date=DAY, time='18:20')
+    later = make_order('Pepperoni', quantity=3, date=DAY, time='18:40')
+    outside = make_order('Pepperoni', quantity=1, date=DAY, time='18:50')
+    for order in (early, later, outside, urgent):
+        kitchen.submit(order, now=0)
+    assert kitchen.pending_tickets == 4
+    assert kitchen.queue_depth == 10
+
+    now = _due('18:30') - kitchen.start_window
+    first = kitchen.next_batch(now)
+    assert _batch_summary(first) == ('Margherita', 2, [(urgent, 2)])
+    # Two identical pizzas due within batch_window of the first share a cycle;
+    # the one due 20 minutes after the first waits for its own.
+    second = kitchen.next_batch(now)
+    assert _batch_summary(second) == ('Pepperoni', 7, [(early, 4), (later, 3)])
+    assert {first.oven, second.oven} == {0, 1}
+    assert kitchen.next_batch(now) is None  # both ovens busy
+    assert kitchen.queue_depth == 1
+
+    assert kitchen.finish(first, now + COOK) == [urgent]
+    # An oven is free, but the start window holds the last one back.
+    assert kitchen.next_batch(now + COOK) is None
+    third = kitchen.next_batch(_due('18:50') - kitchen.start_window)
+    assert _batch_summary(third) == ('Pepperoni', 1, [(outside, 1)])
+
+
+def test_nothing_starts_before_the_start_window():
+    kitchen = KitchenScheduler(ovens=1, start_window=30 * 60)
+    order = make_order(quantity=2, date=DAY, time='19:00')
+    kitchen.submit(order, now=0)
+    opens = _due('19:00') - 30 * 60
+    assert kitchen.next_batch(opens - 1) is None
+    batch = kitchen.next_batch(opens)
+    assert (batch.start, batch.done) == (opens, opens + COOK)
+
+
+def test_large_tickets_are_split_across_oven_cycles():
+    kitchen = KitchenScheduler(ovens=2, oven_capacity=10)
+    big = make_order(quantity=15, date=DAY, time='18:30')
+    small = make_order(quantity=3, date=DAY, time='18:35')
+    kitchen.submit(big, now=0)
+    kitchen.submit(small, now=0)
+    now = _due('18:30')
+    first = kitchen.next_batch(now)
+    second = kitchen.next_batch(now)
+    assert _batch_summary(first) == ('Pepperoni', 10, [(big, 10)])
+    assert _batch_summary(second) == ('Pepperoni', 8, [(big, 5), (small, 3)])
+    assert kitchen.pending_tickets == 0
+    assert kitchen.finish(first, now + COOK) == []
+    assert kitchen.finish(second, now + COOK) == [big, small]
+
+
+def test_predictions_do_not_change_the_schedule():
+    kitchen = KitchenScheduler(ovens=1, oven_capacity=10)
+    orders = [make_order(name, quantity=5, date=DAY, time='18:00') for name in ('Pepperoni', 'Margherita', 'Hawaiian')]
+    for order in orders:
+        kitchen.submit(order, now=0)
+    now = _due('18:00')
+    predicted = kitchen.predicted_completions(now)
+    assert sorted(predicted.values()) == [now + COOK, now + 2 * COOK, now + 3 * COOK]
+    assert kitchen.pending_tickets == 3
+    batch = kitchen.next_batch(now)
+    assert batch.done == predicted[id(batch.tickets[0][0].order)]
+    # Orders already in the oven keep their batch's end time.
+    assert kitchen.predicted_completion(batch.tickets[0][0].order, now) == batch.done
+
+
+def test_sides_only_orders_create_no_tickets():
+    kitchen = KitchenScheduler()
+    order = make_order(quantity=1)
+    order.pizzas.clear()
+    assert kitchen.submit(order, now=0) == 0
+    assert kitchen.next_batch(0) is None
+
+
+def test_recorded_orders_are_queued_for_the_kitchen(store_dir):
+    from Presentation import PizzaStore
+
+    pizza_store = PizzaStore()
+    queued = make_order(quantity=3, date=DAY, time='18:30')
+    assert pizza_store.record_order(queued)
+    assert pizza_store.kitchen.queue_depth == 3
+    assert pizza_store.kitchen.predicted_completion(queued) is not None
+    # Replays journal the order without cooking it again.
+    assert pizza_store.record_order(make_order(quantity=2, date=DAY, time='18:30'), schedule=False)
+    assert pizza_store.kitchen.queue_depth == 3
+    pizza_store.close()
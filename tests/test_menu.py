@@ -0,0 +1,134 @@
+import pickle
+
+from bussinese import (MenuManagement, PizzaCategory, PizzaMenuItem, PizzaRecipe, PizzaSize, RecipeManagement, SideItem,
+                       SideMenuManagement)
+
+SIZES = (PizzaSize.SMALL, PizzaSize.MEDIUM, PizzaSize.LARGE)
+CATEGORIES = (PizzaCategory.MEAT, PizzaCategory.VEGETARIAN, PizzaCategory.SPECIALTY)
+
+
+def _item(name, size=PizzaSize.LARGE, category=PizzaCategory.MEAT, price=15.0):
+    return PizzaMenuItem(name, f"{name} pizza", size, price, category, PizzaRecipe(name, {'Cheese': 1}, category))
+
+
+def test_name_lookups_follow_adds_updates_and_removes():
+    menu = MenuManagement()
+    pepperoni, small_pepperoni, veggie = _item('Pepperoni'), _item('Pepperoni', PizzaSize.SMALL), _item('Veggie')
+    for item in (pepperoni, small_pepperoni, veggie):
+        menu.add_menu_item(item)
+    assert menu.get_menu_item_by_name('PEPPERONI') is pepperoni
+    assert menu.get_menu_item('pepperoni', PizzaSize.SMALL) is small_pepperoni
+    assert menu.list_menu_items() == [pepperoni, small_pepperoni, veggie]
+    garden = _item('Garden')
+    menu.update_menu_item('veggie', garden)
+    assert menu.get_menu_item_by_name('Veggie') is None
+    assert menu.get_menu_item_by_name('garden') is garden
+    menu.remove_menu_item('Pepperoni')  # every size goes
+    assert menu.get_menu_item('Pepperoni', PizzaSize.SMALL) is None
+    assert menu.list_menu_items() == [garden]
+
+    sides = SideMenuManagement(None)
+    sides.side_items = [SideItem('Water', 1.0, 'Beverages'), SideItem('Cookies', 1.0, 'Desserts')]
+    sides.update_side_item('WATER', SideItem('Sparkling Water', 1.5, 'Beverages'))
+    assert sides.get_side_item_by_name('water') is None
+    assert sides.get_side_item_by_name('sparkling WATER').price == 1.5
+    sides.remove_side_item('cookies')
+    assert [side.name for side in sides.list_side_items()] == ['Sparkling Water']
+
+    recipes = RecipeManagement()
+    recipes.add_recipe(PizzaRecipe('Ham', {'Ham': 1}))
+    recipes.add_recipe(PizzaRecipe('HAM', {'Ham': 2}))  # replaces Ham
+    assert [recipe.name for recipe in recipes.list_recipes()] == ['HAM']
+    assert recipes.update_recipe('ham', {'Ham': 3}) and recipes.get_recipe_by_name('Ham').ingredients == {'Ham': 3}
+    recipes.remove_recipe('hAm')
+    assert recipes.get_recipe_by_name('Ham') is None
+
+
+def _assert_indexes_match(menu):
+    # Every index agrees with a scan of the menu, in menu order.
+    items = menu.list_menu_items()
+    for size in SIZES:
+        assert menu.get_menu_items_by_size(size) == [item for item in items if item.size == size]
+        for category in CATEGORIES:
+            assert menu.get_menu_items_by_category_and_size(category, size) == [
+                item for item in items if item.category == category and item.size == size]
+    for category in CATEGORIES:
+        assert menu.get_menu_items_by_category(category) == [item for item in items if item.category == category]
+    for item in items:
+        assert menu.get_menu_item(item.name.upper(), item.size) is item
+
+
+def test_menu_indexes_follow_adds_updates_and_removes():
+    menu = MenuManagement()
+    pepperoni = _item('Pepperoni')
+    small_pepperoni = _item('Pepperoni', PizzaSize.SMALL, price=11.0)
+    veggie = _item('Veggie', category=PizzaCategory.VEGETARIAN)
+    for item in (pepperoni, small_pepperoni, veggie):
+        menu.add_menu_item(item)
+    _assert_indexes_match(menu)
+    assert menu.get_menu_item_by_name('PEPPERONI') is pepperoni
+    assert menu.get_menu_item('pepperoni', PizzaSize.SMALL) is small_pepperoni
+    assert menu.get_menu_item('pepperoni', PizzaSize.MEDIUM) is None
+    assert menu.get_menu_items_by_category_and_size(' Meat ', 'LARGE') == [pepperoni]
+
+    # Same name, new size and category: the old entries go from every index.
+    deluxe_pepperoni = _item('Pepperoni', PizzaSize.MEDIUM, PizzaCategory.SPECIALTY)
+    menu.update_menu_item('pepperoni', deluxe_pepperoni)
+    _assert_indexes_match(menu)
+    assert menu.get_menu_items_by_size(PizzaSize.LARGE) == [veggie]
+    assert menu.get_menu_item('Pepperoni', PizzaSize.SMALL) is small_pepperoni
+
+    # A rename moves the item to its new name.
+    garden = _item('Garden', category=PizzaCategory.VEGETARIAN)
+    menu.update_menu_item('Veggie', garden)
+    _assert_indexes_match(menu)
+    assert menu.get_menu_item_by_name('Veggie') is None
+    assert menu.get_menu_items_by_category(PizzaCategory.VEGETARIAN) == [garden]
+
+    menu.update_menu_item('Missing', _item('Missing'))
+    assert menu.get_menu_item_by_name('Missing') is None
+
+    menu.remove_menu_item('PEPPERONI')  # every size goes
+    _assert_indexes_match(menu)
+    assert menu.list_menu_items() == [garden]
+    assert menu.get_menu_items_by_category(PizzaCategory.SPECIALTY) == []
+    menu.remove_menu_item('Pepperoni')
+
+    menu.menu_items = [pepperoni, veggie]
+    _assert_indexes_match(menu)
+    assert menu.get_menu_items_by_category(PizzaCategory.VEGETARIAN) == [veggie]
+
+
+def test_menu_indexes_survive_pickling():
+    # Snapshots pickle the menu; the indexes are keyed by id() underneath.
+    menu = MenuManagement()
+    for item in (_item('Pepperoni'), _item('Pepperoni', PizzaSize.SMALL), _item('Veggie', category=PizzaCategory.VEGETARIAN)):
+        menu.add_menu_item(item)
+    copy = pickle.loads(pickle.dumps(menu))
+    _assert_indexes_match(copy)
+    copy.remove_menu_item('Veggie')
+    _assert_indexes_match(copy)
+    assert copy.get_menu_items_by_category(PizzaCategory.VEGETARIAN) == []
+
+
+def test_side_and_recipe_category_indexes():
+    sides = SideMenuManagement(None)
+    sides.side_items = [SideItem('Water', 1.0, 'Beverages'), SideItem('Cookies', 1.0, 'Desserts')]
+    sides.update_side_item('WATER', SideItem('Sparkling Water', 1.5, 'Beverages'))
+    sides.update_side_item('Cookies', SideItem('Cookies', 1.25, 'Appetizers'))
+    assert [side.name for side in sides.list_side_items_by_category('beverages')] == ['Sparkling Water']
+    assert sides.list_side_items_by_category('Desserts') == []
+    assert sides.get_side_item_by_name('cookies').price == 1.25
+    sides.remove_side_item('sparkling water')
+    assert sides.list_side_items_by_category('Beverages') == []
+    assert [side.name for side in sides.list_side_items()] == ['Cookies']
+
+    recipes = RecipeManagement()
+    recipes.add_recipe(PizzaRecipe('Ham', {'Ham': 1}, PizzaCategory.MEAT))
+    recipes.add_recipe(PizzaRecipe('Veggie', {'Onion': 1}, PizzaCategory.VEGETARIAN))
+    recipes.add_recipe(PizzaRecipe('HAM', {'Ham': 2}, PizzaCategory.SPECIALTY))  # replaces Ham
+    assert [recipe.name for recipe in recipes.list_recipes_by_category(PizzaCategory.MEAT)] == []
+    assert [recipe.name for recipe in recipes.list_recipes_by_category('Specialty')] == ['HAM']
+    recipes.remove_recipe('veggie')
+    assert recipes.list_recipes_by_category(PizzaCategory.VEGETARIAN) == []
+    assert [recipe.name for recipe in recipes.list_recipes()] == ['HAM']
@@ -0,0 +1,40 @@
+from multistore import ChainInventory, summarize_chain
+from tests.conftest import write_inventory
+
+
+def _summary(store, stock):
+    # stock: name -> (quantity, unit, reorder level)
+    return {'store': store, 'data_dir': store, 'problems': [], 'reorder': [],
+            'stock': {name.casefold(): (name, quantity, unit, level) for name, (quantity, unit, level) in stock.items()}}
+
+
+def test_plan_moves_spare_stock_before_reordering():
+    chain = ChainInventory(buffer=2.0)
+    chain.add(_summary('a', {'Cheese': (1, 'kg', 5), 'Ham': (0, 'kg', 10)}))
+    chain.add(_summary('b', {'Cheese': (30, 'kg', 5), 'Ham': (25, 'kg', 5)}))
+    chain.add(_summary('c', {'Cheese': (2, 'lb', 5)}))
+    chain.add(_summary('d', {'Ham': (0, 'kg', 5)}))
+    transfers, reorder = chain.plan()
+    assert transfers == [
+        {'ingredient': 'Cheese', 'unit': 'kg', 'quantity': 9, 'from': 'b', 'to': 'a'},
+        {'ingredient': 'Ham', 'unit': 'kg', 'quantity': 15, 'from': 'b', 'to': 'a'},
+    ]
+    # The largest need is covered first; what no store can spare is reordered.
+    assert reorder == [
+        {'ingredient': 'Cheese', 'unit': 'lb', 'quantity': 8, 'stores': ['c']},
+        {'ingredient': 'Ham', 'unit': 'kg', 'quantity': 15, 'stores': ['a', 'd']},
+    ]
+    assert chain.problems() == {'(chain)': ['Cheese is stocked in different units (kg, lb); no transfers between them']}
+
+
+def test_stores_are_read_from_their_directories(store_dir):
+    for store, quantity in (('north', 0), ('south', 20)):
+        (store_dir / store).mkdir()
+        name = 'Kalamata' if store == 'north' else 'Olive Mix'
+        write_inventory(store_dir / store / 'ingredients.csv', [(name, quantity, 'kg', 4)])
+    with open('aliases.csv', 'w') as aliases:
+        aliases.write('alias,name\nKalamata,Olive Mix\n')
+    chain = summarize_chain([str(store_dir / 'north'), str(store_dir / 'south')], workers=1, aliases='aliases.csv')
+    transfers, reorder = chain.plan()
+    assert transfers == [{'ingredient': 'Kalamata', 'unit': 'kg', 'quantity': 8, 'from': 'south', 'to': 'north'}]
+    assert reorder == []
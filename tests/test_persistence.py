@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from bussinese import InventoryManager
+from persistence import CsvTable, atomic_write, persistence
+from tests.conftest import write_inventory
+
+FIELDS = ['name', 'quantity']
+
+
+def _table(delta_log=True):
+    return CsvTable('stock.csv', FIELDS, ['name'], delta_log=delta_log, compact_ratio=10)
+
+
+def _saved_table():
+    table = _table()
+    table.save([{'name': 'Cheese', 'quantity': 5}, {'name': 'Ham', 'quantity': 2}])
+    table.save([{'name': 'Cheese', 'quantity': 4}])  # an update and a delete, both in the delta log
+    return table
+
+
+def test_delta_log_is_replayed(store_dir):
+    _saved_table()
+    assert os.path.exists('stock.csv.delta')
+    assert _table().load() == [{'name': 'Cheese', 'quantity': '4'}]
+
+
+def test_torn_delta_row_is_ignored_and_compacted(store_dir):
+    table = _saved_table()
+    table.save([{'name': 'Cheese', 'quantity': 3}, {'name': 'Olives', 'quantity': 1}])
+    with open('stock.csv.delta', 'rb+') as delta:
+        delta.truncate(os.path.getsize('stock.csv.delta') - 12)  # crash in the middle of the last append
+
+    rows = _table().load()
+    assert {row['name']: row['quantity'] for row in rows} == {'Cheese': '3'}
+    assert not os.path.exists('stock.csv.delta')
+    assert _table().load() == rows
+
+
+def test_corrupt_delta_row_stops_the_replay(store_dir):
+    _saved_table()
+    with open('stock.csv.delta') as delta:
+        text = delta.read()
+    with open('stock.csv.delta', 'w') as delta:
+        delta.write(text.replace('Cheese,4', 'Cheese,9'))
+    rows, entries, intact = _table().read()
+    assert not intact and entries == 0
+    assert {row['name'] for row in rows.values()} == {'Cheese', 'Ham'}
+
+
+def test_inventory_stays_dirty_until_a_batched_save_is_written(store_dir):
+    write_inventory('ingredients.csv', [('Cheese', 10, 'kg', 2)])
+    inventory = InventoryManager('ingredients.csv', flush_every=1)
+    with persistence.batch():
+        inventory.use_ingredient({'Cheese': 1})
+        assert inventory.dirty
+    assert not inventory.dirty
+    assert InventoryManager('ingredients.csv').get_ingredient('Cheese').quantity == 9
+
+
+def test_atomic_write_keeps_the_old_file_on_failure(store_dir):
+    atomic_write('report.json', lambda output: output.write('old'))
+
+    def fail(output):
+        output.write('half')
+        raise RuntimeError('disk full')
+    with pytest.raises(RuntimeError):
+        atomic_write('report.json', fail)
+    with open('report.json') as report:
+        assert report.read() == 'old'
+    assert os.listdir('.') == ['report.json']
@@ -0,0 +1,54 @@
+import math
+
+import pytest
+
+from bussinese import InventoryManager, MenuManagement, PizzaMenuItem, PizzaRecipe, PizzaSize, RecipeManagement
+from tests.conftest import write_inventory
+
+pytest.importorskip('numpy')
+
+
+def _planner():
+    from planning import CapacityPlanner
+
+    write_inventory('ingredients.csv', [('Cheese', 10, 'kg', 1), ('Tomato', 100, 'kg', 1), ('Pepperoni', 6.5, 'kg', 1)])
+    inventory = InventoryManager('ingredients.csv')
+    recipes = RecipeManagement()
+    recipes.add_recipe(PizzaRecipe('Margherita', {'Cheese': 2, 'Tomato': 1}))
+    recipes.add_recipe(PizzaRecipe('Pepperoni', {'Cheese': 1, 'Pepperoni': 3}))
+    recipes.add_recipe(PizzaRecipe('Truffle', {'Cheese': 0.5, 'Truffle': 1}))  # Truffle is not stocked
+    recipes.add_recipe(PizzaRecipe('Mystery', {'Saffron': 1}))
+    return CapacityPlanner(recipes, inventory), recipes, inventory
+
+
+def test_limiting_ingredient_sets_the_count(store_dir):
+    planner, _, _ = _planner()
+    # Cheese limits Margherita and Truffle, Pepperoni (6.5 // 3) limits Pepperoni;
+    # untracked ingredients never do.
+    assert planner.max_producible() == {'Margherita': 5, 'Pepperoni': 2, 'Truffle': 20, 'Mystery': math.inf}
+    assert [recipe.name for recipe in planner.recipes_needing('cheese')] == ['Margherita', 'Pepperoni', 'Truffle']
+    assert planner.recipes_needing('Anchovies') == []
+
+
+def test_demand_and_shortfall_for_a_forecast(store_dir):
+    planner, _, _ = _planner()
+    forecast = {'margherita': 4, 'Pepperoni': 3, 'Truffle': 2}
+    assert planner.demand(forecast) == {'Cheese': 12, 'Tomato': 4, 'Pepperoni': 9, 'Truffle': 2}
+    assert planner.shortfall(forecast) == {'Cheese': 2, 'Pepperoni': 2.5}
+    with pytest.raises(KeyError):
+        planner.demand({'Calzone': 1})
+
+
+def test_stock_and_recipe_changes(store_dir):
+    planner, recipes, inventory = _planner()
+    assert inventory.use_ingredient({'Cheese': 6}) == {}
+    planner.refresh_inventory()
+    assert planner.max_producible()['Margherita'] == 2
+    recipes.add_recipe(PizzaRecipe('Tomato Pie', {'Tomato': 40}))
+    planner.compile()
+    assert planner.max_producible()['Tomato Pie'] == 2
+
+    menu = MenuManagement()
+    for recipe in recipes.list_recipes():
+        menu.add_menu_item(PizzaMenuItem(recipe.name, '', PizzaSize.LARGE, 15.0, 'meat', recipe))
+    assert [item.name for item in planner.unavailable_if_out('Tomato', menu)] == ['Margherita', 'Tomato Pie']
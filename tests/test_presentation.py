@@ -0,0 +1,95 @@
+import builtins
+from datetime import date, timedelta
+
+from tests.conftest import write_inventory
+
+DAY = (date.today() + timedelta(days=3)).isoformat()
+
+
+def _counter(monkeypatch, answers):
+    # A store whose prompts are answered from `answers`: strings, or
+    # callables run at that prompt (e.g. another clerk acting meanwhile).
+    from Presentation import PizzaStore
+
+    answers = iter(answers)
+
+    def answer(prompt=''):
+        value = next(answers)
+        while callable(value):
+            value()
+            value = next(answers)
+        return value
+    monkeypatch.setattr(builtins, 'input', answer)
+    pizza_store = PizzaStore()
+    pizza_store.populate_standard_pizzas()
+    return pizza_store
+
+
+def _customer(phone):
+    return [phone, 'Ann', '', 'ann@example.com']
+
+
+def test_side_dish_edits_are_saved_to_the_store_file(store_dir, monkeypatch):
+    from Presentation import PizzaStore
+
+    answers = iter(['1', 'Garlic Bread', '3.5', 'appetizers', '2', 'Water', '3', 'Cookies', '1.25', '', '4'])
+    monkeypatch.setattr(builtins, 'input', lambda prompt='': next(answers))
+    pizza_store = PizzaStore()
+    pizza_store.populate_side_dishes()
+    saves = []
+    save = pizza_store.side_dish_repo.save_side_dishes
+    monkeypatch.setattr(pizza_store.side_dish_repo, 'save_side_dishes',
+                        lambda side_dishes, filename: saves.append(filename) or save(side_dishes, filename))
+    pizza_store.process_side_dish_menu()
+    assert len(saves) == 3  # once per edit
+    saved = {side.name: side for side in pizza_store.side_dish_repo.load_side_dishes(pizza_store.side_menu_mgt.filename)}
+    assert saved['Garlic Bread'].category == 'Appetizers'
+    assert saved['Cookies'].price == 1.25
+    assert 'Water' not in saved
+    assert not (store_dir / 'side_dishes.csv').exists()
+
+
+def test_counter_order_holds_its_stock_until_it_is_recorded(store_dir, monkeypatch):
+    write_inventory('ingredients.csv', [('Pepperoni', 3, 'kg', 1)])
+    pizza_store = None
+
+    def other_clerk():
+        # While the order is being taken, its two pizzas' worth is held.
+        inventory = pizza_store.inventory_mgr
+        assert inventory.get_ingredient('Pepperoni').quantity == 3
+        assert inventory.use_ingredient({'Pepperoni': 2}) == {'Pepperoni': 1}
+        assert not pizza_store.hold_pizzas([(pizza_store.menu_mgt.get_menu_item_by_name('Pepperoni'), 2)])
+    pizza_store = _counter(monkeypatch, _customer('510-555-0101') + ['yes', 'Pepperoni', '2', 'no', 'no',
+                                                                     other_clerk, DAY, '18:30'])
+    order = pizza_store.take_order()
+    assert order is not None and order.order_id is not None
+    assert pizza_store.inventory_mgr.get_ingredient('Pepperoni').quantity == 1
+    assert pizza_store.inventory_mgr.reserved_by_id(pizza_store.inventory_mgr.get_ingredient('Pepperoni').id) == 0
+    pizza_store.close()
+
+
+def test_cancelled_counter_order_releases_its_stock(store_dir, monkeypatch):
+    write_inventory('ingredients.csv', [('Pepperoni', 3, 'kg', 1)])
+    # An unreadable date, then no alternative slot chosen: the order is cancelled.
+    pizza_store = _counter(monkeypatch, _customer('510-555-0102') + ['yes', 'Pepperoni', '2', 'no', 'no',
+                                                                     'someday', '18:30', ''])
+    assert pizza_store.take_order() is None
+    pepperoni = pizza_store.menu_mgt.get_menu_item_by_name('Pepperoni')
+    assert pizza_store.availability.max_quantity(pepperoni) == 3
+    assert pizza_store.inventory_mgr.get_ingredient('Pepperoni').quantity == 3
+    pizza_store.close()
+
+
+def test_order_is_not_recorded_when_its_held_stock_is_gone(store_dir, monkeypatch):
+    write_inventory('ingredients.csv', [('Pepperoni', 3, 'kg', 1)])
+
+    def stock_counted_again():
+        # Another process (or a stock count) leaves less than is held.
+        write_inventory('ingredients.csv', [('Pepperoni', 1, 'kg', 1)])
+        pizza_store.inventory_mgr.refresh()
+    pizza_store = _counter(monkeypatch, _customer('510-555-0103') + ['yes', 'Pepperoni', '2', 'no', 'no',
+                                                                     stock_counted_again, DAY, '18:30'])
+    assert pizza_store.take_order() is None
+    assert pizza_store.inventory_mgr.get_ingredient('Pepperoni').quantity == 1
+    assert list(pizza_store.order_repo.replay()) == []
+    pizza_store.close()
@@ -0,0 +1,55 @@
+import pytest
+
+from bussinese import CustomPizzaOrder, Order, PizzaSize, SideItem
+from Datalayer import OrderRepository
+from pricing import PricingEngine, pricing_engine
+from tests.conftest import make_order
+
+np = pytest.importorskip('numpy')
+
+
+def _orders():
+    mixed = make_order(quantity=2)
+    mixed.add_side_dish(SideItem('Garlic Bread', 4.99, 'Appetizers'), 3)
+    mixed.add_side_dish(SideItem('Soda', 1.99, 'Beverages'))
+    custom = make_order(quantity=1)
+    # Small and medium build-your-own pizzas are priced down from large.
+    custom.add_pizza(CustomPizzaOrder.build_custom_pizza({'Thin Crust': 1, 'BBQ': 1, 'Ham': 2}, PizzaSize.SMALL), 3)
+    custom.add_pizza(CustomPizzaOrder.build_custom_pizza({'Thick Crust': 1, 'Beef': 1}, PizzaSize.MEDIUM))
+    sides_only = Order(None, '', '', [], [(SideItem('Cookies', 1.00, 'Desserts'), 7)])
+    empty = Order(None, '', '', [], [])
+    # Bare items from older callers count once.
+    legacy = Order(None, '', '', [make_order(pizza='Hawaiian').pizzas[0][0]], [SideItem('Water', 1.00, 'Beverages')])
+    return [mixed, custom, sides_only, empty, legacy]
+
+
+@pytest.mark.parametrize('tax_rate', [0.0, 0.0825])
+def test_batch_totals_match_each_order(monkeypatch, tax_rate):
+    monkeypatch.setattr(pricing_engine, 'tax_rate', tax_rate)
+    orders = _orders()
+    totals = pricing_engine.price_orders(orders)
+    assert totals.subtotals == pytest.approx([order.subtotal() for order in orders])
+    assert totals.taxes == pytest.approx([order.tax() for order in orders])
+    assert list(totals.totals) == [order.total() for order in orders]
+    assert totals.grand_total == pytest.approx(sum(order.total() for order in orders))
+    assert totals.subtotals[3] == 0
+
+
+def test_journal_records_price_like_their_orders(monkeypatch):
+    monkeypatch.setattr(pricing_engine, 'tax_rate', 0.0825)
+    orders = _orders()
+    for order in orders:
+        order.placed_at = 1.0
+    records = [OrderRepository.order_to_record(order) for order in orders]
+    assert list(pricing_engine.price_orders(records).totals) == [record['t'] for record in records]
+
+
+def test_custom_pizza_sizes_scale_the_price():
+    engine = PricingEngine(tax_rate=0.1)
+    options = {'thin crust': 1, 'Tomato': 1, 'Pepperoni': 2, 'Saffron': 1}  # unknown options are free
+    large = engine.custom_pizza_price(options)
+    assert large == pytest.approx(14.00 + 2.00 + 1.00 + 2 * 1.75)
+    assert engine.custom_pizza_price(options, PizzaSize.SMALL) == pytest.approx(large * 0.75)
+    assert engine.custom_pizza_price(options, 'Medium') == pytest.approx(large * 0.875)
+    assert engine.tax(large) == pytest.approx(large * 0.1)
+    assert list(engine.price_orders([]).totals) == []
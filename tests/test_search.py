@@ -0,0 +1,32 @@
+from bussinese import PizzaRecipe, RecipeManagement
+
+
+def _recipes():
+    recipe_mgt = RecipeManagement()
+    recipe_mgt.add_recipe(PizzaRecipe("Hawaiian", {"Ham": 1, "Pineapple": 1}))
+    recipe_mgt.add_recipe(PizzaRecipe("Meat Lovers", {"Pepperoni": 1, "Ham": 1, "Bacon": 1}))
+    recipe_mgt.add_recipe(PizzaRecipe("Vegetarian", {"Mushrooms": 1, "Olives": 1}))
+    return recipe_mgt
+
+
+def _names(recipes):
+    return [recipe.name for recipe in recipes]
+
+
+def test_empty_query_matches_every_recipe():
+    recipe_mgt = _recipes()
+    assert _names(recipe_mgt.search_recipes("")) == ["Hawaiian", "Meat Lovers", "Vegetarian"]
+    assert _names(recipe_mgt.search_recipes("   ")) == ["Hawaiian", "Meat Lovers", "Vegetarian"]
+
+
+def test_operators_in_any_case():
+    recipe_mgt = _recipes()
+    assert _names(recipe_mgt.search_recipes("ham and bacon")) == ["Meat Lovers"]
+    assert _names(recipe_mgt.search_recipes("pineapple Or olives")) == ["Hawaiian", "Vegetarian"]
+
+
+def test_substring_and_prefix_terms():
+    recipe_mgt = _recipes()
+    assert _names(recipe_mgt.search_recipes("pep")) == ["Meat Lovers"]
+    assert _names(recipe_mgt.search_recipes("mush*")) == ["Vegetarian"]
+    assert _names(recipe_mgt.search_recipes("room*")) == []
@@ -0,0 +1,42 @@
+from snapshot import load_store
+from tests.conftest import write_inventory
+
+
+def _load(**overrides):
+    from Presentation import PizzaStore
+
+    pizza_store = PizzaStore(load_inventory=False)
+    for name, value in overrides.items():
+        setattr(pizza_store, name, value)
+    return pizza_store, load_store(pizza_store, 'store.snapshot')
+
+
+def test_snapshot_is_used_while_its_sources_are_unchanged(store_dir):
+    write_inventory('ingredients.csv', [('Cheese', 10, 'kg', 2), ('Ham', 5, 'kg', 1)])
+    assert _load()[1] == 'sources'
+    pizza_store, source = _load()
+    assert source == 'snapshot'
+    assert pizza_store.inventory_mgr.get_ingredient('Cheese').quantity == 10
+    assert pizza_store.menu_mgt.get_menu_item_by_name('Hawaiian') is not None
+
+
+def test_inventory_edit_invalidates_the_inventory_section(store_dir):
+    write_inventory('ingredients.csv', [('Cheese', 10, 'kg', 2), ('Ham', 5, 'kg', 1)])
+    _load()
+    write_inventory('ingredients.csv', [('Cheese', 3, 'kg', 2), ('Ham', 5, 'kg', 1)])
+    pizza_store, source = _load()
+    assert source == 'partial'
+    assert pizza_store.inventory_mgr.get_ingredient('Cheese').quantity == 3
+    # The rewritten snapshot matches the edited file.
+    assert _load()[1] == 'snapshot'
+
+
+def test_menu_change_invalidates_the_menu_section(store_dir):
+    from Presentation import PizzaStore
+
+    write_inventory('ingredients.csv', [('Cheese', 10, 'kg', 2)])
+    _load()
+    pizzas = PizzaStore.STANDARD_PIZZAS[:1]
+    pizza_store, source = _load(STANDARD_PIZZAS=pizzas)
+    assert source == 'partial'
+    assert [item.name for item in pizza_store.menu_mgt.list_menu_items()] == [pizzas[0][0]]
@@ -0,0 +1,57 @@
+from datetime import date, timedelta
+
+from bussinese import SideItem
+from sqlite_store import SqliteDatabase, SqliteOrderRepository, main
+from tests.conftest import make_order, write_inventory
+
+DAY = (date.today() + timedelta(days=3)).isoformat()
+
+
+def _csv_store(data_dir):
+    from Presentation import PizzaStore
+
+    write_inventory(data_dir / 'ingredients.csv', [('Cheese', 40, 'kg', 5), ('Pepperoni', 12.5, 'kg', 2)])
+    pizza_store = PizzaStore(data_dir=str(data_dir))
+    pizza_store.populate_standard_pizzas()
+    pizza_store.populate_side_dishes()
+    pizza_store.recipe_repo.save_recipes(pizza_store.recipe_mgt.list_recipes(), pizza_store.path('recipes.csv'))
+    pizza_store.menu_repo.save_menu_items(pizza_store.menu_mgt.list_menu_items(), pizza_store.path('menu_items.csv'))
+    return pizza_store
+
+
+def test_csv_store_round_trips_through_sqlite(store_dir):
+    from Presentation import PizzaStore, load_data
+
+    data_dir = store_dir / 'north'
+    data_dir.mkdir()
+    pizza_store = _csv_store(data_dir)
+    for quantity in (1, 2, 3):
+        order = make_order(quantity=quantity, date=DAY)
+        order.sides.append((SideItem('Water', 1.0, 'beverages'), 2))
+        assert pizza_store.record_order(order, schedule=False)
+    expected_orders = list(pizza_store.order_repo.replay())
+    expected_menu = [(item.name, item.size, item.price, item.recipe.ingredients) for item in pizza_store.menu_mgt.list_menu_items()]
+    expected_sides = [(side.name, side.price) for side in pizza_store.side_menu_mgt.list_side_items()]
+    pizza_store.close()
+
+    assert main(['--data-dir', str(data_dir)]) == 0
+    assert (data_dir / 'pizza_store.db').exists()
+    assert not (store_dir / 'pizza_store.db').exists()
+
+    migrated = PizzaStore('sqlite', data_dir=str(data_dir))
+    load_data(migrated)
+    assert [(item.name, item.quantity, item.unit, item.reorder_level) for item in migrated.inventory_mgr.ingredients] == [
+        ('Cheese', 40, 'kg', 5), ('Pepperoni', 12.5, 'kg', 2)]
+    assert [(item.name, item.size, item.price, item.recipe.ingredients)
+            for item in migrated.menu_mgt.list_menu_items()] == expected_menu
+    assert [(side.name, side.price) for side in migrated.side_menu_mgt.list_side_items()] == expected_sides
+    assert list(migrated.order_repo.replay()) == expected_orders
+    assert [order.total() for order in migrated.order_repo.load_orders(migrated.menu_mgt, migrated.side_menu_mgt)] == [
+        record['t'] for record in expected_orders]
+    migrated.close()
+
+    # Running it again imports only the orders it has not seen.
+    assert main(['--data-dir', str(data_dir)]) == 0
+    db = SqliteDatabase(str(data_dir / 'pizza_store.db'))
+    assert len(SqliteOrderRepository(db)) == 3
+    db.close()